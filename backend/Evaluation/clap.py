@@ -1,14 +1,16 @@
 import torch
 import librosa
-import laion_clap
 import numpy as np
+from helper.model_registry import ModelRegistry
 
-# 1. INITIALIZE CLAP MODEL (The "Semantic Judge")
+# 1. CLAP MODEL (The "Semantic Judge")
 # This model converts both audio and text into a shared vector space.
-model = laion_clap.CLAP_Module(enable_fusion=False)
-model.load_ckpt() # Downloads pre-trained weights automatically
+# Loaded on first use (and shared) through the model registry, not at import.
+def get_clap_model():
+    return ModelRegistry.get_instance().get("clap")
 
 def calculate_semantic_alignment(audio_path, text_prompt):
+    model = get_clap_model()
     # Get Audio Embedding
     audio_embed = model.get_audio_embedding_from_filelist(x=[audio_path], use_tensor=True)
     # Get Text Embedding
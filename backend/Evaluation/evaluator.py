@@ -1,118 +1,169 @@
 import base64
 import io
-import torch
 import librosa
 import numpy as np
-import laion_clap
 from scipy.stats import entropy
 import logging
-import tempfile
-import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+from helper.model_registry import ModelRegistry
+from helper.metrics import Metrics
+from Variable.configurations import CLAP_SAMPLE_RATE, CLAP_BATCH_SIZE, EVAL_SAMPLE_RATE
 
 logger = logging.getLogger(__name__)
 
+
+@dataclass
+class AudioAnalysis:
+    """All evaluator metrics for one clip, computed from a single decode."""
+    spectral_flatness: float
+    spectral_entropy: float
+    noise_floor_db: float
+    audio_onsets: int
+    clap_score: Optional[float] = None
+
+
 class AudioEvaluator:
+    """Audio quality/alignment metrics. Use `get_instance()`: one long-lived evaluator
+    (and CLAP model) is shared by all requests."""
+
+    _instance = None
+    _lock = threading.Lock()
+
     def __init__(self):
-        # Initialize CLAP (Requires weights download on first run)
-        self.clap_model = laion_clap.CLAP_Module(enable_fusion=False)
-        self.clap_model.load_ckpt() 
+        import torch
+
+        # CLAP (Requires weights download on first run); loaded once and shared via the model registry
+        self.clap_model = ModelRegistry.get_instance().get("clap")
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        self._clap_lock = threading.Lock()  # one CLAP forward pass at a time
 
-    def _base64_to_temp_file(self, audio_base64):
-        """Convert base64 audio to a temporary file and return the path"""
-        # Handle data URL format (data:audio/wav;base64,...)
-        if ',' in audio_base64:
-            audio_base64 = audio_base64.split(',')[1]
-        
-        audio_bytes = base64.b64decode(audio_base64)
-        
-        # Create a temporary file
-        temp_fd, temp_path = tempfile.mkstemp(suffix='.wav')
-        try:
-            with os.fdopen(temp_fd, 'wb') as temp_file:
-                temp_file.write(audio_bytes)
-            return temp_path
-        except Exception as e:
-            os.close(temp_fd)
-            raise e
-    
-    def get_clap_score(self, audio_base64, text_prompt):
-        """Measures Text-to-Audio Alignment (Higher is better) from base64 audio"""
-        temp_path = None
-        try:
-            # Convert base64 to temporary file
-            temp_path = self._base64_to_temp_file(audio_base64)
-            
-            # Get embeddings
-            audio_embed = self.clap_model.get_audio_embedding_from_filelist(x=[temp_path], use_tensor=True)
-            text_embed = self.clap_model.get_text_embedding([text_prompt], use_tensor=True)
-            
-            similarity = torch.nn.functional.cosine_similarity(audio_embed, text_embed)
-            return similarity.item()
-        finally:
-            # Clean up temporary file
-            if temp_path and os.path.exists(temp_path):
-                try:
-                    os.unlink(temp_path)
-                except Exception as e:
-                    logger.warning(f"Failed to delete temp file {temp_path}: {e}")
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
 
-    def get_audio_richness(self, audio_base64):
-        """Measures Spectral Flatness and Entropy (Proxies for quality/complexity) from base64 audio"""
+    @staticmethod
+    def _decode_base64(audio_base64):
+        """Decode base64 audio (optionally a data URL) to raw file bytes"""
         # Handle data URL format (data:audio/wav;base64,...)
         if ',' in audio_base64:
             audio_base64 = audio_base64.split(',')[1]
-        
-        audio_bytes = base64.b64decode(audio_base64)
-        
-        # Load audio from bytes
-        y, sr = librosa.load(io.BytesIO(audio_bytes))
-        
-        # Spectral Flatness: 1.0 = white noise, 0.0 = pure tone. 
+        return base64.b64decode(audio_base64)
+
+    def _load_waveform(self, audio_base64):
+        """Decode base64 audio once, at its native rate (mono float)"""
+        return librosa.load(io.BytesIO(self._decode_base64(audio_base64)), sr=None)
+
+    def _base64_to_clap_waveform(self, audio_base64):
+        """Decode base64 audio in memory to the mono 48 kHz float waveform CLAP expects"""
+        y, sr = self._load_waveform(audio_base64)
+        return librosa.resample(y, orig_sr=sr, target_sr=CLAP_SAMPLE_RATE)
+
+    def _extract_features(self, y, sr):
+        """
+        Flatness, entropy, noise floor and onsets from one magnitude STFT.
+        Returns (flatness, spectral_entropy, noise_floor_db, onset_count).
+        """
+        S = np.abs(librosa.stft(y))
+
+        # Spectral Flatness: 1.0 = white noise, 0.0 = pure tone.
         # We want a mid-range for complex scores.
-        flatness = np.mean(librosa.feature.spectral_flatness(y=y))
-        
+        flatness = np.mean(librosa.feature.spectral_flatness(S=S))
+
         # Spectral Entropy: How 'unpredictable' the sound is.
-        S = np.abs(librosa.stft(y))
         psd = np.sum(S**2, axis=1)
         psd /= np.sum(psd)
         spec_entropy = entropy(psd)
-        
-        return flatness, spec_entropy
+
+        # Noise floor is the minimum frame RMS, in dB relative to the loudest frame
+        rms = librosa.feature.rms(S=S)[0]
+        noise_floor_db = np.min(librosa.power_to_db(rms, ref=np.max))
+
+        # Onsets from the log-mel spectrogram of the same STFT; number of sharp transients
+        mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S**2, sr=sr))
+        onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+        onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr, units='time')
+
+        return flatness, spec_entropy, noise_floor_db, len(onsets)
+
+    def _analyze_waveform(self, y, sr, clap_score=None):
+        y_eval = librosa.resample(y, orig_sr=sr, target_sr=EVAL_SAMPLE_RATE) if sr != EVAL_SAMPLE_RATE else y
+        flatness, spec_entropy, noise_floor_db, onsets = self._extract_features(y_eval, EVAL_SAMPLE_RATE)
+        return AudioAnalysis(
+            spectral_flatness=float(flatness),
+            spectral_entropy=float(spec_entropy),
+            noise_floor_db=float(noise_floor_db),
+            audio_onsets=int(onsets),
+            clap_score=None if clap_score is None else float(clap_score),
+        )
+
+    def analyze(self, audio_base64, text_prompt=None):
+        """All metrics for one clip from a single decode; CLAP is scored only if a prompt is given"""
+        return self.analyze_batch([audio_base64], None if text_prompt is None else [text_prompt])[0]
+
+    def analyze_batch(self, audio_base64_list, text_prompts=None):
+        """
+        Decode each clip once, score CLAP for all clips in batched forward passes (if prompts
+        are given), and compute the feature metrics from one shared STFT per clip.
+        """
+        with Metrics.get_instance().stage("evaluate"):
+            decoded = [self._load_waveform(audio_base64) for audio_base64 in audio_base64_list]
+
+            clap_scores = [None] * len(decoded)
+            if text_prompts is not None:
+                clap_waveforms = [librosa.resample(y, orig_sr=sr, target_sr=CLAP_SAMPLE_RATE) for y, sr in decoded]
+                clap_scores = self.get_clap_scores_from_waveforms(clap_waveforms, text_prompts)
+
+            return [self._analyze_waveform(y, sr, score) for (y, sr), score in zip(decoded, clap_scores)]
+
+    def get_clap_scores_from_waveforms(self, waveforms, text_prompts):
+        """
+        Text-to-Audio Alignment for many (waveform, text) pairs, batched into one audio and
+        one text forward pass per CLAP_BATCH_SIZE pairs. Waveforms are mono float at 48 kHz.
+        """
+        import torch
+
+        scores = []
+        for start in range(0, len(waveforms), CLAP_BATCH_SIZE):
+            # use_tensor=True makes laion_clap skip its numpy-to-torch conversion
+            audio_batch = [
+                torch.from_numpy(np.ascontiguousarray(w, dtype=np.float32))
+                for w in waveforms[start:start + CLAP_BATCH_SIZE]
+            ]
+            text_batch = list(text_prompts[start:start + CLAP_BATCH_SIZE])
+            with self._clap_lock, torch.no_grad():
+                audio_embed = self.clap_model.get_audio_embedding_from_data(x=audio_batch, use_tensor=True)
+                text_embed = self.clap_model.get_text_embedding(text_batch, use_tensor=True)
+            similarity = torch.nn.functional.cosine_similarity(audio_embed, text_embed)
+            scores.extend(similarity.tolist())
+        return scores
+
+    def get_clap_scores(self, audio_base64_list, text_prompts):
+        """Batched CLAP scores for (base64 audio, text) pairs, decoded in memory"""
+        waveforms = [self._base64_to_clap_waveform(audio_base64) for audio_base64 in audio_base64_list]
+        return self.get_clap_scores_from_waveforms(waveforms, text_prompts)
+    
+    def get_clap_score(self, audio_base64, text_prompt):
+        """Measures Text-to-Audio Alignment (Higher is better) from base64 audio"""
+        return self.get_clap_scores([audio_base64], [text_prompt])[0]
+
+    def get_audio_richness(self, audio_base64):
+        """Measures Spectral Flatness and Entropy (Proxies for quality/complexity) from base64 audio"""
+        analysis = self.analyze(audio_base64)
+        return analysis.spectral_flatness, analysis.spectral_entropy
 
     def evaluate_sync_from_audio_base64(self, audio_base64, action_keywords=["shot", "bang", "crash", "door"]):
         """Check if peaks exist in audio (simple onset detection) from base64 audio"""
-        # Handle data URL format (data:audio/wav;base64,...)
-        if ',' in audio_base64:
-            audio_base64 = audio_base64.split(',')[1]
-        
-        audio_bytes = base64.b64decode(audio_base64)
-        
-        # Load audio from bytes
-        y, sr = librosa.load(io.BytesIO(audio_bytes))
-        onsets = librosa.onset.onset_detect(y=y, sr=sr, units='time')
-        # Returns number of sharp transients found
-        return len(onsets)
+        return self.analyze(audio_base64).audio_onsets
     
     def get_noise_floor(self, audio_base64):
         """Calculate noise floor in dB from base64 audio"""
-        # Handle data URL format (data:audio/wav;base64,...)
-        if ',' in audio_base64:
-            audio_base64 = audio_base64.split(',')[1]
-        
-        audio_bytes = base64.b64decode(audio_base64)
-        
-        # Load audio from bytes
-        y, sr = librosa.load(io.BytesIO(audio_bytes))
-        
-        # Calculate RMS (Root Mean Square) in dB
-        rms = librosa.feature.rms(y=y)[0]
-        rms_db = librosa.power_to_db(rms, ref=np.max)
-        
-        # Noise floor is the minimum RMS value
-        noise_floor_db = np.min(rms_db)
-        
-        return noise_floor_db
+        return self.analyze(audio_base64).noise_floor_db
 
 # if __name__ == "__main__":
 #     evaluator = AudioEvaluator()
@@ -18,19 +18,19 @@ import warnings
 from numpy import True_
 from Variable.dataclases import AudioCue, NarratorCue, Cue
 from Variable.configurations import MODIFIER_WORDS, DEFAULT_WEIGHT_DB, DEFAULT_SFX_DURATION_MS
-from Utils.prompts import gemini_audio_prompt, gemini_audio_prompt_with_narrator
+from Utils.prompts import gemini_audio_prompt, gemini_audio_prompt_with_narrator, PROMPT_TEMPLATE_VERSION
+import bisect
 import math
-from typing import List, Dict, Tuple
+import threading
+from typing import Callable, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
-import google.genai as genai
-import spacy
-from Variable.configurations import PATH_TO_MOVIE_BGM_METADATA, SOUND_TYPES
-try:
-    nlp = spacy.load("en_core_web_sm")
-    nlp_available = True
-except Exception:
-    nlp = None
-    nlp_available = False
+from Variable.configurations import SOUND_TYPES, GEMINI_MODEL_NAME, DECISION_CACHE_ENABLED
+from Variable.configurations import LLM_CHUNKING_ENABLED, LLM_CHUNK_WORDS, LLM_CHUNK_CONCURRENCY
+import concurrent.futures
+from helper.decision_cache import DecisionCache
+from helper.model_registry import ModelRegistry
+from helper.metrics import Metrics
+from helper.movie_bgm_library import MovieBgmLibrary
 
 import os
 backend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -39,18 +39,13 @@ logger = logging.getLogger(__name__)
 GEMINI_AVAILABLE = True
 USE_NEW_GENAI = True
 
-try:
-    from gliner import GLiNER
-    gliner_model = GLiNER.from_pretrained("urchade/gliner_medium-v2.1")
-    GLINER_AVAILABLE = True
-except ImportError:
-    logger.warning("GLiNER not installed. Install with: pip install gliner")
-    gliner_model = None
-    GLINER_AVAILABLE = False
-except Exception as e:
-    logger.error(f"Failed to load GLiNER: {e}")
-    gliner_model = None
-    GLINER_AVAILABLE = False
+def get_nlp():
+    """spaCy pipeline, loaded on first use; None if spaCy or en_core_web_sm is unavailable."""
+    return ModelRegistry.get_instance().get_optional("spacy")
+
+def get_gliner_model():
+    """GLiNER model, loaded on first use; None if GLiNER is not installed or fails to load."""
+    return ModelRegistry.get_instance().get_optional("gliner")
 
 def _classify_audio_type(word: str, pos_tag: str, context: str = "") -> Tuple[str | None, str | None]:
     """
@@ -178,49 +173,48 @@ def _classify_audio_type(word: str, pos_tag: str, context: str = "") -> Tuple[st
     # If we can't classify, return None to skip
     return (None, None)
 
+def _build_word_starts(story_text: str) -> List[int]:
+    """Character offsets where each whitespace-separated word of story_text starts (one linear pass)."""
+    return [match.start() for match in re.finditer(r"\S+", story_text)]
+
+def _word_index_at(word_starts: List[int], char_idx: int) -> int:
+    """Index of the word containing char_idx, by bisecting the word start offsets."""
+    return max(0, bisect.bisect_right(word_starts, char_idx) - 1)
+
+def _tokens_with_sentence_text(doc):
+    """Yield (token, sentence text) in document order, building each sentence's text once."""
+    for sent in doc.sents:
+        sent_text = sent.text
+        for token in sent:
+            yield token, sent_text
+
 def _extract_audio_cues_nlp(story_text: str, speed_wps: float):
     """
     Uses spaCy NLP to extract audio cues from text.
     """
-    if not nlp_available or nlp is None:
+    nlp = get_nlp()
+    if nlp is None:
         # Fallback to simple extraction if NLP is not available
         return _extract_audio_cues_simple(story_text, speed_wps)
     doc = nlp(story_text)
-    words = story_text.lower().split()
-    total_words = len(words)
+    # Character offset of every whitespace-separated word, built once (same words as story_text.split())
+    word_starts = _build_word_starts(story_text)
+    total_words = len(word_starts)
     total_duration_ms = math.ceil((total_words / speed_wps) * 1000)
     
     cues_to_play: List[AudioCue] = []
     current_weight_db = DEFAULT_WEIGHT_DB
     last_cue_index: Dict[str, int] = {"SFX": -1, "AMBIENCE": -1, "MUSIC": -1}
     
-    # Build word index mapping for accurate position tracking
-    word_positions = []
-    char_idx = 0
-    for word in words:
-        # Find the word in the original text
-        pos = story_text.lower().find(word, char_idx)
-        if pos != -1:
-            word_positions.append((pos, word))
-            char_idx = pos + len(word)
-        else:
-            word_positions.append((char_idx, word))
-            char_idx += len(word) + 1
-    
     # Process each token with better position tracking
     processed_indices = set()  # Track which words we've processed to avoid duplicates
     
-    for token in doc:
+    for token, sent_text in _tokens_with_sentence_text(doc):
         if token.is_punct or token.is_space:
             continue
         
-        # Find which word index this token corresponds to
-        token_start = token.idx
-        word_idx = 0
-        for i, (pos, word) in enumerate(word_positions):
-            if pos <= token_start < pos + len(word):
-                word_idx = i
-                break
+        # Find which word index this token corresponds to (all tokens of a multi-token word share it)
+        word_idx = _word_index_at(word_starts, token.idx)
         
         # Skip if we've already processed this word
         if word_idx in processed_indices:
@@ -239,7 +233,7 @@ def _extract_audio_cues_nlp(story_text: str, speed_wps: float):
         audio_type, audio_prompt = _classify_audio_type(
             token.text, 
             token.pos_,
-            context=token.sent.text
+            context=sent_text
         )
         
         if audio_type and audio_prompt:
@@ -331,7 +325,8 @@ def _extract_audio_cues_simple(story_text: str, speed_wps: float):
 
 def extract_local_entities(text: str):
     """Extract entities using GLiNER if available."""
-    if not GLINER_AVAILABLE or not gliner_model:
+    gliner_model = get_gliner_model()
+    if gliner_model is None:
         return []
     try:
         # We define custom labels for cinematic sound design
@@ -343,17 +338,69 @@ def extract_local_entities(text: str):
         return []
 
 def read_movie_bgms_csv():
-    """Read the movie bgms csv file."""
-    with open(PATH_TO_MOVIE_BGM_METADATA, "r") as f:
-        return f.read()
+    """Read the movie bgms csv file (kept in memory; re-read only when it changes on disk)."""
+    return MovieBgmLibrary.get_instance().metadata_csv()
+
+def movie_bgm_metadata_version() -> str:
+    """Cheap version stamp of the movie bgms csv (size + mtime); part of the LLM decision cache key."""
+    try:
+        st = os.stat(MovieBgmLibrary.get_instance().metadata_path)
+    except OSError:
+        return "missing"
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+# Pooled Gemini clients, one per API key, reused across requests
+_genai_clients: Dict[str, object] = {}
+_genai_clients_lock = threading.Lock()
+
+def _get_genai_client(api_key: str):
+    import google.genai as genai
+
+    with _genai_clients_lock:
+        client = _genai_clients.get(api_key)
+        if client is None:
+            client = genai.Client(api_key=api_key)  # type: ignore
+            _genai_clients[api_key] = client
+        return client
+
+# Optional stand-in for the LLM: prompt -> response text. None means Gemini.
+_llm_backend: Optional[Callable[[str], Optional[str]]] = None
+
+def set_llm_backend(backend: Optional[Callable[[str], Optional[str]]]):
+    """Replace the Gemini call with a local stand-in (prompt -> response text); None restores Gemini."""
+    global _llm_backend
+    _llm_backend = backend
+
+def _llm_name() -> str:
+    if _llm_backend is None:
+        return GEMINI_MODEL_NAME
+    return getattr(_llm_backend, "__qualname__", repr(_llm_backend))
+
+def _decision_cache_key(story_text: str, speed_wps: float, narrator_enabled: bool) -> str:
+    return DecisionCache.make_key(
+        story_text=story_text,
+        speed_wps=float(speed_wps),
+        narrator_enabled=narrator_enabled,
+        prompt_template_version=PROMPT_TEMPLATE_VERSION,
+        movie_bgm_metadata_version=movie_bgm_metadata_version() if narrator_enabled else None,
+        llm=_llm_name(),
+    )
 
 def query_gemini(story_text: str, speed_wps: float, narrator_enabled: bool = True):
     # if not GEMINI_AVAILABLE:
     #     logger.warning("Gemini API not available")
     #     return None
+
+    cache_key = None
+    if DECISION_CACHE_ENABLED:
+        cache_key = _decision_cache_key(story_text, speed_wps, narrator_enabled)
+        cached = DecisionCache.get_instance().get(cache_key)
+        if cached is not None:
+            logger.info("LLM decision cache hit")
+            return cached
     
     api_key = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
-    if not api_key:
+    if _llm_backend is None and not api_key:
         logger.warning("GEMINI_API_KEY not found in environment variables. Set it with: export GEMINI_API_KEY='your-key'")
         return None
     try:
@@ -378,15 +425,19 @@ def query_gemini(story_text: str, speed_wps: float, narrator_enabled: bool = Tru
             logger.error("No prompt found")
             return None
        
-        model_name = 'gemini-2.5-flash'
+        model_name = _llm_name()
         response_text = None
         try:
-            client = genai.Client(api_key=api_key)  # type: ignore
-            response = client.models.generate_content(  # type: ignore
-                model=model_name,
-                contents=prompt
-            )
-            response_text = response.text
+            with Metrics.get_instance().stage("llm_call"):
+                if _llm_backend is not None:
+                    response_text = _llm_backend(prompt)
+                else:
+                    client = _get_genai_client(api_key)  # type: ignore[arg-type]
+                    response = client.models.generate_content(  # type: ignore
+                        model=GEMINI_MODEL_NAME,
+                        contents=prompt
+                    )
+                    response_text = response.text
         except Exception as e:
             logger.error(f"\n\nModel {model_name} failed: {e}\n\n")
             return None
@@ -401,11 +452,71 @@ def query_gemini(story_text: str, speed_wps: float, narrator_enabled: bool = Tru
         json_match = re.search(r'\[[\s\S]*?\]', json_str)
         if json_match:
             json_str = json_match.group()
-        return json.loads(json_str)
+        result = json.loads(json_str)
+        if cache_key is not None and result:
+            DecisionCache.get_instance().put(cache_key, result)
+        return result
     except Exception as e:
         logger.error(f"Gemini Error: {e}")
         return None
 
+def _split_story_chunks(story_text: str, max_words: int) -> List[Tuple[int, str]]:
+    """
+    Split a story into chunks of at most max_words, breaking at paragraph and then sentence
+    boundaries (a single over-long sentence is cut at word boundaries).
+    Returns (word_offset, chunk_text) pairs; word offsets index story_text.split().
+    """
+    units: List[Tuple[str, int]] = []  # (text, word count), in story order
+    for paragraph in re.split(r"\n\s*\n", story_text):
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph.strip()):
+            words = sentence.split()
+            for i in range(0, len(words), max_words):
+                piece = words[i:i + max_words]
+                units.append((" ".join(piece), len(piece)))
+
+    chunks: List[Tuple[int, str]] = []
+    current: List[str] = []
+    current_words = 0
+    offset = 0
+    for text, count in units:
+        if current and current_words + count > max_words:
+            chunks.append((offset, " ".join(current)))
+            offset += current_words
+            current, current_words = [], 0
+        current.append(text)
+        current_words += count
+    if current:
+        chunks.append((offset, " ".join(current)))
+    return chunks
+
+def _query_llm_chunked(story_text: str, speed_wps: float, narrator_enabled: bool = True):
+    """
+    Decide cues for a long story chunk by chunk, with chunks queried concurrently.
+    Each chunk's word_index / start_time_ms are shifted by the chunk's word offset, so the
+    merged list is on the full-story timeline. Returns None if every chunk failed.
+    """
+    chunks = _split_story_chunks(story_text, LLM_CHUNK_WORDS)
+    logger.info(f"[DECIDER] Deciding {len(chunks)} chunks concurrently")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(chunks), LLM_CHUNK_CONCURRENCY)) as executor:
+        results = list(executor.map(lambda chunk: query_gemini(chunk[1], speed_wps, narrator_enabled), chunks))
+
+    merged = []
+    for (word_offset, _), chunk_cues in zip(chunks, results):
+        if not chunk_cues:
+            logger.warning(f"No cues for chunk at word {word_offset}")
+            continue
+        offset_ms = math.ceil((word_offset / speed_wps) * 1000)
+        for item in chunk_cues:
+            if not isinstance(item, dict):
+                continue
+            item = dict(item)
+            if item.get("word_index") is not None:
+                item["word_index"] = item["word_index"] + word_offset
+            if item.get("start_time_ms") is not None:
+                item["start_time_ms"] = item["start_time_ms"] + offset_ms
+            merged.append(item)
+    return merged or None
+
 def decide_audio_llm(story_text: str, speed_wps: float, narrator_enabled: bool = True):
     """
     Uses LLM to decide audio cues with precise timing based on reading speed.
@@ -416,8 +527,11 @@ def decide_audio_llm(story_text: str, speed_wps: float, narrator_enabled: bool =
     words = story_text.split()
     total_duration_ms = math.ceil((len(words) / speed_wps) * 1000)
     
-    # Step A: Try Gemini first, then fallback to local LLM
-    gemini_cues = query_gemini(story_text, speed_wps, narrator_enabled)
+    # Step A: Try Gemini first (chunked for long stories), then fallback to local LLM
+    if LLM_CHUNKING_ENABLED and len(words) > LLM_CHUNK_WORDS:
+        gemini_cues = _query_llm_chunked(story_text, speed_wps, narrator_enabled)
+    else:
+        gemini_cues = query_gemini(story_text, speed_wps, narrator_enabled)
     
     # If Gemini fails, try local LLM with keyword extraction
     if not gemini_cues:
@@ -575,7 +689,7 @@ def decide_audio_llm(story_text: str, speed_wps: float, narrator_enabled: bool =
         )
 
         final_cues.append(cue)
-        logger.info(f"Added cue: {cue}")
+        logger.debug(f"Added cue {index}: {a_type} at {start_ms}ms for {duration_ms}ms")
         index += 1
 
     logger.info(f"[DECIDER] Successfully generated {len(final_cues)} cinematic cues with LLM-provided timing.")
@@ -590,8 +704,10 @@ def decide_audio_cues(story_text: str, speed_wps: float):
     logger.info("Starting audio decision process...")
     logger.info(f"Reading Speed: {speed_wps} words/sec")
     
+    metrics = Metrics.get_instance()
     try:
-        cues, total_duration = decide_audio_llm(story_text, speed_wps)
+        with metrics.stage("llm_decision"):
+            cues, total_duration = decide_audio_llm(story_text, speed_wps)
         if not cues:
             logger.warning("LLM returned no cues, falling back to simple extraction...")
             raise Exception("Failed to generate audio cues with LLM")
@@ -604,13 +720,13 @@ def decide_audio_cues(story_text: str, speed_wps: float):
         logger.error(f"Error in decide_audio_llm: {e}")
         logger.info("Falling back to simple extraction...")
         # Fallback to simple extraction
-        if nlp_available:
-            cues, total_duration = _extract_audio_cues_nlp(story_text, speed_wps)
-        else:
-            cues, total_duration = _extract_audio_cues_simple(story_text, speed_wps)
+        with metrics.stage("nlp_fallback"):
+            if get_nlp() is not None:
+                cues, total_duration = _extract_audio_cues_nlp(story_text, speed_wps)
+            else:
+                cues, total_duration = _extract_audio_cues_simple(story_text, speed_wps)
     
     logger.info(f"Finished parsing. Found {len(cues)} audio cues.")
-    logger.info(f"\nCues: {cues}\n\n")
     logger.info(f"Total Duration: {total_duration}")
     return cues, total_duration
 
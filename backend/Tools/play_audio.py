@@ -9,18 +9,149 @@
 #     sys.path.append(project_root)
 
 import numpy as np
+from typing import Optional
 from pydub import AudioSegment
 from Variable.dataclases import AudioCue, NarratorCue, Cue
 from Variable.model_map import SPECIALIST_MAP
 from helper.lib import ParlerTTSModel
+from helper.clip_cache import ClipCache
+from helper.single_flight import SingleFlight
+from helper.metrics import Metrics
+from helper.step_policy import cue_steps
+from Variable.configurations import (
+    CLIP_CACHE_ENABLED, SINGLE_FLIGHT_ENABLED, TANGOFLUX_MODEL_NAME, PARLER_TTS_MODEL_NAME, PARLER_TTS_SEED, PARLER_TTS_SAMPLING,
+    SFX_RATE, SFX_GAIN, ENV_RATE, ENV_GAIN, EMOTIONAL_RATE, EMOTIONAL_GAIN,
+    NARRATION_SENTENCE_SPLIT, NARRATION_MIN_SENTENCE_CHARS, NARRATION_CROSSFADE_MS, CPU_FAST_PATH,
+    TANGOFLUX_OUTPUT_FORMAT,
+)
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Model settings that change a specialist's output; part of the clip cache key.
+# MOVIE_BGM is a file lookup, not a generation, so it is never cached.
+_GENERATION_SETTINGS = {
+    "SFX": {"model": TANGOFLUX_MODEL_NAME, "precision": CPU_FAST_PATH, "rate": SFX_RATE, "gain": SFX_GAIN},
+    "AMBIENCE": {"model": TANGOFLUX_MODEL_NAME, "precision": CPU_FAST_PATH, "rate": ENV_RATE, "gain": ENV_GAIN},
+    "MUSIC": {"model": TANGOFLUX_MODEL_NAME, "precision": CPU_FAST_PATH, "rate": EMOTIONAL_RATE, "gain": EMOTIONAL_GAIN},
+    "NARRATOR": {
+        "model": PARLER_TTS_MODEL_NAME, "seed": PARLER_TTS_SEED, "sampling": PARLER_TTS_SAMPLING,
+        "precision": CPU_FAST_PATH,
+        "sentence_split": NARRATION_SENTENCE_SPLIT,
+        "min_sentence_chars": NARRATION_MIN_SENTENCE_CHARS,
+        "crossfade_ms": NARRATION_CROSSFADE_MS,
+    },
+}
+
+def generation_key(audio_cue: Cue):
+    """Key identifying the raw specialist output of a cue (inputs + model settings), or None for MOVIE_BGM.
+
+    Cues with equal keys produce the same raw clip; only fades and gain differ. Used for the
+    clip cache and to coalesce identical in-flight generations.
+    """
+    if audio_cue.audio_type not in _GENERATION_SETTINGS:
+        return None
+    settings = _GENERATION_SETTINGS[audio_cue.audio_type]
+    if isinstance(audio_cue, NarratorCue):
+        return ClipCache.make_key(
+            audio_type=audio_cue.audio_type,
+            story=audio_cue.story,
+            narrator_description=audio_cue.narrator_description,
+            **settings,
+        )
+    return ClipCache.make_key(
+        audio_type=audio_cue.audio_type,
+        audio_class=audio_cue.audio_class,
+        duration_ms=audio_cue.duration_ms,
+        steps=cue_steps(audio_cue),
+        **settings,
+    )
+
+def _clip_cache_key(audio_cue: Cue):
+    """Content-addressed cache key for the raw specialist output of a cue, or None if not cacheable."""
+    if not CLIP_CACHE_ENABLED:
+        return None
+    return generation_key(audio_cue)
+
+def _single_flight(audio_cue: Cue, generate):
+    """Run `generate()` once for all concurrent callers generating the same raw clip."""
+    key = generation_key(audio_cue) if SINGLE_FLIGHT_ENABLED else None
+    if key is None:
+        return generate()
+    return SingleFlight.get_instance().do(key, generate)
+
+def _run_specialist(audio_type: str, *args):
+    """Call the specialist model for `audio_type`, recording its time, failures and busy workers."""
+    metrics = Metrics.get_instance()
+    with metrics.in_progress("cinemaudio_cues_in_progress", audio_type=audio_type):
+        try:
+            with metrics.timer("cinemaudio_cue_generation_seconds", audio_type=audio_type):
+                return SPECIALIST_MAP[audio_type](*args)
+        except Exception:
+            metrics.inc("cinemaudio_cue_failures_total", audio_type=audio_type)
+            raise
+
+def _generate_narration(audio_cue: NarratorCue) -> np.ndarray:
+    """Run the TTS specialist for a narrator cue, going through the clip cache."""
+    key = _clip_cache_key(audio_cue)
+    if key is not None:
+        cached = ClipCache.get_instance().get_array(key)
+        if cached is not None:
+            logger.info(f"Clip cache hit for narrator cue {audio_cue.id}")
+            return cached
+
+    def generate():
+        audio_arr = _run_specialist(audio_cue.audio_type, audio_cue.story, audio_cue.narrator_description)
+        if key is not None:
+            ClipCache.get_instance().put_array(key, audio_arr)
+        return audio_arr
+
+    return _single_flight(audio_cue, generate)
+
+def cached_narration(audio_cue: NarratorCue) -> Optional[np.ndarray]:
+    """The cached raw TTS output for a narrator cue, if any."""
+    key = _clip_cache_key(audio_cue)
+    return ClipCache.get_instance().get_array(key) if key is not None else None
+
+def is_clip_cached(audio_cue: Cue) -> bool:
+    """True if the raw specialist output for this cue is already in the clip cache."""
+    key = _clip_cache_key(audio_cue)
+    if key is None:
+        return False
+    suffix = ".npy" if isinstance(audio_cue, NarratorCue) else ".wav"
+    return ClipCache.get_instance().contains(key, suffix)
+
+def _generate_clip(audio_cue: AudioCue, raw_clip: Optional[AudioSegment] = None) -> AudioSegment:
+    """Run the specialist for an audio cue, going through the clip cache.
+
+    `raw_clip` is specialist output produced elsewhere (e.g. a batched TangoFlux call);
+    it is stored in the cache and used as-is.
+    """
+    key = _clip_cache_key(audio_cue)
+    if raw_clip is not None:
+        if key is not None:
+            ClipCache.get_instance().put_segment(key, raw_clip)
+        return raw_clip
+    if key is not None:
+        cached = ClipCache.get_instance().get_segment(key)
+        if cached is not None:
+            logger.info(f"Clip cache hit for '{audio_cue.audio_class}' ({audio_cue.audio_type})")
+            return cached
+
+    def generate():
+        args = (audio_cue.audio_class, audio_cue.duration_ms)
+        if audio_cue.audio_type in TANGOFLUX_OUTPUT_FORMAT:  # TangoFlux specialists take the cue's diffusion steps
+            args += (cue_steps(audio_cue),)
+        audio_clip = _run_specialist(audio_cue.audio_type, *args)
+        if key is not None:
+            ClipCache.get_instance().put_segment(key, audio_clip)
+        return audio_clip
+
+    return _single_flight(audio_cue, generate)
+
 def _tts_numpy_to_audio_segment(audio_arr: np.ndarray, duration_ms: int) -> AudioSegment:
     """Convert TTS numpy output (float32) to AudioSegment."""
-    model = ParlerTTSModel.get_instance()["model"]
-    sample_rate = model.config.sampling_rate
+    sample_rate = ParlerTTSModel.sampling_rate()
     gain = 0.9
     audio_arr = np.clip(audio_arr, -1.0, 1.0)
     audio_bytes = (audio_arr * 32767 * gain).astype(np.int16).tobytes()
@@ -35,33 +166,32 @@ def _tts_numpy_to_audio_segment(audio_arr: np.ndarray, duration_ms: int) -> Audi
     return seg  # type: ignore[return-value]
 
 
-def create_audio_from_audiocue(audio_cue: Cue) -> AudioSegment:
+def create_audio_from_audiocue(audio_cue: Cue, raw_clip: Optional[AudioSegment] = None) -> AudioSegment:
     """
     Create a single audio clip from a single cue (AudioCue or NarratorCue).
+    If `raw_clip` is given (AudioCue only), it replaces the specialist call; fades and gain still apply.
     """
-    logger.info(f"Creating audio from cue: {audio_cue}\n\n")
-    
     if isinstance(audio_cue, NarratorCue):
         logger.info(f"Creating audio from narrator cue: {audio_cue.id} ({audio_cue.audio_type})")
-        specialist_func = SPECIALIST_MAP[audio_cue.audio_type]
-        audio_arr = specialist_func(audio_cue.story, audio_cue.narrator_description)
+        audio_arr = _generate_narration(audio_cue)
         audio_arr = audio_arr * int((audio_cue.weight_db + 20) / 10)
-        clip = _tts_numpy_to_audio_segment(audio_arr, audio_cue.duration_ms)
-        fade_ms = min(100, audio_cue.duration_ms // 4)
-        faded = clip.fade_in(fade_ms).fade_out(fade_ms)
+        with Metrics.get_instance().stage("fades"):
+            clip = _tts_numpy_to_audio_segment(audio_arr, audio_cue.duration_ms)
+            fade_ms = min(100, audio_cue.duration_ms // 4)
+            faded = clip.fade_in(fade_ms).fade_out(fade_ms)
         return faded  # type: ignore[return-value]
     else:
         logger.info(f"Creating audio from audio cue: {audio_cue.audio_class} ({audio_cue.audio_type})")
-        specialist_func = SPECIALIST_MAP[audio_cue.audio_type]
-        audio_clip = specialist_func(audio_cue.audio_class, audio_cue.duration_ms)
+        audio_clip = _generate_clip(audio_cue, raw_clip)
         fade_ms = audio_cue.fade_ms
-        # Safeguard: only apply fade if we have a positive duration
-        if fade_ms is not None and fade_ms > 0:
-            fade_time = min(fade_ms, audio_cue.duration_ms // 2)
-            processed_clip = audio_clip.fade_in(fade_time).fade_out(fade_time)
-        else:
-            processed_clip = audio_clip
-        processed_clip = processed_clip + audio_cue.weight_db
+        with Metrics.get_instance().stage("fades"):
+            # Safeguard: only apply fade if we have a positive duration
+            if fade_ms is not None and fade_ms > 0:
+                fade_time = min(fade_ms, audio_cue.duration_ms // 2)
+                processed_clip = audio_clip.fade_in(fade_time).fade_out(fade_time)
+            else:
+                processed_clip = audio_clip
+            processed_clip = processed_clip + audio_cue.weight_db
         return processed_clip
 
 
@@ -1,3 +1,4 @@
+import hashlib
 from langchain_core.prompts import PromptTemplate
 
 gemini_audio_prompt = PromptTemplate(
@@ -192,3 +193,8 @@ JSON
 """
     ),
 )
+
+# Changes whenever either template changes; part of the LLM decision cache key
+PROMPT_TEMPLATE_VERSION = hashlib.sha256(
+    (gemini_audio_prompt.template + gemini_audio_prompt_with_narrator.template).encode("utf-8")
+).hexdigest()[:16]
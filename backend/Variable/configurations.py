@@ -32,10 +32,88 @@ MODIFIER_WORDS = {
 # The scheduler creates (steps+1) sigmas, so with STEPS=48, we get 49 sigmas (indices 0-48)
 # When step_index=48, it accesses step_index+1=49 which is valid
 STEPS=48
+# Adaptive diffusion steps (helper/step_policy.py): STEPS is the ceiling, given to prominent,
+# short foreground cues. Quieter (background) and longer cues get fewer steps, and a request's
+# latency budget lowers them further, least prominent cues first. Steps are always multiples of
+# STEPS_QUANTUM within [STEPS_MIN, STEPS]: a small set of step counts keeps cues batchable together.
+# Off by default: only STEPS=48 is known to be safe with the scheduler (see above). Run
+# `python -m benchmarks.step_policy --check-scheduler` against the deployed TangoFlux before enabling.
+ADAPTIVE_STEPS = os.getenv("ADAPTIVE_STEPS", "0") == "1"  # 0 = every TangoFlux call uses STEPS
+STEPS_MIN = 16
+STEPS_QUANTUM = 8
+STEPS_BY_TYPE = {"SFX": 48, "AMBIENCE": 40, "MUSIC": 48}  # Steps for a short foreground cue
+STEPS_FULL_QUALITY_S = 10  # Cues up to this long keep their type's steps; longer ones scale by sqrt(this / duration)
+STEPS_FOREGROUND_DB = 0.0  # weight_db at or above which a cue is foreground (no reduction)
+STEPS_BACKGROUND_DB = -12.0  # weight_db at or below which a cue is background texture
+STEPS_BACKGROUND_FACTOR = 0.5  # Step multiplier for background cues (linear up to 1.0 at STEPS_FOREGROUND_DB)
+LATENCY_BUDGET_S = float(os.getenv("LATENCY_BUDGET_S", "0"))  # Default generation budget per request; 0 = none
+
+# Model checkpoints (also part of the clip cache key)
+TANGOFLUX_MODEL_NAME = "declare-lab/TangoFlux"
+PARLER_TTS_MODEL_NAME = "ai4bharat/indic-parler-tts"
+PARLER_TTS_SEED = 42
+PARLER_TTS_SAMPLING = "seeded-per-sentence"  # sampling scheme; changing it invalidates cached narration
+GLINER_MODEL_NAME = "urchade/gliner_medium-v2.1"
+
+# Model loading: every model is loaded lazily on first use (helper/model_registry.py).
+# PRELOAD_ENDPOINTS lists the endpoints this pod serves; their models are warmed at startup.
+ENDPOINT_MODELS = {
+    "decide-cues": [],  # Gemini; spaCy only loads if the LLM fails
+    "generate-audio": ["tangoflux", "parler_tts"],
+    "generate-from-story": ["tangoflux", "parler_tts"],
+    "evaluate-audio": ["clap"],
+}
+PRELOAD_ENDPOINTS = [
+    e.strip() for e in os.getenv("PRELOAD_ENDPOINTS", "generate-audio,generate-from-story").split(",") if e.strip()
+]
+PRELOAD_IN_BACKGROUND = os.getenv("PRELOAD_IN_BACKGROUND", "1") != "0"  # Serve requests while warming
 
 # Parallel execution configuration
 PARALLEL_EXECUTION = True  # Set to False for sequential execution (thread-safe but slower)
-PARALLEL_WORKERS = 2  # Number of worker threads/processes for parallel execution (default: 2)
+PARALLEL_WORKERS = int(os.getenv("PARALLEL_WORKERS", "2"))  # Number of worker threads/processes for parallel execution (default: 2)
+# Execution backend for cue generation: "thread" (one process, pooled models) or "process"
+# (spawned worker processes, each with its own models and pinned torch threads)
+EXECUTION_BACKEND = os.getenv("EXECUTION_BACKEND", "thread")
+PROCESS_WORKERS = int(os.getenv("PROCESS_WORKERS", str(PARALLEL_WORKERS)))
+PROCESS_TORCH_THREADS = int(os.getenv("PROCESS_TORCH_THREADS", "0"))  # 0 = cpu_count // PROCESS_WORKERS
+PROCESS_PRELOAD_MODELS = ["tangoflux"]  # Loaded by each worker at start-up; others load on first use
+# Model pools (helper/model_pool.py): each generate call leases one instance. Pools load instances
+# on demand up to their maximum while available memory (cgroup limit or MemAvailable) covers
+# another instance plus MODEL_POOL_MEMORY_HEADROOM_BYTES, and unload instances idle for
+# MODEL_POOL_IDLE_TTL_S (keeping one). *_INSTANCE_BYTES is the footprint estimate until the
+# first load has been measured.
+TANGOFLUX_POOL_MAX = int(os.getenv("TANGOFLUX_POOL_MAX", "0"))  # 0 = PARALLEL_WORKERS (one on a GPU)
+TANGOFLUX_INSTANCE_BYTES = int(os.getenv("TANGOFLUX_INSTANCE_BYTES", str(3 * 1024**3)))
+# Shared weights: TangoFlux parameters are loaded once and every pooled instance is an inference
+# context over them (own scheduler state, own activations), sized by TANGOFLUX_CONTEXT_BYTES.
+# Off (default until verified under concurrent load): every pooled instance is a full copy of
+# the model (TANGOFLUX_INSTANCE_BYTES each).
+TANGOFLUX_SHARED_WEIGHTS = os.getenv("TANGOFLUX_SHARED_WEIGHTS", "0") == "1"
+TANGOFLUX_CONTEXT_BYTES = int(os.getenv("TANGOFLUX_CONTEXT_BYTES", str(384 * 1024**2)))
+# ParlerTTS instances checked out by concurrent narration batches (each instance serves one call at a time)
+PARLER_TTS_POOL_SIZE = int(os.getenv("PARLER_TTS_POOL_SIZE", str(PARALLEL_WORKERS)))
+PARLER_TTS_INSTANCE_BYTES = int(os.getenv("PARLER_TTS_INSTANCE_BYTES", str(2 * 1024**3)))
+# CPU fast path for TangoFlux and ParlerTTS on CPU-only nodes (helper/cpu_inference.py), opt-in:
+# "int8" (dynamically quantized Linear layers) or "bf16" (autocast; needs native AVX512-BF16/AMX,
+# else fp32). Both add inference_mode and size torch threads to cores / PARALLEL_WORKERS.
+# Check quality against fp32 with `python -m benchmarks.cpu_fast_path` before enabling.
+CPU_FAST_PATH = os.getenv("CPU_FAST_PATH", "")
+CPU_TORCH_THREADS = int(os.getenv("CPU_TORCH_THREADS", "0"))  # 0 = cpu_count // PARALLEL_WORKERS
+CPU_FAST_PATH_MAX_CLAP_DROP = 0.02  # Quality guard: allowed drop in mean CLAP score vs fp32
+MODEL_POOL_IDLE_TTL_S = float(os.getenv("MODEL_POOL_IDLE_TTL_S", "600"))
+MODEL_POOL_LEASE_TIMEOUT_S = float(os.getenv("MODEL_POOL_LEASE_TIMEOUT_S", "900"))  # waiting longer raises PoolTimeoutError
+MODEL_POOL_MEMORY_HEADROOM_BYTES = int(os.getenv("MODEL_POOL_MEMORY_HEADROOM_BYTES", str(1024**3)))
+
+# Cue scheduling: cues are dispatched longest-first by estimated cost.
+# Prior cost per audio_type: (overhead_s, seconds per second of audio); refined from measured runs
+CUE_COST_PRIORS = {
+    "SFX": (2.0, 1.5),
+    "AMBIENCE": (2.0, 1.5),
+    "MUSIC": (2.0, 1.5),
+    "NARRATOR": (1.0, 1.0),
+    "MOVIE_BGM": (0.05, 0.01),
+}
+CUE_COST_EWMA_ALPHA = 0.3  # Weight of the newest measurement in the learned rate
 
 
 SFX_RATE=44100
@@ -47,9 +125,97 @@ ENV_GAIN=0.7
 EMOTIONAL_RATE=44100
 EMOTIONAL_GAIN=0.8
 
+# Output format (frame rate, gain) of each TangoFlux-backed audio type
+TANGOFLUX_OUTPUT_FORMAT = {
+    "SFX": (SFX_RATE, SFX_GAIN),
+    "AMBIENCE": (ENV_RATE, ENV_GAIN),
+    "MUSIC": (EMOTIONAL_RATE, EMOTIONAL_GAIN),
+}
 
-PATH_TO_MOVIE_BGMS = "data/movie_bgms"
-PATH_TO_MOVIE_BGM_METADATA = "data/metadata/movie_bgms.csv"
+# Batched TangoFlux inference: cues sharing steps and duration run in one diffusion call
+# (TangoFlux conditions on duration, so a cue is never generated longer and trimmed)
+TANGOFLUX_BATCHING = True
+TANGOFLUX_BATCH_SIZE = 4        # Max prompts per batched call
+TANGOFLUX_GUIDANCE_SCALE = 4.5  # Same default as TangoFluxInference.generate
 
 
-SOUND_TYPES = ["SFX", "AMBIENCE", "MUSIC", "NARRATOR","MOVIE_BGM"]
\ No newline at end of file
+PATH_TO_MOVIE_BGMS = "data/movie_bgms"
+PATH_TO_MOVIE_BGM_METADATA = "data/metadata/movie_bgms.csv"
+# Pre-decoded MOVIE_BGM library: raw int16 PCM at a fixed rate, memory-mapped on demand
+# (fill it with `python -m helper.movie_bgm_library`; files missing from it are decoded on first use)
+MOVIE_BGM_PCM_DIR = "data/movie_bgms_pcm"
+MOVIE_BGM_SAMPLE_RATE = 44100
+MOVIE_BGM_CHANNELS = 2
+# MOVIE_BGM duration fitting: tracks within this speed range of the cue are time-stretched
+# (pitch preserved) to the cue duration; longer tracks are trimmed, shorter ones padded
+MOVIE_BGM_MIN_STRETCH_RATE = 0.8
+MOVIE_BGM_MAX_STRETCH_RATE = 1.25
+
+# Phase-vocoder time stretch (helper/audio_processing.py)
+TIME_STRETCH_N_FFT = 2048
+TIME_STRETCH_HOP = 512
+TIME_STRETCH_BLOCK_FRAMES = 512  # STFT frames processed at once
+
+# LLM cue decision
+GEMINI_MODEL_NAME = "gemini-2.5-flash"
+DECISION_CACHE_ENABLED = os.getenv("DECISION_CACHE_ENABLED", "1") != "0"
+DECISION_CACHE_PATH = os.getenv(
+    "DECISION_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "decisions.sqlite3"),
+)
+DECISION_CACHE_TTL_S = int(os.getenv("DECISION_CACHE_TTL_S", str(7 * 24 * 3600)))  # 7 days
+
+# Long stories are split at paragraph/sentence boundaries and decided chunk by chunk, concurrently
+LLM_CHUNKING_ENABLED = True
+LLM_CHUNK_WORDS = 800         # Max words per chunk; shorter stories go in a single prompt
+LLM_CHUNK_CONCURRENCY = 4     # Chunks decided at once
+
+
+SOUND_TYPES = ["SFX", "AMBIENCE", "MUSIC", "NARRATOR","MOVIE_BGM"]
+
+# Mix bus configuration (superimposition)
+MIX_FRAME_RATE = 44100  # Every cue is resampled to this rate before mixing
+MIX_CHANNELS = 1        # Bus starts mono and widens to stereo if a stereo cue is added
+
+
+# Generated clip cache configuration
+CLIP_CACHE_ENABLED = os.getenv("CLIP_CACHE_ENABLED", "1") != "0"
+CLIP_CACHE_DIR = os.getenv(
+    "CLIP_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "clips"),
+)
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))  # 2 GB
+SINGLE_FLIGHT_ENABLED = True  # Concurrent identical cue generations (within or across requests) share one run
+
+
+# Background job configuration (async render API)
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", str(PARALLEL_WORKERS)))  # Renders running at once, off the event loop
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "16"))     # Queued + running renders before a job or sync render is refused (429)
+JOB_TTL_S = int(os.getenv("JOB_TTL_S", "3600"))               # Finished jobs (and results) are kept this long
+JOB_EVENT_POLL_S = 0.5                                        # SSE stream poll interval
+
+
+# Binary audio responses
+AUDIO_STREAM_CHUNK_BYTES = 64 * 1024  # Chunk size for streamed audio bodies
+
+# Incremental (streamed) render: the mixed timeline is emitted in windows as it is generated
+STREAM_WINDOW_MS = 5000     # Length of each rendered window
+STREAM_LOOKAHEAD_MS = 5000  # Non-narrator cues are generated once they start this close to the current window
+
+
+# Evaluation (CLAP)
+CLAP_SAMPLE_RATE = 48000  # laion_clap expects mono 48 kHz input
+CLAP_BATCH_SIZE = 16      # (audio, text) pairs per CLAP forward pass
+EVAL_SAMPLE_RATE = 22050  # feature-metric analysis rate (librosa default)
+
+# Narrator TTS: narration is split into sentences, generated as padded batches,
+# cached per sentence and stitched with short crossfades
+NARRATION_SENTENCE_SPLIT = True
+NARRATION_BATCH_SIZE = 8           # sentences per ParlerTTS generate call
+NARRATION_MIN_SENTENCE_CHARS = 20  # shorter fragments are merged into the next sentence
+NARRATION_CROSSFADE_MS = 30
+
+
+# Metrics (Prometheus text format on GET /metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+METRICS_BUCKETS_S = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)  # histogram upper bounds
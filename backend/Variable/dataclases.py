@@ -1,4 +1,4 @@
-from headers.imports import dataclass
+from headers.imports import dataclass, AudioSegment
 from pydantic import BaseModel, Field
 from typing import Optional, List, Union, Sequence
 from Variable.configurations import READING_SPEED_WPS
@@ -16,6 +16,7 @@ class AudioCue(BaseCue):
     audio_class: str  # Prompt to send to the specialist (e.g., "rain", "dog bark")
     weight_db: float  # Volume adjustment in decibels (dB)
     fade_ms: int = 500  # Default fade in/out time
+    steps: Optional[int] = None  # Diffusion steps (SFX/AMBIENCE/MUSIC); None = chosen by helper/step_policy.py
 @dataclass
 class NarratorCue(BaseCue):
     """Stores all information needed for a narrator TTS cue."""
@@ -30,6 +31,13 @@ class AudioCueWithAudioBase64:
     audio_base64: str
     duration_ms: int
 
+@dataclass
+class AudioCueWithAudio:
+    """Generated cue audio kept as PCM, for the binary/streaming endpoints."""
+    audio_cue: Cue
+    audio: AudioSegment
+    duration_ms: int
+
 # Request/Response Models
 class DecideCuesRequest(BaseModel):
     story_text: str = Field(..., description="The story text to analyze")
@@ -47,11 +55,13 @@ class CueRequest(BaseModel):
     audio_class: Optional[str] = None
     weight_db: Optional[float] = None
     fade_ms: Optional[int] = None
+    steps: Optional[int] = None
     story: Optional[str] = None
     narrator_description: Optional[str] = None
 class GenerateAudioFromCuesRequest(BaseModel):
     cues: List[CueRequest]
     total_duration_ms: int
+    latency_budget_s: Optional[float] = Field(None, description="Target generation time; diffusion steps are lowered to fit it")
     
 class GenerateAudioFromCuesResponse(BaseModel):
     audio_cues: List[AudioCueWithAudioBase64]
@@ -60,6 +70,7 @@ class GenerateAudioFromCuesResponse(BaseModel):
 class GenerateFromStoryRequest(BaseModel):
     story_text: str = Field(..., description="The story text to process")
     speed_wps: Optional[float] = Field(READING_SPEED_WPS, description="Words per second reading speed")
+    latency_budget_s: Optional[float] = Field(None, description="Target generation time; diffusion steps are lowered to fit it")
     
 class GenerateFromStoryResponse(BaseModel):
     audio_base64: str = Field(..., description="Base64 encoded WAV audio data")
@@ -83,3 +94,27 @@ class EvaluateAudioResponse(BaseModel):
     noise_floor: float = Field(..., description="The noise floor of the audio")
     audio_onsets: int = Field(..., description="The number of audio onsets in the audio")
     message: str = Field(..., description="Message indicating success or failure")
+
+class EvaluateAudioBatchRequest(BaseModel):
+    items: List[EvaluateAudioRequest] = Field(..., description="(audio, text) pairs to evaluate together")
+
+class EvaluateAudioBatchResponse(BaseModel):
+    results: List[EvaluateAudioResponse] = Field(..., description="One result per item, in request order")
+    message: str = Field(..., description="Message indicating success or failure")
+
+class JobSubmitResponse(BaseModel):
+    job_id: str = Field(..., description="Id of the queued render job")
+    status: str = Field(..., description="Job status (queued, running, completed, failed)")
+    status_url: str = Field(..., description="Poll this URL for status and, once completed, the result")
+    events_url: str = Field(..., description="Server-Sent Events stream of per-cue progress")
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    kind: str = Field(..., description="generate-audio or generate-from-story")
+    status: str = Field(..., description="Job status (queued, running, completed, failed)")
+    total_cues: int = Field(0, description="Number of cues to generate (0 until known)")
+    completed_cues: int = Field(0, description="Number of cues finished so far")
+    error: Optional[str] = Field(None, description="Error message if the job failed")
+    result: Optional[Union[GenerateAudioFromCuesResponse, GenerateFromStoryResponse]] = Field(
+        None, description="Same payload as the synchronous endpoint, once completed"
+    )
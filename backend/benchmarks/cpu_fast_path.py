@@ -0,0 +1,112 @@
+"""
+Benchmark and quality guard: the CPU fast path (CPU_FAST_PATH) against fp32.
+
+Generates a fixed prompt set with TangoFlux on CPU, once in fp32 and once per
+fast-path mode, with the same seeds, steps and durations. Every call is timed
+and every clip is scored with CLAP against its prompt. A mode fails the guard
+when its mean CLAP score drops more than CPU_FAST_PATH_MAX_CLAP_DROP below
+fp32, and the script then exits 1. Thread tuning is applied to every run,
+fp32 included, so the timings compare precision only.
+
+Needs the real models (torch, tangoflux, laion_clap). One TangoFlux copy is
+loaded at a time.
+
+Run from backend/:
+    python -m benchmarks.cpu_fast_path [--modes int8,bf16] [--steps 48] [--duration 5] [--out results.json]
+"""
+import argparse
+import gc
+import json
+import statistics
+import sys
+import time
+
+import librosa
+import numpy as np
+
+from Variable.configurations import STEPS, CLAP_SAMPLE_RATE, CPU_FAST_PATH_MAX_CLAP_DROP
+from helper.lib import TangoFluxModel
+from helper.cpu_inference import cpu_inference, resolve_mode, tune_threads
+from Evaluation.evaluator import AudioEvaluator
+
+PROMPTS = [
+    "heavy rain falling on a tin roof",
+    "a dog barking in the distance",
+    "footsteps on a wooden floor",
+    "a door creaking open slowly",
+    "thunder rumbling over a city",
+    "birds chirping in a quiet forest",
+    "a car engine starting and driving away",
+    "glass shattering on a stone floor",
+    "tense orchestral strings, suspenseful",
+    "waves crashing on a rocky shore",
+]
+SEED = 1234
+
+def run_mode(mode: str, steps: int, duration: int):
+    """Generate every prompt in `mode` ("" = fp32): per-prompt seconds and mono 48 kHz waveforms."""
+    import torch
+
+    TangoFluxModel._device = "cpu"
+    model = TangoFluxModel._create_model(cpu_mode=mode)
+    sample_rate = model.vae.config.sampling_rate
+    seconds, waveforms = [], []
+    for index, prompt in enumerate(PROMPTS):
+        torch.manual_seed(SEED + index)
+        start = time.perf_counter()
+        with cpu_inference(mode):
+            wave = model.generate(prompt, steps=steps, duration=duration)
+        seconds.append(time.perf_counter() - start)
+        mono = wave.float().numpy().mean(axis=0).astype(np.float32)
+        waveforms.append(librosa.resample(mono, orig_sr=sample_rate, target_sr=CLAP_SAMPLE_RATE))
+    del model
+    gc.collect()
+    return seconds, waveforms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="int8,bf16", help="Comma-separated fast-path modes to compare with fp32")
+    parser.add_argument("--steps", type=int, default=STEPS)
+    parser.add_argument("--duration", type=int, default=5, help="Seconds of audio per prompt")
+    parser.add_argument("--out", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    tune_threads()
+    evaluator = AudioEvaluator.get_instance()
+    results = {"steps": args.steps, "duration_s": args.duration, "prompts": len(PROMPTS),
+               "max_clap_drop": CPU_FAST_PATH_MAX_CLAP_DROP, "modes": {}}
+    baseline = None
+    failed = False
+    for mode in [""] + [m for m in args.modes.split(",") if m]:
+        effective = resolve_mode(mode)
+        if mode and not effective:
+            results["modes"][mode] = {"skipped": "not supported on this CPU"}
+            continue
+        seconds, waveforms = run_mode(effective, args.steps, args.duration)
+        scores = evaluator.get_clap_scores_from_waveforms(waveforms, PROMPTS)
+        entry = {
+            "median_s": statistics.median(seconds),
+            "mean_clap": statistics.fmean(scores),
+            "min_clap": min(scores),
+            "clap": scores,
+        }
+        if baseline is None:
+            baseline = entry
+        else:
+            entry["speedup"] = baseline["median_s"] / entry["median_s"]
+            entry["clap_drop"] = baseline["mean_clap"] - entry["mean_clap"]
+            entry["passed"] = entry["clap_drop"] <= CPU_FAST_PATH_MAX_CLAP_DROP
+            failed = failed or not entry["passed"]
+        results["modes"][mode or "fp32"] = entry
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    if failed:
+        print(f"Quality guard failed: mean CLAP dropped more than {CPU_FAST_PATH_MAX_CLAP_DROP} vs fp32", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
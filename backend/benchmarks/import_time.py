@@ -0,0 +1,50 @@
+"""
+Import-time budget check for the API server.
+
+Imports `server` in a fresh interpreter and fails (exit code 1) if it takes
+longer than IMPORT_TIME_BUDGET_S, or if any heavy model library was imported
+as a side effect. Models must load lazily through helper.model_registry so
+that `uvicorn server:app` is ready in seconds.
+
+Run from backend/:
+    python -m benchmarks.import_time
+"""
+import json
+import os
+import subprocess
+import sys
+
+IMPORT_TIME_BUDGET_S = float(os.getenv("IMPORT_TIME_BUDGET_S", "5"))
+HEAVY_MODULES = ["torch", "tangoflux", "parler_tts", "transformers", "laion_clap", "spacy", "gliner", "google.genai"]
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({{"import_s": elapsed, "heavy_modules": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def probe() -> dict:
+    """Import `server` in a fresh interpreter: {"import_s": seconds, "heavy_modules": [...]}."""
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=backend_dir, capture_output=True, text=True, check=True
+    ).stdout.strip().splitlines()[-1]
+    return json.loads(out)
+
+def main():
+    result = probe()
+    result["budget_s"] = IMPORT_TIME_BUDGET_S
+    print(json.dumps(result, indent=2))
+    failures = []
+    if result["import_s"] > IMPORT_TIME_BUDGET_S:
+        failures.append(f"import took {result['import_s']:.2f}s (budget {IMPORT_TIME_BUDGET_S}s)")
+    if result["heavy_modules"]:
+        failures.append(f"heavy modules imported eagerly: {result['heavy_modules']}")
+    if failures:
+        print("FAILED: " + "; ".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: token -> word alignment used by _extract_audio_cues_nlp.
+
+Compares the previous alignment (re-lowercasing the story for every word and
+scanning all word positions for every token) with the indexed one
+(_build_word_starts + _word_index_at), on synthetic stories of 100 to 20,000
+words. Tokens are generated like spaCy's: one per word plus trailing
+punctuation, so multi-token words are exercised. If spaCy is installed, the
+full _extract_audio_cues_nlp is timed as well.
+
+Run from backend/:
+    python -m benchmarks.nlp_alignment
+"""
+import json
+import random
+import sys
+import time
+
+from Tools.decide_audio import _build_word_starts, _word_index_at, _extract_audio_cues_nlp, get_nlp
+
+SIZES = [100, 1000, 5000, 20000]
+LEGACY_MAX_WORDS = 5000  # The quadratic version takes minutes beyond this
+VOCAB = ["the", "rain", "started", "so", "i", "ran", "to", "shelter", "where", "dog", "barking",
+         "loud", "suddenly", "forest", "quiet", "footsteps", "door", "creaked", "don't", "night"]
+
+def make_story(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    for i in range(n_words):
+        word = rng.choice(VOCAB)
+        if i % 12 == 11:
+            word += "."
+        elif i % 7 == 6:
+            word += ","
+        words.append(word)
+    return " ".join(words)
+
+def make_token_starts(story: str):
+    """Character offsets of tokens: each word, plus a separate token for trailing punctuation."""
+    starts = []
+    idx = 0
+    for word in story.split(" "):
+        starts.append(idx)
+        if word[-1] in ".,":
+            starts.append(idx + len(word) - 1)
+        idx += len(word) + 1
+    return starts
+
+def legacy_alignment(story: str, token_starts):
+    words = story.lower().split()
+    word_positions = []
+    char_idx = 0
+    for word in words:
+        pos = story.lower().find(word, char_idx)
+        if pos != -1:
+            word_positions.append((pos, word))
+            char_idx = pos + len(word)
+        else:
+            word_positions.append((char_idx, word))
+            char_idx += len(word) + 1
+    result = []
+    for token_start in token_starts:
+        word_idx = 0
+        for i, (pos, word) in enumerate(word_positions):
+            if pos <= token_start < pos + len(word):
+                word_idx = i
+                break
+        result.append(word_idx)
+    return result
+
+def indexed_alignment(story: str, token_starts):
+    word_starts = _build_word_starts(story)
+    return [_word_index_at(word_starts, start) for start in token_starts]
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+def main():
+    nlp_available = get_nlp() is not None
+    rows = []
+    for n_words in SIZES:
+        story = make_story(n_words)
+        token_starts = make_token_starts(story)
+        row = {"words": n_words, "tokens": len(token_starts)}
+        row["indexed_s"], indexed = timed(indexed_alignment, story, token_starts)
+        row["indexed_us_per_token"] = row["indexed_s"] / len(token_starts) * 1e6
+        if n_words <= LEGACY_MAX_WORDS:
+            row["legacy_s"], legacy = timed(legacy_alignment, story, token_starts)
+            assert legacy == indexed, "alignments differ"
+        if nlp_available:
+            row["extract_nlp_s"], _ = timed(_extract_audio_cues_nlp, story, 2.0)
+        rows.append(row)
+        print(json.dumps(row), file=sys.stderr)
+    print(json.dumps(rows, indent=2))
+
+if __name__ == "__main__":
+    main()
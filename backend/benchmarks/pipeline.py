@@ -0,0 +1,289 @@
+"""
+End-to-end pipeline benchmark with stubbed models.
+
+TangoFlux, ParlerTTS, Gemini and CLAP are replaced by fast deterministic
+stand-ins that return output of realistic size (44.1 kHz clips as long as
+the cue, narration as long as the sentence takes to read, cue JSON shaped
+like Gemini's), so only our own pipeline code is timed:
+
+    decide        decide_audio_cues (prompting, chunking, JSON parsing, cue building)
+    generate      parallel_audio_generation (specialist wrappers, fades, per-cue base64)
+    mix_base64    superimpose_audio_cues_with_audio_base64 on the generated cues
+    mix_cues      superimpose_audio_cues (re-renders every cue, then mixes)
+    encode        audio_to_base64 of the final mix
+    evaluate      AudioEvaluator.analyze of the final mix (features + CLAP stand-in)
+
+Stories run from 100 to 20,000 words. Audio-sized stages are skipped above
+--mix-limit-words, as a 20,000-word story is close to three hours of audio.
+Caches (clip and LLM decision) are disabled so every repeat does the work.
+
+Results are printed as JSON; save them and pass the file to --compare on a
+later commit to flag stages that got slower (exit code 1 on regression).
+
+Run from backend/:
+    python -m benchmarks.pipeline
+    python -m benchmarks.pipeline --out before.json
+    python -m benchmarks.pipeline --compare before.json
+"""
+import argparse
+import contextlib
+import json
+import logging
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+# Must be set before the pipeline modules read their configuration
+os.environ["CLIP_CACHE_ENABLED"] = "0"
+os.environ["DECISION_CACHE_ENABLED"] = "0"
+
+import numpy as np
+
+with contextlib.redirect_stdout(sys.stderr):  # some modules print at import; stdout is for the JSON
+    from helper.movie_bgm_library import MovieBgmLibrary
+    import specialist_model.text_to_speech_generator as text_to_speech
+    from Evaluation.evaluator import AudioEvaluator
+    from Tools.decide_audio import decide_audio_cues, set_llm_backend
+    from Variable.configurations import READING_SPEED_WPS, SFX_RATE
+    from helper.audio_conversions import audio_to_base64
+    from helper.lib import ParlerTTSModel, TangoFluxModel
+    from helper.parallel_audio_generation import parallel_audio_generation
+    from superimposition_model.superimposition_model import (
+        superimpose_audio_cues,
+        superimpose_audio_cues_with_audio_base64,
+    )
+
+SIZES = [100, 1000, 5000, 20000]
+MIX_LIMIT_WORDS = 2000  # Longer stories only run the decide stage (memory)
+REGRESSION_THRESHOLD = 0.25  # Relative slowdown flagged by --compare
+REGRESSION_MIN_DELTA_S = 0.05  # ...ignoring differences below this (timer noise)
+
+TTS_SAMPLE_RATE = 44100
+CLAP_EMBED_DIM = 512
+VOCAB = ["the", "rain", "started", "so", "i", "ran", "to", "shelter", "where", "dog", "barking",
+         "loud", "suddenly", "forest", "quiet", "footsteps", "door", "creaked", "thunder", "night"]
+SFX_EVERY_WORDS = 40
+MUSIC_EVERY_WORDS = 200
+SFX_DURATION_MS = 2000
+MUSIC_DURATION_MS = 8000
+_STORY_PATTERN = re.compile(r'Story: "?(.*?)"?\nReading Speed: ([\d.]+)', re.S)
+
+def make_story(n_words: int, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = []
+    for i in range(n_words):
+        word = rng.choice(VOCAB)
+        if i % 12 == 11:
+            word += "."
+        elif i % 7 == 6:
+            word += ","
+        words.append(word)
+        if i % 120 == 119:
+            words[-1] = words[-1].rstrip(".,") + ".\n\n"
+    return " ".join(words)
+
+def _seed(text: str) -> int:
+    return zlib.crc32(text.encode("utf-8"))
+
+def _noise(text: str, n_samples: int, amplitude: float = 0.3) -> np.ndarray:
+    """Deterministic float32 noise for `text`, tiled from one second so it costs a memcpy, not an RNG pass."""
+    block = np.random.default_rng(_seed(text)).uniform(-amplitude, amplitude, SFX_RATE).astype(np.float32)
+    return np.resize(block, n_samples)
+
+# Stand-ins
+
+def fake_llm(prompt: str) -> str:
+    """Gemini stand-in: a narrator cue, one ambience bed, an SFX every SFX_EVERY_WORDS words and
+    music every MUSIC_EVERY_WORDS words, timed from the story in the prompt."""
+    match = _STORY_PATTERN.search(prompt)
+    story, speed_wps = match.group(1), float(match.group(2))
+    n_words = len(story.split())
+    total_ms = int(n_words / speed_wps * 1000)
+    cues = [
+        {"audio_type": "NARRATOR", "word_index": 0, "start_time_ms": 0, "duration_ms": total_ms,
+         "story": story, "narrator_description": "A calm narrator with a clear, close recording."},
+        {"audio_class": "rain on a tin roof", "audio_type": "AMBIENCE", "word_index": 0,
+         "start_time_ms": 0, "duration_ms": total_ms, "weight_db": -6.0},
+    ]
+    for word_index in range(SFX_EVERY_WORDS // 2, n_words, SFX_EVERY_WORDS):
+        cues.append({"audio_class": f"{VOCAB[word_index % len(VOCAB)]} sound", "audio_type": "SFX",
+                     "word_index": word_index, "start_time_ms": int(word_index / speed_wps * 1000),
+                     "duration_ms": SFX_DURATION_MS, "weight_db": 0.0})
+    for word_index in range(MUSIC_EVERY_WORDS // 2, n_words, MUSIC_EVERY_WORDS):
+        cues.append({"audio_class": "tense strings", "audio_type": "MUSIC",
+                     "word_index": word_index, "start_time_ms": int(word_index / speed_wps * 1000),
+                     "duration_ms": MUSIC_DURATION_MS, "weight_db": -3.0})
+    return "```json\n" + json.dumps(cues) + "\n```"
+
+class _FakeTensor(np.ndarray):
+    """numpy array with the few torch.Tensor methods the specialists call."""
+
+    def numel(self):
+        return self.size
+
+    def cpu(self):
+        return self
+
+    def numpy(self):
+        return np.asarray(self)
+
+class _FakeTangoFlux:
+    """TangoFluxInference stand-in: (1, duration * 44.1 kHz) of noise seeded by the prompt."""
+
+    def generate(self, prompt, steps, duration):
+        return _noise(prompt, max(1, int(duration)) * SFX_RATE).reshape(1, -1).view(_FakeTensor)
+
+def _fake_tts_batch(prompts, description):
+    """ParlerTTS stand-in: each sentence lasts as long as it takes to read at READING_SPEED_WPS."""
+    return [
+        _noise(description + prompt, int(len(prompt.split()) / READING_SPEED_WPS * TTS_SAMPLE_RATE))
+        for prompt in prompts
+    ]
+
+def _fake_clap_scores(waveforms, text_prompts):
+    """CLAP stand-in: cosine similarity of a pooled-spectrum audio vector and a seeded text vector."""
+    scores = []
+    for waveform, text in zip(waveforms, text_prompts):
+        usable = len(waveform) // CLAP_EMBED_DIM * CLAP_EMBED_DIM
+        audio_embed = np.abs(waveform[:usable]).reshape(CLAP_EMBED_DIM, -1).mean(axis=1)
+        text_embed = np.random.default_rng(_seed(text)).standard_normal(CLAP_EMBED_DIM)
+        denom = np.linalg.norm(audio_embed) * np.linalg.norm(text_embed)
+        scores.append(float(audio_embed @ text_embed / denom) if denom else 0.0)
+    return scores
+
+def install_stubs():
+    set_llm_backend(fake_llm)
+    # An empty BGM catalogue: the real read_movie_bgms_csv / decision-cache path still runs
+    metadata_path = os.path.join(tempfile.mkdtemp(prefix="bench-bgm-"), "movie_bgms.csv")
+    with open(metadata_path, "w") as f:
+        f.write("file_name,mood\n")
+    MovieBgmLibrary._instance = MovieBgmLibrary(metadata_path=metadata_path)
+    TangoFluxModel._create_model = classmethod(lambda cls: _FakeTangoFlux())
+    TangoFluxModel._device = "cpu"  # skips torch device detection
+    text_to_speech._generate_batch = _fake_tts_batch
+    config = type("Config", (), {"sampling_rate": TTS_SAMPLE_RATE})()
+    ParlerTTSModel._create_model = classmethod(lambda cls: {"model": type("Model", (), {"config": config})()})
+    ParlerTTSModel._sampling_rate = TTS_SAMPLE_RATE  # skips reading the model config
+    evaluator = object.__new__(AudioEvaluator)  # skips loading torch and CLAP
+    evaluator.clap_model = None
+    evaluator.device = "cpu"
+    evaluator._clap_lock = threading.Lock()
+    evaluator.get_clap_scores_from_waveforms = _fake_clap_scores
+    AudioEvaluator._instance = evaluator
+
+# Measurement
+
+def timed(func, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(sys.stderr):  # the pipeline prints progress; keep stdout for JSON
+        result = func(*args)
+    return time.perf_counter() - start, result
+
+def run_once(story: str, with_audio: bool):
+    times = {}
+    times["decide"], (cues, total_duration_ms) = timed(decide_audio_cues, story, READING_SPEED_WPS)
+    info = {"cues": len(cues), "audio_s": total_duration_ms / 1000}
+    if not with_audio:
+        return times, info
+    times["generate"], generated = timed(parallel_audio_generation, cues)
+    times["mix_base64"], mix = timed(superimpose_audio_cues_with_audio_base64, generated, total_duration_ms)
+    times["mix_cues"], _ = timed(superimpose_audio_cues, cues, total_duration_ms)
+    times["encode"], mix_base64 = timed(audio_to_base64, mix)
+    times["evaluate"], _ = timed(AudioEvaluator.get_instance().analyze, mix_base64, story[:200])
+    info["generated"] = len(generated)
+    return times, info
+
+def benchmark(sizes, repeat: int, mix_limit_words: int):
+    rows = []
+    for n_words in sizes:
+        story = make_story(n_words)
+        samples = {}
+        info = {}
+        for _ in range(repeat):
+            times, info = run_once(story, with_audio=n_words <= mix_limit_words)
+            for stage, seconds in times.items():
+                samples.setdefault(stage, []).append(seconds)
+        row = {
+            "words": n_words,
+            **info,
+            "stages": {
+                stage: {"median_s": statistics.median(values), "min_s": min(values)}
+                for stage, values in samples.items()
+            },
+        }
+        rows.append(row)
+        print(json.dumps(row), file=sys.stderr)
+    return rows
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(baseline: dict, current: dict, threshold: float):
+    """Stages whose median got slower than the baseline by more than `threshold` (and REGRESSION_MIN_DELTA_S)."""
+    before = {(row["words"], stage): t["median_s"] for row in baseline["results"] for stage, t in row["stages"].items()}
+    regressions = []
+    for row in current["results"]:
+        for stage, t in row["stages"].items():
+            old = before.get((row["words"], stage))
+            if old is None:
+                continue
+            new = t["median_s"]
+            if new - old > REGRESSION_MIN_DELTA_S and new > old * (1 + threshold):
+                regressions.append({"words": row["words"], "stage": stage, "baseline_s": old, "current_s": new,
+                                    "ratio": new / old if old else None})
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark with stubbed models")
+    parser.add_argument("--words", default=",".join(str(n) for n in SIZES), help="Comma-separated story lengths")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per story length (median is reported)")
+    parser.add_argument("--mix-limit-words", type=int, default=MIX_LIMIT_WORDS,
+                        help="Only the decide stage runs for longer stories")
+    parser.add_argument("--out", help="Also write the results to this file")
+    parser.add_argument("--compare", help="Baseline results file; exit 1 if any stage regressed")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's INFO logging on stderr")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)  # log calls still run; their output is dropped
+    install_stubs()
+    sizes = [int(n) for n in args.words.split(",") if n.strip()]
+    result = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "results": benchmark(sizes, args.repeat, args.mix_limit_words),
+    }
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        result["baseline_commit"] = baseline.get("commit")
+        result["regressions"] = compare(baseline, result, args.threshold)
+    print(json.dumps(result, indent=2))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+    if result.get("regressions"):
+        print(f"{len(result['regressions'])} stage(s) regressed beyond {args.threshold:.0%}", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Benchmark: quality/latency trade-off of the adaptive diffusion step policy.
+
+0. Scheduler check (needs torch and tangoflux): for every allowed step count,
+   a copy of the TangoFlux scheduler runs set_timesteps and a full step loop
+   as TangoFlux inference does. Only STEPS=48 is known to be safe, so this
+   must pass before ADAPTIVE_STEPS is enabled. Exits 1 on any failure.
+1. Sweep (needs torch, tangoflux and laion_clap): generates a fixed prompt set
+   per TangoFlux audio type at every allowed step count (STEPS_MIN..STEPS in
+   STEPS_QUANTUM increments), with fixed seeds. It reports the median seconds
+   per call and the mean CLAP score, each relative to STEPS.
+2. Policy: the steps helper/step_policy.py gives a representative cue mix,
+   with and without a latency budget. It reports the diffusion work (steps x
+   seconds of audio) relative to running every cue at STEPS. With the sweep,
+   it also reports the expected CLAP change of each cue at its steps.
+
+The policy is evaluated with ADAPTIVE_STEPS=1 unless the environment says otherwise.
+
+Run from backend/:
+    python -m benchmarks.step_policy --check-scheduler
+    python -m benchmarks.step_policy [--policy-only] [--duration 5] [--budget 60] [--workers 2] [--out results.json]
+"""
+import argparse
+import contextlib
+import copy
+import json
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("ADAPTIVE_STEPS", "1")  # the policy under test; off by default in the server
+
+with contextlib.redirect_stdout(sys.stderr):  # some pipeline modules print at import
+    from Variable.configurations import STEPS, STEPS_MIN, STEPS_QUANTUM, CLAP_SAMPLE_RATE
+    from Variable.dataclases import AudioCue
+    from helper.step_policy import cue_steps, plan_steps
+
+PROMPTS = {
+    "SFX": ["a door slamming shut", "a single gunshot", "glass shattering", "a dog barking twice"],
+    "AMBIENCE": ["heavy rain on a window", "busy city street at night", "wind through a forest", "waves on a beach"],
+    "MUSIC": ["tense orchestral strings", "soft sad piano", "upbeat acoustic guitar", "dark ambient drone"],
+}
+SEED = 1234
+
+# Representative cue mix: (audio_type, duration_ms, weight_db)
+CUE_MIX = [
+    ("SFX", 800, 3.0), ("SFX", 1500, 0.0), ("SFX", 2500, -6.0), ("SFX", 2000, -12.0),
+    ("AMBIENCE", 60000, -10.0), ("AMBIENCE", 20000, -6.0), ("AMBIENCE", 8000, 0.0),
+    ("MUSIC", 30000, -3.0), ("MUSIC", 45000, -12.0),
+]
+
+def step_counts():
+    return list(range(STEPS_MIN, STEPS + 1, STEPS_QUANTUM))
+
+def check_scheduler():
+    """Per step count: None if set_timesteps and a full step loop succeed, else the error."""
+    import numpy as np
+    import torch
+    from helper.lib import TangoFluxModel
+
+    with TangoFluxModel.pool().lease() as model:
+        scheduler = copy.deepcopy(model.model.noise_scheduler)
+    failures = {}
+    for steps in step_counts():
+        try:
+            # Same sigmas as TangoFlux inference (retrieve_timesteps)
+            scheduler.set_timesteps(sigmas=np.linspace(1.0, 1 / steps, steps), device="cpu")
+            if len(scheduler.timesteps) != steps:
+                raise ValueError(f"{len(scheduler.timesteps)} timesteps")
+            latents = torch.randn(1, 8, 64)
+            for t in scheduler.timesteps:
+                latents = scheduler.step(torch.randn_like(latents), t, latents).prev_sample
+            if not torch.isfinite(latents).all():
+                raise ValueError("non-finite latents")
+            failures[steps] = None
+        except Exception as e:
+            failures[steps] = f"{type(e).__name__}: {e}"
+    return failures
+
+def sweep(duration_s: int):
+    """Per audio type and step count: median seconds and mean CLAP over PROMPTS[type]."""
+    import librosa
+    import torch
+    from helper.lib import TangoFluxModel
+    from Evaluation.evaluator import AudioEvaluator
+
+    evaluator = AudioEvaluator.get_instance()
+    results = {}
+    with TangoFluxModel.pool().lease() as model:
+        sample_rate = model.vae.config.sampling_rate
+    for audio_type, prompts in PROMPTS.items():
+        per_steps = {}
+        for steps in step_counts():
+            seconds, waveforms = [], []
+            for index, prompt in enumerate(prompts):
+                torch.manual_seed(SEED + index)
+                start = time.perf_counter()
+                wave = TangoFluxModel.generate(prompt, steps=steps, duration=duration_s)
+                seconds.append(time.perf_counter() - start)
+                mono = wave.float().numpy().mean(axis=0)
+                waveforms.append(librosa.resample(mono, orig_sr=sample_rate, target_sr=CLAP_SAMPLE_RATE))
+            scores = evaluator.get_clap_scores_from_waveforms(waveforms, prompts)
+            per_steps[steps] = {"median_s": statistics.median(seconds), "mean_clap": statistics.fmean(scores)}
+        full = per_steps[STEPS]
+        for entry in per_steps.values():
+            entry["relative_latency"] = entry["median_s"] / full["median_s"]
+            entry["clap_delta"] = entry["mean_clap"] - full["mean_clap"]
+        results[audio_type] = per_steps
+    return results
+
+def policy_report(budget_s, workers: int, sweep_results=None):
+    cues = [
+        AudioCue(id=i, audio_type=audio_type, start_time_ms=0, duration_ms=duration_ms,
+                 audio_class=PROMPTS[audio_type][0], weight_db=weight_db)
+        for i, (audio_type, duration_ms, weight_db) in enumerate(CUE_MIX)
+    ]
+    reports = {}
+    for label, budget in (("policy", 0), ("policy+budget", budget_s)):
+        if label == "policy+budget" and not budget:
+            continue
+        with contextlib.redirect_stdout(sys.stderr):
+            planned = plan_steps(cues, budget, workers)
+        full_work = sum(STEPS * cue.duration_ms / 1000 for cue in planned)
+        work = sum(cue_steps(cue) * cue.duration_ms / 1000 for cue in planned)
+        rows = []
+        for cue in planned:
+            row = {"audio_type": cue.audio_type, "duration_ms": cue.duration_ms, "weight_db": cue.weight_db, "steps": cue_steps(cue)}
+            if sweep_results is not None:
+                row["clap_delta"] = sweep_results[cue.audio_type][cue_steps(cue)]["clap_delta"]
+            rows.append(row)
+        reports[label] = {"relative_diffusion_work": work / full_work, "cues": rows}
+    return reports
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check-scheduler", action="store_true", help="Only run the scheduler check")
+    parser.add_argument("--policy-only", action="store_true", help="Skip the model sweep (no models needed)")
+    parser.add_argument("--duration", type=int, default=5, help="Seconds of audio per sweep call")
+    parser.add_argument("--budget", type=float, default=60.0, help="Latency budget (s) for the budgeted policy report")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--out", help="Also write the JSON results to this file")
+    args = parser.parse_args()
+
+    results = {"steps": STEPS, "step_counts": step_counts()}
+    failed = False
+    sweep_results = None
+    if not args.policy_only:
+        failures = check_scheduler()
+        results["scheduler_check"] = {str(s): error or "ok" for s, error in failures.items()}
+        failed = any(failures.values())
+    if not args.policy_only and not args.check_scheduler and not failed:
+        sweep_results = sweep(args.duration)
+        results["sweep"] = {t: {str(s): v for s, v in per.items()} for t, per in sweep_results.items()}
+    if not args.check_scheduler:
+        results.update(policy_report(args.budget, args.workers, sweep_results))
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    if failed:
+        print("Scheduler check failed: do not enable ADAPTIVE_STEPS with these step counts", file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
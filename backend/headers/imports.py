@@ -4,8 +4,6 @@ import sys
 from dataclasses import dataclass, field
 from typing import List, Dict, Tuple
 from pydub import AudioSegment
-import torchaudio
-from IPython.display import Audio
 
 
 # Configure logging
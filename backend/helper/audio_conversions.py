@@ -1,8 +1,12 @@
 import base64
 import io
+import struct
+import numpy as np
+from typing import Iterable, Iterator, Optional
 from pydub import AudioSegment
 from Variable.dataclases import AudioCue, NarratorCue, Cue
-from Variable.configurations import DEFAULT_WEIGHT_DB, SOUND_TYPES
+from Variable.configurations import DEFAULT_WEIGHT_DB, SOUND_TYPES, AUDIO_STREAM_CHUNK_BYTES
+from helper.metrics import Metrics
 
 def dict_to_cue(d: dict) -> Cue:
     """Convert a dict (e.g. from JSON or model_dump) to AudioCue or NarratorCue."""
@@ -26,6 +30,7 @@ def dict_to_cue(d: dict) -> Cue:
         )
     w_db = d.get("weight_db")
     f_ms = d.get("fade_ms")
+    steps = d.get("steps")
     return AudioCue(
         id=sid,
         audio_class=str(d.get("audio_class") or "ambient texture"),
@@ -34,6 +39,7 @@ def dict_to_cue(d: dict) -> Cue:
         duration_ms=dur_ms,
         weight_db=float(w_db) if w_db is not None else DEFAULT_WEIGHT_DB,
         fade_ms=int(f_ms) if f_ms is not None else 500,
+        steps=int(steps) if steps is not None else None,
     )
 
 
@@ -53,19 +59,108 @@ def audio_cue_to_dict(cue: Cue) -> dict:
         base["audio_class"] = cue.audio_class
         base["weight_db"] = cue.weight_db
         base["fade_ms"] = cue.fade_ms
+        base["steps"] = cue.steps
         return base
 
 # Helper function to convert AudioSegment to base64
 def audio_to_base64(audio: AudioSegment, format: str = "wav") -> str:
     """Convert AudioSegment to base64 encoded string"""
-    buffer = io.BytesIO()
-    audio.export(buffer, format=format)
-    buffer.seek(0)
-    audio_bytes = buffer.read()
-    audio_base64 = base64.b64encode(audio_bytes).decode('utf-8')
+    with Metrics.get_instance().stage("encode"):
+        buffer = io.BytesIO()
+        audio.export(buffer, format=format)
+        # Encode straight from the buffer instead of copying its bytes out first
+        audio_base64 = base64.b64encode(buffer.getbuffer()).decode('utf-8')
     return audio_base64
 
 def base64_to_audio(audio_base64: str) -> AudioSegment:
     """Convert base64 encoded string to AudioSegment"""
-    audio_bytes = base64.b64decode(audio_base64)
-    return AudioSegment.from_file(io.BytesIO(audio_bytes))
\ No newline at end of file
+    with Metrics.get_instance().stage("decode"):
+        audio_bytes = base64.b64decode(audio_base64)
+        # Our own clips are WAV: pydub reads those in-process; anything else goes through ffmpeg
+        format = "wav" if audio_bytes[:4] == b"RIFF" and audio_bytes[8:12] == b"WAVE" else None
+        return AudioSegment.from_file(io.BytesIO(audio_bytes), format=format)
+
+# pydub sample_width (bytes) -> numpy dtype of the raw PCM data
+_SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+def segment_to_float32(audio: AudioSegment, frame_rate: Optional[int] = None, channels: Optional[int] = None) -> np.ndarray:
+    """Convert AudioSegment to a float32 array of shape (frames, channels) in [-1, 1].
+
+    Optionally resamples / remixes the segment to the requested frame rate and channel count first.
+    """
+    if frame_rate is not None and audio.frame_rate != frame_rate:
+        audio = audio.set_frame_rate(frame_rate)
+    if channels is not None and audio.channels != channels:
+        audio = audio.set_channels(channels)
+    if audio.sample_width not in _SAMPLE_DTYPES:
+        audio = audio.set_sample_width(2)
+    samples = np.frombuffer(audio.raw_data, dtype=_SAMPLE_DTYPES[audio.sample_width])
+    scale = float(1 << (8 * audio.sample_width - 1))
+    return samples.reshape(-1, audio.channels).astype(np.float32) / scale
+
+def float32_to_segment(samples: np.ndarray, frame_rate: int) -> AudioSegment:
+    """Convert a float32 array of shape (frames,) or (frames, channels) to a 16-bit AudioSegment.
+
+    Samples are clipped to [-1, 1] once, here, rather than on every intermediate step.
+    """
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype(np.int16)
+    return AudioSegment(
+        data=pcm.tobytes(),
+        sample_width=2,
+        frame_rate=frame_rate,
+        channels=samples.shape[1],
+    )
+
+def waveform_to_segment(waveform: np.ndarray, frame_rate: int, gain: float) -> AudioSegment:
+    """Convert a mono float waveform from a specialist model to a 16-bit AudioSegment with the given gain."""
+    audio_bytes = (waveform * 32767 * gain).astype(np.int16).tobytes()
+    return AudioSegment(
+        data=audio_bytes,
+        sample_width=2,
+        frame_rate=frame_rate,
+        channels=1,
+    )
+
+# Media types for the binary audio endpoints
+AUDIO_MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "ogg": "audio/ogg",
+    "flac": "audio/flac",
+}
+
+def wav_header(data_size: int, frame_rate: int, channels: int, sample_width: int) -> bytes:
+    """Build the 44-byte RIFF/WAVE header for `data_size` bytes of PCM."""
+    byte_rate = frame_rate * channels * sample_width
+    return struct.pack(
+        "<4sI4s4sIHHIIHH4sI",
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, channels, frame_rate, byte_rate, channels * sample_width, sample_width * 8,
+        b"data", data_size,
+    )
+
+def iter_wav_bytes(audio: AudioSegment, chunk_size: int = AUDIO_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Yield a WAV file as header + PCM chunks, slicing the segment's buffer without copying it whole."""
+    raw = memoryview(audio.raw_data)
+    yield wav_header(len(raw), audio.frame_rate, audio.channels, audio.sample_width)
+    for start in range(0, len(raw), chunk_size):
+        yield bytes(raw[start:start + chunk_size])
+
+def iter_wav_stream(windows: Iterable[np.ndarray], total_frames: int, frame_rate: int, channels: int) -> Iterator[bytes]:
+    """Yield a 16-bit WAV of `total_frames` frames: the header first, then each float32 window as PCM as it arrives."""
+    yield wav_header(total_frames * channels * 2, frame_rate, channels, 2)
+    for window in windows:
+        yield (np.clip(window, -1.0, 1.0) * 32767).astype(np.int16).tobytes()
+
+def iter_audio_bytes(audio: AudioSegment, format: str = "wav", chunk_size: int = AUDIO_STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    """Yield audio encoded as `format` in chunks; WAV is streamed from the PCM, other formats go through ffmpeg."""
+    if format == "wav":
+        yield from iter_wav_bytes(audio, chunk_size)
+        return
+    buffer = io.BytesIO()
+    audio.export(buffer, format=format)
+    encoded = buffer.getbuffer()
+    for start in range(0, len(encoded), chunk_size):
+        yield bytes(encoded[start:start + chunk_size])
@@ -1,14 +1,114 @@
 # function to stretch compression and stretch expansion
+from typing import Optional
+import numpy as np
 from pydub import AudioSegment
-from pydub.effects import speedup
+from Variable.configurations import TIME_STRETCH_N_FFT, TIME_STRETCH_HOP, TIME_STRETCH_BLOCK_FRAMES
+from helper.audio_conversions import segment_to_float32, float32_to_segment
 
 def slowdown(audio_segment: AudioSegment, stretch_factor: float):
     new_frame_rate = int(audio_segment.frame_rate * stretch_factor)
     slowed = audio_segment._spawn(audio_segment.raw_data, overrides={"frame_rate": new_frame_rate})
     return slowed.set_frame_rate(audio_segment.frame_rate)
 
+def _stft_frames(padded: np.ndarray, first: int, count: int, n_fft: int, hop: int, window: np.ndarray) -> np.ndarray:
+    """rfft of `count` windowed analysis frames starting at frame index `first` (strided view, no copy of the signal)."""
+    frames = np.lib.stride_tricks.sliding_window_view(padded, n_fft)[::hop][first:first + count]
+    return np.fft.rfft(frames * window, axis=1)
+
+def _overlap_add(out: np.ndarray, frames: np.ndarray, first: int, hop: int):
+    """Add frames (count, n_fft) into `out` at offsets (first + k) * hop.
+
+    When hop divides n_fft, frames that are n_fft // hop apart tile exactly, so each
+    residue class is laid end to end and added with one slice operation; any other hop
+    falls back to adding frame by frame.
+    """
+    count, n_fft = frames.shape
+    if n_fft % hop:
+        for k in range(count):
+            start = (first + k) * hop
+            out[start:start + n_fft] += frames[k]
+        return
+    stride = n_fft // hop
+    for r in range(min(stride, count)):
+        group = frames[r::stride]
+        start = (first + r) * hop
+        out[start:start + group.size] += group.reshape(-1)
+
+def _time_stretch_channel(x: np.ndarray, rate: float, n_fft: int, hop: int, block_frames: int) -> np.ndarray:
+    window = np.hanning(n_fft + 1)[:-1].astype(np.float32)  # periodic Hann
+    padded = np.pad(x, (n_fft // 2, n_fft // 2 + n_fft))
+    n_frames = 1 + (len(padded) - n_fft) // hop
+    steps = np.arange(0, n_frames - 1, rate)  # fractional analysis frame per synthesis frame
+    bins = np.arange(n_fft // 2 + 1)
+    expected = (2.0 * np.pi * hop * bins / n_fft).astype(np.float64)
+
+    out = np.zeros(len(steps) * hop + n_fft, dtype=np.float64)
+    phase = None
+    for block_start in range(0, len(steps), block_frames):
+        t = steps[block_start:block_start + block_frames]
+        lo = int(np.floor(t[0]))
+        spectra = _stft_frames(padded, lo, int(np.floor(t[-1])) - lo + 2, n_fft, hop, window)
+        magnitudes, angles = np.abs(spectra), np.angle(spectra)
+        idx = np.floor(t).astype(int) - lo
+        frac = (t - np.floor(t)).astype(np.float32)[:, np.newaxis]
+        magnitude = (1.0 - frac) * magnitudes[idx] + frac * magnitudes[idx + 1]
+
+        # Phase advance per synthesis frame: expected advance plus the wrapped deviation
+        delta = angles[idx + 1] - angles[idx] - expected
+        delta -= 2.0 * np.pi * np.round(delta / (2.0 * np.pi))
+        advance = delta + expected
+        if phase is None:
+            phase = angles[idx[0]].astype(np.float64)
+        phases = phase + np.concatenate([np.zeros((1, len(bins))), np.cumsum(advance[:-1], axis=0)])
+        phase = np.mod(phases[-1] + advance[-1], 2.0 * np.pi)
+
+        frames = np.fft.irfft(magnitude * np.exp(1j * phases), n=n_fft, axis=1) * window
+        _overlap_add(out, frames, block_start, hop)
+
+    # Normalise by the summed squared window (constant in the interior, tapering at the edges)
+    envelope = np.zeros_like(out)
+    _overlap_add(envelope, np.broadcast_to(window.astype(np.float64) ** 2, (len(steps), n_fft)), 0, hop)
+    out /= np.maximum(envelope, 1e-8)
+    target = int(round(len(x) / rate))
+    return out[n_fft // 2:n_fft // 2 + target].astype(np.float32)
+
+def time_stretch(
+    samples: np.ndarray,
+    rate: float,
+    n_fft: int = TIME_STRETCH_N_FFT,
+    hop: int = TIME_STRETCH_HOP,
+    block_frames: int = TIME_STRETCH_BLOCK_FRAMES,
+) -> np.ndarray:
+    """
+    Phase-vocoder time stretch of float samples, (frames,) or (frames, channels), without
+    changing pitch. rate > 1 speeds up (shorter output), rate < 1 slows down; the output has
+    round(frames / rate) frames. The STFT is computed `block_frames` frames at a time, so long
+    tracks never hold their full spectrogram in memory.
+    """
+    if rate <= 0:
+        raise ValueError(f"Stretch rate must be positive, got {rate}")
+    if samples.ndim == 1:
+        return time_stretch(samples[:, np.newaxis], rate, n_fft, hop, block_frames)[:, 0]
+    if rate == 1.0 or len(samples) == 0:
+        return samples.astype(np.float32, copy=True)
+    channels = [_time_stretch_channel(samples[:, c].astype(np.float32), rate, n_fft, hop, block_frames) for c in range(samples.shape[1])]
+    return np.stack(channels, axis=1)
+
+def time_stretch_segment(audio_segment: AudioSegment, rate: float, duration_ms: Optional[int] = None) -> AudioSegment:
+    """Time-stretch an AudioSegment by `rate`; if `duration_ms` is given the result is trimmed or
+    padded with silence to exactly that length."""
+    samples = time_stretch(segment_to_float32(audio_segment), rate)
+    if duration_ms is not None:
+        target = int(round(duration_ms * audio_segment.frame_rate / 1000.0))
+        if len(samples) < target:
+            samples = np.pad(samples, ((0, target - len(samples)), (0, 0)))
+        samples = samples[:target]
+    return float32_to_segment(samples, audio_segment.frame_rate)
+
 def stretch_compression(audio_segment: AudioSegment, stretch_factor: float):
-    return speedup(audio_segment, stretch_factor)
+    """Speed up by `stretch_factor` (> 1) without changing pitch."""
+    return time_stretch_segment(audio_segment, stretch_factor)
 
 def stretch_expansion(audio_segment: AudioSegment, stretch_factor: float):
-    return slowdown(audio_segment, stretch_factor)
+    """Slow down by `stretch_factor` (< 1) without changing pitch."""
+    return time_stretch_segment(audio_segment, stretch_factor)
@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+import logging
+from pydub import AudioSegment
+from Variable.dataclases import AudioCue, Cue
+from Variable.configurations import (
+    TANGOFLUX_OUTPUT_FORMAT,
+    TANGOFLUX_BATCH_SIZE,
+    SINGLE_FLIGHT_ENABLED,
+)
+from helper.audio_conversions import waveform_to_segment
+from helper.lib import TangoFluxModel
+from helper.single_flight import SingleFlight
+from helper.metrics import Metrics
+from helper.step_policy import cue_steps
+from Tools.play_audio import is_clip_cached, generation_key
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class CueBatch:
+    """A group of TangoFlux cues rendered by one batched diffusion call."""
+    steps: int
+    duration_s: int  # Generation length, shared by every cue in the batch
+    cue_indices: List[int] = field(default_factory=list)
+
+def _duration_s(cue: AudioCue) -> int:
+    # Same rounding as the specialist generators
+    return int(cue.duration_ms / 1000.0)
+
+def plan_batches(cues: Sequence[Cue], max_batch_size: int = TANGOFLUX_BATCH_SIZE) -> List[CueBatch]:
+    """
+    Bucket SFX/AMBIENCE/MUSIC cues into batches of equal diffusion steps and equal duration.
+
+    TangoFlux conditions on duration, so a cue generated longer and trimmed would not be the clip
+    its generation key (and the clip cache) stands for; buckets therefore never mix durations.
+    Cues already in the clip cache are left out, and of several cues with the same generation
+    key only the first is planned.
+    """
+    candidates = []
+    seen_keys = set()
+    for i, cue in enumerate(cues):
+        if not isinstance(cue, AudioCue) or cue.audio_type not in TANGOFLUX_OUTPUT_FORMAT or is_clip_cached(cue):
+            continue
+        key = generation_key(cue)
+        if key in seen_keys:
+            continue
+        seen_keys.add(key)
+        candidates.append((i, cue_steps(cue), _duration_s(cue)))
+    candidates.sort(key=lambda item: (item[1], item[2]), reverse=True)
+
+    batches: List[CueBatch] = []
+    current = None
+    for index, steps, duration_s in candidates:
+        if (
+            current is None
+            or current.steps != steps
+            or len(current.cue_indices) >= max_batch_size
+            or current.duration_s != duration_s
+        ):
+            current = CueBatch(steps=steps, duration_s=duration_s)
+            batches.append(current)
+        current.cue_indices.append(index)
+    return batches
+
+def generate_batched_clips(cues: Sequence[Cue]) -> Dict[int, AudioSegment]:
+    """
+    Render all TangoFlux cues through batched diffusion calls on a single model instance.
+
+    Returns raw specialist clips (before fades/gain) keyed by the cue's index in `cues`,
+    suitable for `create_audio_from_audiocue(cue, raw_clip=...)`. Cues whose batch fails
+    are simply missing from the result and fall back to per-cue generation.
+
+    Duplicate cues in `cues` share one generated clip. With SINGLE_FLIGHT_ENABLED each planned
+    cue also claims its generation key, so concurrent requests for the same clip wait for this
+    batch; a cue already in flight elsewhere is left out here and joins that flight instead.
+    """
+    clips: Dict[int, AudioSegment] = {}
+    batches = plan_batches(cues)
+    if not batches:
+        return clips
+    logger.info(
+        f"Batched TangoFlux generation: {sum(len(b.cue_indices) for b in batches)} cues in {len(batches)} batches"
+    )
+    flights = SingleFlight.get_instance()
+    for batch in batches:
+        claimed = {}  # cue index -> generation key this batch leads
+        indices = []
+        for index in batch.cue_indices:
+            if SINGLE_FLIGHT_ENABLED:
+                key = generation_key(cues[index])
+                if not flights.try_lead(key):
+                    continue
+                claimed[index] = key
+            indices.append(index)
+        try:
+            if indices:
+                _generate_batch(cues, indices, batch, clips)
+        finally:
+            for index, key in claimed.items():
+                if index in clips:
+                    flights.finish(key, clips[index])
+                else:
+                    flights.abandon(key)
+
+    # Duplicates of a generated cue reuse its clip
+    generated = {generation_key(cues[index]): clip for index, clip in clips.items()}
+    for index, cue in enumerate(cues):
+        if index not in clips and isinstance(cue, AudioCue) and cue.audio_type in TANGOFLUX_OUTPUT_FORMAT:
+            clip = generated.get(generation_key(cue))
+            if clip is not None:
+                clips[index] = clip
+    return clips
+
+def _generate_batch(cues: Sequence[Cue], indices: List[int], batch: CueBatch, clips: Dict[int, AudioSegment]):
+    """One batched diffusion call for `indices`; successful clips are stored in `clips`."""
+    batch_cues: List[AudioCue] = [cues[i] for i in indices]  # type: ignore[misc]
+    prompts = [cue.audio_class for cue in batch_cues]
+    try:
+        with Metrics.get_instance().stage("tangoflux_batch"):
+            waves = TangoFluxModel.generate_batch(prompts, steps=batch.steps, duration=batch.duration_s)
+    except Exception as e:
+        logger.error(f"Batched generation failed for {len(prompts)} cues ({batch.duration_s}s): {e}")
+        return
+    for index, cue, wave in zip(indices, batch_cues, waves):
+        if wave is None or wave.numel() == 0:
+            continue
+        frame_rate, gain = TANGOFLUX_OUTPUT_FORMAT[cue.audio_type]
+        waveform = wave.squeeze().cpu().numpy()
+        if waveform.size == 0:
+            continue
+        clips[index] = waveform_to_segment(waveform, frame_rate, gain)
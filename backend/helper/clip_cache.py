@@ -0,0 +1,169 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+import numpy as np
+from pydub import AudioSegment
+from Variable.configurations import CLIP_CACHE_DIR, CLIP_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+class ClipCache:
+    """Persistent, content-addressed on-disk cache for generated cue audio.
+
+    Entries are keyed by a hash of the generation inputs and model settings
+    (see `make_key`), so a repeated prompt is served from disk instead of
+    re-running the specialist model. The cache is bounded by `max_bytes` with
+    LRU eviction (recency is kept in memory and mirrored to file mtimes so it
+    survives restarts). Writes go to a temp file in the cache directory and
+    are published with `os.replace`, so concurrent workers never observe a
+    partially written clip.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, directory: str = CLIP_CACHE_DIR, max_bytes: int = CLIP_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._index_lock = threading.Lock()
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # file name -> size, oldest first
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide cache instance."""
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def make_key(**inputs) -> str:
+        """Hash generation inputs (prompt, type, duration, model settings...) into a cache key."""
+        payload = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load_index(self):
+        """Rebuild the LRU index from files already on disk (oldest mtime first)."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.startswith("."):
+                continue  # in-flight temp files
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._index[name] = size
+            self._total_bytes += size
+        logger.info(f"Clip cache at {self.directory}: {len(self._index)} entries, {self._total_bytes} bytes")
+
+    def contains(self, key: str, suffix: str) -> bool:
+        """Check for an entry without reading it or touching the counters."""
+        return os.path.exists(os.path.join(self.directory, key + suffix))
+
+    def get_bytes(self, key: str, suffix: str) -> Optional[bytes]:
+        name = key + suffix
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._index_lock:
+                self.misses += 1
+                size = self._index.pop(name, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+        with self._index_lock:
+            self.hits += 1
+            if name in self._index:
+                self._index.move_to_end(name)
+            else:
+                self._index[name] = len(data)
+                self._total_bytes += len(data)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put_bytes(self, key: str, suffix: str, data: bytes):
+        name = key + suffix
+        path = os.path.join(self.directory, name)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-", suffix=suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        with self._index_lock:
+            self.writes += 1
+            previous = self._index.pop(name, None)
+            if previous is not None:
+                self._total_bytes -= previous
+            self._index[name] = len(data)
+            self._total_bytes += len(data)
+            self._evict_locked()
+
+    def _evict_locked(self):
+        """Drop least recently used entries until the cache fits in max_bytes."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            name, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass
+            logger.debug(f"Evicted cached clip {name} ({size} bytes)")
+
+    def get_segment(self, key: str) -> Optional[AudioSegment]:
+        data = self.get_bytes(key, ".wav")
+        return AudioSegment(data=data) if data is not None else None
+
+    def put_segment(self, key: str, segment: AudioSegment):
+        buffer = io.BytesIO()
+        segment.export(buffer, format="wav")
+        self.put_bytes(key, ".wav", buffer.getvalue())
+
+    def get_array(self, key: str) -> Optional[np.ndarray]:
+        data = self.get_bytes(key, ".npy")
+        return np.load(io.BytesIO(data), allow_pickle=False) if data is not None else None
+
+    def put_array(self, key: str, array: np.ndarray):
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(array), allow_pickle=False)
+        self.put_bytes(key, ".npy", buffer.getvalue())
+
+    def stats(self) -> dict:
+        with self._index_lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,98 @@
+import contextlib
+import functools
+import logging
+import os
+import threading
+from Variable.configurations import CPU_FAST_PATH, CPU_TORCH_THREADS, PARALLEL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Precision modes of the CPU fast path (CPU_FAST_PATH). Both run under torch.inference_mode
+# with tuned thread counts; they are exclusive because dynamically quantized Linear layers
+# take fp32 activations, which bf16 autocast would hand them as bf16.
+CPU_FAST_PATH_MODES = ("", "int8", "bf16")
+
+_threads_lock = threading.Lock()
+_threads_tuned = False
+
+@functools.lru_cache(maxsize=None)
+def cpu_supports_bf16() -> bool:
+    """True if the CPU has native bf16 arithmetic (AVX512-BF16 or AMX); elsewhere bf16 is emulated and slower."""
+    try:
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if line.startswith("flags"):
+                    flags = line.split()
+                    return "avx512_bf16" in flags or "amx_bf16" in flags
+    except OSError:
+        pass
+    return False
+
+@functools.lru_cache(maxsize=None)
+def resolve_mode(mode: str = CPU_FAST_PATH) -> str:
+    """The fast-path mode that will actually run: bf16 falls back to fp32 ("") without native support."""
+    if mode not in CPU_FAST_PATH_MODES:
+        logger.warning(f"Unknown CPU_FAST_PATH {mode!r}; using fp32")
+        return ""
+    if mode == "bf16" and not cpu_supports_bf16():
+        logger.warning("CPU_FAST_PATH=bf16 but this CPU has no native bf16; using fp32")
+        return ""
+    return mode
+
+def tune_threads():
+    """Size torch's intra-op pool so PARALLEL_WORKERS concurrent generate calls share the cores
+    instead of each spawning one thread per core. Once per process; CPU_TORCH_THREADS overrides."""
+    global _threads_tuned
+    import torch
+
+    with _threads_lock:
+        if _threads_tuned:
+            return
+        threads = CPU_TORCH_THREADS or max(1, (os.cpu_count() or 1) // max(1, PARALLEL_WORKERS))
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)  # generate calls are already parallel across our own workers
+        except RuntimeError:
+            pass  # inter-op pool already started; it can only be sized before first use
+        _threads_tuned = True
+    logger.info(f"CPU fast path: {threads} torch threads per generate call")
+
+def prepare_for_cpu(module, mode: str = CPU_FAST_PATH):
+    """Put a loaded torch module in CPU inference shape, in place, and return it.
+
+    Always: eval mode and frozen parameters. "int8": Linear layers replaced by dynamically
+    quantized ones (int8 weights, activations quantized per call). Conv2d-bearing modules are
+    moved to channels-last (the 1-D convolutions of the audio VAEs have no such layout).
+    """
+    import torch
+
+    mode = resolve_mode(mode)
+    tune_threads()
+    module.eval()
+    module.requires_grad_(False)
+    if mode == "int8":
+        torch.ao.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    if any(isinstance(m, torch.nn.Conv2d) for m in module.modules()):
+        module.to(memory_format=torch.channels_last)
+    return module
+
+def to_fp32(tensor):
+    """Outputs computed under bf16 autocast may still be bf16, which numpy cannot hold."""
+    import torch
+
+    return tensor.float() if tensor.dtype == torch.bfloat16 else tensor
+
+@contextlib.contextmanager
+def cpu_inference(mode: str = CPU_FAST_PATH):
+    """Context for a CPU generate call: inference_mode, plus bf16 autocast in "bf16" mode.
+
+    A no-op with the fast path off, so callers can wrap generation unconditionally.
+    """
+    mode = resolve_mode(mode) if mode else ""
+    if not mode:
+        yield
+        return
+    import torch
+
+    with torch.inference_mode(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=mode == "bf16"):
+        yield
@@ -0,0 +1,98 @@
+import logging
+import threading
+from typing import Dict, List, Sequence
+from Variable.dataclases import Cue
+from Variable.configurations import CUE_COST_PRIORS, CUE_COST_EWMA_ALPHA, STEPS, TANGOFLUX_OUTPUT_FORMAT
+from helper.step_policy import cue_steps
+
+logger = logging.getLogger(__name__)
+
+# Cost assumed for an audio type with no prior: (overhead_s, seconds per second of audio)
+_DEFAULT_PRIOR = (1.0, 1.0)
+# Cost of a cue whose raw audio is already available (cache hit or batched): fades + encoding only
+_PRECOMPUTED_COST_S = 0.05
+
+class CueCostModel:
+    """Estimates how long a cue takes to generate, learning from measured runs.
+
+    cost = overhead + rate * duration_s per audio_type (i.e. per specialist
+    model), with the diffusion part of TangoFlux cues scaled by their steps
+    relative to STEPS (rates are learned per STEPS). Priors come from CUE_COST_PRIORS; every measured generation
+    updates the type's rate with an exponentially weighted moving average.
+    Each (estimate, actual) pair is also kept as running error statistics,
+    so the accuracy of the estimates can be checked in production.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self._rates: Dict[str, float] = {t: rate for t, (_, rate) in CUE_COST_PRIORS.items()}
+        self._accuracy: Dict[str, Dict[str, float]] = {}
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def _duration_s(cue: Cue) -> float:
+        return max(0.0, cue.duration_ms / 1000.0)
+
+    @staticmethod
+    def _step_ratio(cue: Cue) -> float:
+        """Diffusion work relative to a STEPS-step generation (1.0 for non-diffusion cues)."""
+        if cue.audio_type not in TANGOFLUX_OUTPUT_FORMAT:
+            return 1.0
+        return cue_steps(cue) / STEPS
+
+    def estimate(self, cue: Cue, precomputed: bool = False) -> float:
+        """Estimated seconds to render `cue`; `precomputed` means its raw audio already exists."""
+        if precomputed:
+            return _PRECOMPUTED_COST_S
+        overhead, prior_rate = CUE_COST_PRIORS.get(cue.audio_type, _DEFAULT_PRIOR)
+        with self._stats_lock:
+            rate = self._rates.get(cue.audio_type, prior_rate)
+        return overhead + rate * self._duration_s(cue) * self._step_ratio(cue)
+
+    def record(self, cue: Cue, estimate_s: float, actual_s: float):
+        """Feed a measured generation back into the model and the accuracy statistics."""
+        overhead, _ = CUE_COST_PRIORS.get(cue.audio_type, _DEFAULT_PRIOR)
+        duration_s = self._duration_s(cue) * self._step_ratio(cue)
+        with self._stats_lock:
+            if duration_s > 0:
+                observed_rate = max(0.0, actual_s - overhead) / duration_s
+                previous = self._rates.get(cue.audio_type, observed_rate)
+                self._rates[cue.audio_type] = (1 - CUE_COST_EWMA_ALPHA) * previous + CUE_COST_EWMA_ALPHA * observed_rate
+            acc = self._accuracy.setdefault(cue.audio_type, {"count": 0, "abs_error_s": 0.0, "abs_pct_error": 0.0})
+            acc["count"] += 1
+            acc["abs_error_s"] += abs(estimate_s - actual_s)
+            acc["abs_pct_error"] += abs(estimate_s - actual_s) / max(actual_s, 1e-3)
+
+    def stats(self) -> Dict[str, dict]:
+        """Per audio_type: learned rate, sample count, mean absolute error (s) and mean absolute % error."""
+        with self._stats_lock:
+            return {
+                audio_type: {
+                    "rate_s_per_audio_s": self._rates.get(audio_type),
+                    "count": int(acc["count"]),
+                    "mean_abs_error_s": acc["abs_error_s"] / acc["count"],
+                    "mean_abs_pct_error": 100.0 * acc["abs_pct_error"] / acc["count"],
+                }
+                for audio_type, acc in self._accuracy.items()
+            }
+
+def longest_first(cues: Sequence[Cue], estimates: Sequence[float]) -> List[int]:
+    """Indices of `cues` ordered by estimated cost, longest first (LPT order)."""
+    return sorted(range(len(cues)), key=lambda i: estimates[i], reverse=True)
+
+def log_makespan(makespan_s: float, estimates: Sequence[float], workers: int):
+    total = sum(estimates)
+    logger.info(
+        f"Generation makespan {makespan_s:.2f}s for {len(estimates)} cues on {workers} workers "
+        f"(estimated work {total:.2f}s, ideal {total / max(1, workers):.2f}s)"
+    )
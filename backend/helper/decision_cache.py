@@ -0,0 +1,94 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Optional
+from Variable.configurations import DECISION_CACHE_PATH, DECISION_CACHE_TTL_S
+
+logger = logging.getLogger(__name__)
+
+class DecisionCache:
+    """Persistent TTL cache for parsed LLM cue decisions, backed by SQLite.
+
+    Keys come from `make_key` (story text, reading speed, narrator flag,
+    prompt template version, BGM metadata version, model). Values are the
+    JSON cue lists returned by the LLM. SQLite handles cross-thread and
+    cross-process access; a connection is opened per operation.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, path: str = DECISION_CACHE_PATH, ttl_s: int = DECISION_CACHE_TTL_S):
+        self.path = path
+        self.ttl_s = ttl_s
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    @staticmethod
+    def make_key(**inputs) -> str:
+        payload = json.dumps(inputs, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection for one transaction (committed on success) and close it afterwards."""
+        conn = sqlite3.connect(self.path, timeout=10)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value, or None if missing or older than the TTL."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM decisions WHERE key = ? AND created_at >= ?",
+                (key, time.time() - self.ttl_s),
+            ).fetchone()
+        with self._stats_lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO decisions (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), now),
+            )
+            # Opportunistic TTL eviction
+            conn.execute("DELETE FROM decisions WHERE created_at < ?", (now - self.ttl_s,))
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,155 @@
+import concurrent.futures
+import logging
+from typing import Iterator, List, Optional, Sequence
+import numpy as np
+from Variable.dataclases import Cue, NarratorCue
+from Variable.configurations import (
+    MIX_FRAME_RATE,
+    MIX_CHANNELS,
+    NARRATION_CROSSFADE_MS,
+    PARALLEL_WORKERS,
+    STREAM_WINDOW_MS,
+    STREAM_LOOKAHEAD_MS,
+)
+from helper.audio_conversions import segment_to_float32
+from Tools.play_audio import create_audio_from_audiocue, is_clip_cached, cached_narration
+from specialist_model.text_to_speech_generator import (
+    iter_narration_audio,
+    narration_sample_rate,
+    crossfade_concat,
+)
+
+logger = logging.getLogger(__name__)
+
+def _ms_to_frames(ms: int, frame_rate: int = MIX_FRAME_RATE) -> int:
+    # Same rounding as MixBus
+    return int(round(ms * frame_rate / 1000.0))
+
+class _NarratorTrack:
+    """A narrator cue rendered sentence by sentence, only as far ahead as the timeline needs.
+
+    Matches `create_audio_from_audiocue` for narrator cues: weight multiplier, clip, 0.9 gain,
+    trim to duration_ms and a fade in/out of min(100, duration_ms // 4) ms.
+    """
+
+    def __init__(self, cue: NarratorCue):
+        self.cue = cue
+        self.start_frame = _ms_to_frames(cue.start_time_ms)
+        self._rate = narration_sample_rate()
+        self._max_samples = int(cue.duration_ms * self._rate / 1000)
+        self._crossfade = int(self._rate * NARRATION_CROSSFADE_MS / 1000)
+        self._fade = int(min(100, cue.duration_ms // 4) * self._rate / 1000)
+        self._scale = int((cue.weight_db + 20) / 10)
+        if is_clip_cached(cue):
+            self._pieces: Iterator[np.ndarray] = iter([cached_narration(cue)])
+        else:
+            self._pieces = iter_narration_audio(cue.story, cue.narrator_description, first_batch_size=1)
+        self._samples = np.zeros(0, dtype=np.float32)
+        self._done = False
+
+    def _final(self) -> bool:
+        return self._done or len(self._samples) >= self._max_samples
+
+    def _ensure(self, samples_needed: int):
+        """Generate sentences until `samples_needed` samples (plus the next seam and the fade-out) are settled."""
+        while not self._final() and len(self._samples) < samples_needed + self._crossfade + self._fade:
+            piece = next(self._pieces, None)
+            if piece is None:
+                self._done = True
+                break
+            piece = np.clip(piece.astype(np.float32) * self._scale, -1.0, 1.0) * np.float32(0.9)
+            self._samples = piece if not len(self._samples) else crossfade_concat([self._samples, piece], self._crossfade)
+
+    def render(self, start_frame: int, end_frame: int) -> Optional[np.ndarray]:
+        """Mono float32 samples for mix frames [start_frame, end_frame), or None if silent there."""
+        first = max(start_frame, self.start_frame)
+        if first >= end_frame:
+            return None
+        ratio = self._rate / MIX_FRAME_RATE
+        positions = (np.arange(first, end_frame) - self.start_frame) * ratio
+        self._ensure(int(np.ceil(positions[-1])) + 2)
+
+        length = min(len(self._samples), self._max_samples)
+        if self._final():
+            positions = positions[positions < length]
+        if not len(positions) or not length:
+            return None
+        samples = np.interp(positions, np.arange(length), self._samples[:length]).astype(np.float32)
+        if self._fade:
+            samples *= np.clip(positions / self._fade, 0.0, 1.0).astype(np.float32)
+            if self._final():
+                samples *= np.clip((length - positions) / self._fade, 0.0, 1.0).astype(np.float32)
+        out = np.zeros(end_frame - start_frame, dtype=np.float32)
+        offset = first - start_frame
+        out[offset:offset + len(samples)] = samples
+        return out
+
+def iter_rendered_windows(
+    cues: Sequence[Cue],
+    total_duration_ms: int,
+    window_ms: int = STREAM_WINDOW_MS,
+    lookahead_ms: int = STREAM_LOOKAHEAD_MS,
+) -> Iterator[np.ndarray]:
+    """
+    Render the mixed timeline window by window, yielding float32 arrays of shape
+    (frames, MIX_CHANNELS) in time order; concatenated they cover `total_duration_ms`.
+
+    Narrator cues are synthesized sentence by sentence as the windows reach them. Every other
+    cue is generated (on PARALLEL_WORKERS threads) once it starts within `lookahead_ms` of the
+    window being rendered, so its audio is usually ready when the window needs it.
+    Cues that fail to generate are logged and left out of the mix.
+    """
+    total_frames = _ms_to_frames(total_duration_ms)
+    window_frames = max(1, _ms_to_frames(window_ms))
+    narrators: List[_NarratorTrack] = []
+    pending = sorted((cue for cue in cues if not isinstance(cue, NarratorCue)), key=lambda c: c.start_time_ms)
+    narrator_cues = sorted((cue for cue in cues if isinstance(cue, NarratorCue)), key=lambda c: c.start_time_ms)
+    active = []  # (start_frame, samples) for generated clips still playing
+    futures = []  # (cue, future) submitted but not yet mixed
+
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, PARALLEL_WORKERS))
+    finished = False
+    try:
+        for start_frame in range(0, total_frames, window_frames):
+            end_frame = min(start_frame + window_frames, total_frames)
+            window_end_ms = end_frame * 1000.0 / MIX_FRAME_RATE
+
+            # Submit cues starting within the lookahead horizon
+            while pending and pending[0].start_time_ms < window_end_ms + lookahead_ms:
+                cue = pending.pop(0)
+                futures.append((cue, executor.submit(create_audio_from_audiocue, cue)))
+
+            # Collect the cues this window needs (blocking), and any that are already done
+            still_pending = []
+            for cue, future in futures:
+                if cue.start_time_ms < window_end_ms or future.done():
+                    try:
+                        clip = segment_to_float32(future.result(), frame_rate=MIX_FRAME_RATE, channels=MIX_CHANNELS)
+                        active.append((_ms_to_frames(cue.start_time_ms), clip))
+                    except Exception as e:
+                        logger.error(f"Skipping cue {getattr(cue, 'id', 'N/A')} in streamed render: {e}")
+                else:
+                    still_pending.append((cue, future))
+            futures = still_pending
+
+            while narrator_cues and narrator_cues[0].start_time_ms < window_end_ms:
+                narrators.append(_NarratorTrack(narrator_cues.pop(0)))
+
+            window = np.zeros((end_frame - start_frame, MIX_CHANNELS), dtype=np.float32)
+            for clip_start, clip in active:
+                lo = max(start_frame, clip_start)
+                hi = min(end_frame, clip_start + len(clip))
+                if hi > lo:
+                    window[lo - start_frame:hi - start_frame] += clip[lo - clip_start:hi - clip_start]
+            active = [(clip_start, clip) for clip_start, clip in active if clip_start + len(clip) > end_frame]
+
+            for track in narrators:
+                samples = track.render(start_frame, end_frame)
+                if samples is not None:
+                    window += samples[:, np.newaxis]
+
+            yield window
+        finished = True
+    finally:
+        # Closed early (client gone): drop the cues not started yet instead of generating them all
+        executor.shutdown(wait=finished, cancel_futures=not finished)
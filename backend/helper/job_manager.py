@@ -0,0 +1,213 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+from Variable.configurations import JOB_WORKERS, JOB_MAX_PENDING, JOB_TTL_S
+from helper.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+class JobQueueFullError(Exception):
+    """Raised when a job or `run` call arrives while JOB_MAX_PENDING renders are already queued or running."""
+
+@dataclass
+class Job:
+    """State of one background render, updated from the worker thread."""
+    id: str
+    kind: str
+    status: str = JOB_QUEUED
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    total_cues: int = 0
+    completed_cues: int = 0
+    events: List[dict] = field(default_factory=list)
+    result: Any = None
+    error: Optional[str] = None
+
+    def add_event(self, event: str, **data):
+        self.events.append({"event": event, "time": time.time(), **data})
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_COMPLETED, JOB_FAILED)
+
+class JobProgress:
+    """Progress reporter handed to a job's work function."""
+
+    def __init__(self, job: Job, lock: threading.Lock):
+        self._job = job
+        self._lock = lock
+
+    def stage(self, name: str, **data):
+        """Report the start of a pipeline stage (deciding, generating, mixing, encoding...)."""
+        with self._lock:
+            self._job.add_event("stage", stage=name, **data)
+
+    def set_total(self, total_cues: int):
+        with self._lock:
+            self._job.total_cues = total_cues
+
+    def cue_done(self, cue_id: Any, ok: bool = True, error: Optional[str] = None):
+        """Report that one cue finished (successfully or not)."""
+        with self._lock:
+            self._job.completed_cues += 1
+            self._job.add_event(
+                "cue",
+                cue_id=cue_id,
+                ok=ok,
+                error=error,
+                completed=self._job.completed_cues,
+                total=self._job.total_cues,
+            )
+
+class JobManager:
+    """Runs blocking renders on a bounded thread pool and tracks their progress.
+
+    Request handlers either submit a job and return its id immediately, or
+    `await run(...)` to execute a render off the event loop while still
+    sharing the same bounded executor. Short calls (deciding cues, evaluation,
+    mixing) do not belong here; they would queue behind renders.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING, ttl_s: int = JOB_TTL_S):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._max_pending = max_pending
+        self._ttl_s = ttl_s
+        self._jobs: Dict[str, Job] = {}
+        self._jobs_lock = threading.Lock()
+        self._queued = 0   # executor tasks (jobs and `run` calls) waiting for a worker
+        self._running = 0  # executor tasks currently on a worker
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def _prune_locked(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished and job.finished_at is not None and now - job.finished_at > self._ttl_s
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def pending_count(self) -> int:
+        with self._jobs_lock:
+            return sum(1 for job in self._jobs.values() if not job.finished)
+
+    def queue_stats(self) -> dict:
+        """Executor tasks waiting and running (jobs and awaited `run` calls alike)."""
+        with self._jobs_lock:
+            return {"queued": self._queued, "running": self._running}
+
+    def _full_locked(self) -> bool:
+        return self._queued + self._running >= self._max_pending
+
+    def _enqueue(self, func: Callable, *args) -> concurrent.futures.Future:
+        with self._jobs_lock:
+            self._queued += 1
+        return self._executor.submit(self._tracked, time.perf_counter(), func, *args)
+
+    def _tracked(self, enqueued_at: float, func: Callable, *args):
+        Metrics.get_instance().observe("cinemaudio_stage_seconds", time.perf_counter() - enqueued_at, stage="queue_wait")
+        with self._jobs_lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return func(*args)
+        finally:
+            with self._jobs_lock:
+                self._running -= 1
+
+    def submit(self, kind: str, work: Callable[[JobProgress], Any]) -> Job:
+        """Queue `work(progress)` and return its Job; the return value becomes job.result."""
+        with self._jobs_lock:
+            self._prune_locked()
+            if self._full_locked() or sum(1 for job in self._jobs.values() if not job.finished) >= self._max_pending:
+                raise JobQueueFullError(f"Too many pending jobs (max {self._max_pending})")
+            job = Job(id=uuid.uuid4().hex, kind=kind)
+            job.add_event("status", status=JOB_QUEUED)
+            self._jobs[job.id] = job
+        self._enqueue(self._run_job, job, work)
+        logger.info(f"Submitted {kind} job {job.id}")
+        return job
+
+    def _run_job(self, job: Job, work: Callable[[JobProgress], Any]):
+        with self._jobs_lock:
+            job.status = JOB_RUNNING
+            job.add_event("status", status=JOB_RUNNING)
+        try:
+            result = work(JobProgress(job, self._jobs_lock))
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            with self._jobs_lock:
+                job.status = JOB_FAILED
+                job.error = str(e)
+                job.finished_at = time.time()
+                job.add_event("status", status=JOB_FAILED, error=str(e))
+            return
+        with self._jobs_lock:
+            job.result = result
+            job.status = JOB_COMPLETED
+            job.finished_at = time.time()
+            job.add_event("status", status=JOB_COMPLETED)
+        logger.info(f"Job {job.id} completed")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._jobs_lock:
+            return self._jobs.get(job_id)
+
+    def events_since(self, job_id: str, index: int):
+        """Return (new events, job finished?) for streaming; None if the job is unknown."""
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return list(job.events[index:]), job.finished
+
+    def admit(self) -> Callable[[], None]:
+        """Count a render that runs outside the executor (a streamed response) as running.
+
+        Returns the function that ends it (idempotent). Raises JobQueueFullError when
+        JOB_MAX_PENDING renders are already queued or running.
+        """
+        with self._jobs_lock:
+            if self._full_locked():
+                raise JobQueueFullError(f"Too many pending renders (max {self._max_pending})")
+            self._running += 1
+        released = False
+
+        def release():
+            nonlocal released
+            with self._jobs_lock:
+                if not released:
+                    released = True
+                    self._running -= 1
+
+        return release
+
+    async def run(self, func: Callable, *args):
+        """Run blocking render `func(*args)` on the job executor without blocking the event loop.
+
+        Raises JobQueueFullError when JOB_MAX_PENDING renders are already queued or running.
+        """
+        with self._jobs_lock:
+            if self._full_locked():
+                raise JobQueueFullError(f"Too many pending renders (max {self._max_pending})")
+        return await asyncio.wrap_future(self._enqueue(func, *args))
@@ -1,30 +1,112 @@
-from typing import Optional
-from tangoflux import TangoFluxInference
+from typing import List, Optional
+import contextlib
+import copy
+import functools
 import threading
-from parler_tts import ParlerTTSForConditionalGeneration
 import os
-from transformers.models.auto.tokenization_auto import AutoTokenizer
 import logging
-import torch
+from Variable.configurations import TANGOFLUX_MODEL_NAME, PARLER_TTS_MODEL_NAME, TANGOFLUX_GUIDANCE_SCALE
+from Variable.configurations import (
+    TANGOFLUX_POOL_MAX,
+    TANGOFLUX_INSTANCE_BYTES,
+    TANGOFLUX_SHARED_WEIGHTS,
+    TANGOFLUX_CONTEXT_BYTES,
+    PARLER_TTS_POOL_SIZE,
+    PARLER_TTS_INSTANCE_BYTES,
+    MODEL_POOL_IDLE_TTL_S,
+    MODEL_POOL_LEASE_TIMEOUT_S,
+    MODEL_POOL_MEMORY_HEADROOM_BYTES,
+    CPU_FAST_PATH,
+    PARALLEL_WORKERS,
+)
+from helper.model_pool import ModelPool
+from helper.cpu_inference import prepare_for_cpu, cpu_inference, to_fp32
 
-# Thread-local storage for worker IDs
-_thread_local = threading.local()
+def _release_device_memory():
+    """After unloading pooled models: hand cached CUDA blocks back to the driver."""
+    import sys
+
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+def _inference_context(inference):
+    """A TangoFluxInference that shares `inference`'s weights but owns its mutable state.
+
+    Forward passes only read parameters, so threads can run them on the same modules; what
+    a generate call mutates is the scheduler (set_timesteps, step index) and the fast T5
+    tokenizer (padding / truncation settings), which each context gets its own deep copy of.
+    None if `inference` doesn't have that layout.
+    """
+    flow = getattr(inference, "model", None)
+    if flow is None or getattr(inference, "vae", None) is None:
+        return None
+    if not any(hasattr(value, "set_timesteps") for value in vars(flow).values()):
+        return None
+    owned = {
+        name: value for name, value in vars(flow).items()
+        if hasattr(value, "set_timesteps") or hasattr(value, "backend_tokenizer")
+    }
+    context_flow = copy.copy(flow)  # shallow: the submodule and parameter dicts are shared
+    for name, value in owned.items():
+        setattr(context_flow, name, copy.deepcopy(value))
+    context = copy.copy(inference)
+    context.model = context_flow
+    return context
+
+# TangoFlux seeds torch's global generator and draws its initial noise from it inside
+# inference_flow, so concurrent calls would interleave their draws
+_noise_lock = threading.Lock()
+
+@contextlib.contextmanager
+def _exclusive_noise_draw(inference):
+    """Hold _noise_lock from the start of a generate call on `inference` until its noise is drawn.
+
+    The draw comes right before the scheduler's set_timesteps, so the lock is released there,
+    through a wrapper on the leased instance's own scheduler, and the diffusion steps of
+    different calls still overlap. Without a scheduler it is held for the whole call.
+    """
+    scheduler = getattr(getattr(inference, "model", None), "noise_scheduler", None)
+    original = getattr(scheduler, "set_timesteps", None)
+    held = [True]
+
+    def release():
+        if held[0]:
+            held[0] = False
+            _noise_lock.release()
+
+    _noise_lock.acquire()
+    if original is not None:
+        @functools.wraps(original)  # keeps the signature diffusers inspects for `sigmas`
+        def set_timesteps(*args, **kwargs):
+            release()
+            return original(*args, **kwargs)
+
+        scheduler.set_timesteps = set_timesteps
+    try:
+        yield
+    finally:
+        if original is not None:
+            vars(scheduler).pop("set_timesteps", None)
+        release()
 
 class TangoFluxModel:
-    """Manages TangoFlux model instances with support for parallel execution.
-    
-    Note: TangoFlux models are NOT thread-safe. For parallel execution, we maintain
-    a pool of model instances (one per worker) to avoid race conditions.
-    For sequential execution, we use a single instance with a lock.
+    """Manages TangoFlux model instances for sequential, parallel and batched generation.
+
+    TangoFlux models are NOT thread-safe, so every call leases an instance from an
+    elastic ModelPool (helper/model_pool.py) for its duration. The pool loads
+    instances on demand up to TANGOFLUX_POOL_MAX (0: PARALLEL_WORKERS, or one on a
+    GPU) while the node has memory for another, and unloads idle ones. With
+    TANGOFLUX_SHARED_WEIGHTS, pooled instances are inference contexts over one
+    loaded set of weights (`_inference_context`), so another worker costs its
+    scheduler state and activations rather than another copy of the model.
     """
 
-    _instance = None
+    _pool = None
     _lock = threading.Lock()
-    _generate_lock = threading.Lock()  # Lock for serializing generate() calls in sequential mode
-    _model_pool = []  # Pool of model instances for parallel execution
-    _pool_lock = threading.Lock()
-    _pool_size = 0
     _device = None  # lazily determined compute device
+    _weights = None  # the TangoFluxInference whose parameters the pooled contexts share
+    _weights_lock = threading.Lock()
 
     @classmethod
     def _get_device(cls) -> str:
@@ -32,6 +114,8 @@ class TangoFluxModel:
         if cls._device is not None:
             return cls._device
 
+        import torch
+
         device = "cpu"
         try:
             if torch.cuda.is_available():
@@ -48,121 +132,216 @@ class TangoFluxModel:
         return device
 
     @classmethod
-    def _create_model(cls):
-        """Create a TangoFluxInference model on the selected device."""
+    def _cpu_mode(cls) -> str:
+        """CPU_FAST_PATH when running on CPU, "" (plain fp32) on accelerators."""
+        return CPU_FAST_PATH if cls._get_device() == "cpu" else ""
+
+    @classmethod
+    def _create_model(cls, cpu_mode: Optional[str] = None):
+        """Create a TangoFluxInference model on the selected device.
+
+        On CPU the flow model and VAE are prepared for the fast path (`cpu_mode`, default
+        CPU_FAST_PATH; see helper/cpu_inference.py).
+        """
+        from tangoflux import TangoFluxInference
+
         device = cls._get_device()
         logger = logging.getLogger(__name__)
         try:
             # Prefer explicit device argument if supported by TangoFluxInference
-            return TangoFluxInference(name="declare-lab/TangoFlux", device=device)
+            model = TangoFluxInference(name=TANGOFLUX_MODEL_NAME, device=device)
         except TypeError:
             # Fallback: older versions may not accept a device kwarg
             logger.warning(
                 "TangoFluxInference does not accept 'device' kwarg; "
                 "falling back to library defaults."
             )
-            return TangoFluxInference(name="declare-lab/TangoFlux")
+            model = TangoFluxInference(name=TANGOFLUX_MODEL_NAME)
+        cpu_mode = cls._cpu_mode() if cpu_mode is None else cpu_mode
+        if cpu_mode:
+            for module in (model.model, model.vae):
+                prepare_for_cpu(module, cpu_mode)
+            logger.info(f"TangoFlux prepared for the CPU fast path ({cpu_mode})")
+        return model
 
     @classmethod
-    def get_instance(cls):
-        """Get the primary singleton instance (for sequential mode)."""
-        if cls._instance is None:
+    def _create_context(cls):
+        """Pool factory in shared-weight mode: the first call loads the weights, later calls are cheap."""
+        if cls._weights is None:
+            with cls._weights_lock:
+                if cls._weights is None:
+                    cls._weights = cls._create_model()
+        context = _inference_context(cls._weights)
+        if context is None:
+            logging.getLogger(__name__).warning(
+                "TangoFluxInference layout not recognised; loading a full model copy instead of sharing weights"
+            )
+            return cls._create_model()
+        return context
+
+    @classmethod
+    def pool(cls) -> ModelPool:
+        if cls._pool is None:
             with cls._lock:
-                if cls._instance is None:
-                    cls._instance = cls._create_model()
-        return cls._instance
-    
+                if cls._pool is None:
+                    max_size = TANGOFLUX_POOL_MAX
+                    if max_size <= 0:
+                        max_size = max(1, PARALLEL_WORKERS) if cls._get_device() == "cpu" else 1
+                    cls._pool = ModelPool(
+                        "tangoflux",
+                        cls._create_context if TANGOFLUX_SHARED_WEIGHTS else cls._create_model,
+                        max_size=max_size,
+                        idle_ttl_s=MODEL_POOL_IDLE_TTL_S,
+                        lease_timeout_s=MODEL_POOL_LEASE_TIMEOUT_S,
+                        instance_bytes=TANGOFLUX_CONTEXT_BYTES if TANGOFLUX_SHARED_WEIGHTS else TANGOFLUX_INSTANCE_BYTES,
+                        memory_headroom_bytes=MODEL_POOL_MEMORY_HEADROOM_BYTES,
+                        on_evict=_release_device_memory,
+                        measure_footprint=not TANGOFLUX_SHARED_WEIGHTS,  # the first load includes the shared weights
+                    )
+        return cls._pool
+
     @classmethod
-    def _get_model_from_pool(cls, worker_id: int):
-        """Get a model instance from the pool for parallel execution."""
-        with cls._pool_lock:
-            # Ensure pool is large enough
-            while len(cls._model_pool) <= worker_id:
-                cls._model_pool.append(cls._create_model())
-            return cls._model_pool[worker_id]
-    
+    def get_instance(cls):
+        """A loaded instance, for inspection and warm-up only; generation must lease one (`generate`)."""
+        return cls.pool().any_instance()
+
     @classmethod
     def initialize_pool(cls, pool_size: int):
-        """Pre-initialize model pool for parallel execution.
-        
-        This method is idempotent - it only creates new models if the pool
-        is smaller than the requested size. Safe to call multiple times.
-        """
-        with cls._pool_lock:
-            current_size = len(cls._model_pool)
-            if current_size >= pool_size:
-                # Pool already has enough models
-                return
-            
-            cls._pool_size = max(cls._pool_size, pool_size)
-            # Pre-create models up to pool_size
-            logger = logging.getLogger(__name__)
-            logger.info(f"Initializing TangoFlux model pool: {current_size} -> {pool_size} models")
-            while len(cls._model_pool) < pool_size:
-                cls._model_pool.append(cls._create_model())
-            logger.info(f"TangoFlux model pool initialized with {len(cls._model_pool)} models")
-    
-    @classmethod
-    def _get_current_worker_id(cls):
-        """Get worker ID from thread-local storage if available."""
-        return getattr(_thread_local, 'worker_id', None)
-    
+        """Load up to `pool_size` instances ahead of a parallel run (bounded by the pool's maximum
+        and available memory). Idempotent."""
+        cls.pool().prewarm(pool_size)
+
     @classmethod
-    def generate(cls, prompt: str, steps: int, duration: int, worker_id: Optional[int] = None):
-        """Generate audio with thread-safe handling.
-        
+    def generate(cls, prompt: str, steps: int, duration: int):
+        """Generate audio on a leased instance (waits for one if all are busy).
+
         Args:
             prompt: Text prompt for generation
             steps: Number of diffusion steps
             duration: Duration in seconds
-            worker_id: Optional worker ID for parallel execution (uses pool)
-                      If None, checks thread-local storage
-        
-        If worker_id is provided or found in thread-local, uses model from pool (parallel mode).
-        Otherwise, uses singleton with lock (sequential mode).
         """
-        # Check thread-local if worker_id not provided
-        if worker_id is None:
-            worker_id = cls._get_current_worker_id()
-        
-        if worker_id is not None:
-            # Parallel mode: use model from pool
-            model = cls._get_model_from_pool(worker_id)
-            return model.generate(prompt, steps=steps, duration=duration)
-        else:
-            # Sequential mode: use singleton with lock
-            model = cls.get_instance()
-            with cls._generate_lock:
-                return model.generate(prompt, steps=steps, duration=duration)
+        with cls.pool().lease() as model, cpu_inference(cls._cpu_mode()), _exclusive_noise_draw(model):
+            wave = model.generate(prompt, steps=steps, duration=duration)
+        return to_fp32(wave) if cls._cpu_mode() == "bf16" else wave
+
+    @classmethod
+    def generate_batch(cls, prompts: List[str], steps: int, duration: int):
+        """Generate one clip per prompt in a single batched diffusion call.
+
+        All prompts share `steps` and `duration` (seconds). Runs on one leased
+        instance, so batching never needs more than one copy.
+        Returns a list of (channels, samples) tensors in prompt order.
+        """
+        with cls.pool().lease() as model, cpu_inference(cls._cpu_mode()), _exclusive_noise_draw(model):
+            flow = getattr(model, "model", None)
+            vae = getattr(model, "vae", None)
+            if flow is None or vae is None or not hasattr(flow, "inference_flow"):
+                # Library version without the internals we batch through: one call per prompt
+                waves = [model.generate(p, steps=steps, duration=duration) for p in prompts]
+                return [to_fp32(wave) for wave in waves] if cls._cpu_mode() == "bf16" else waves
+            import torch
+
+            with torch.no_grad():
+                latents = flow.inference_flow(
+                    list(prompts),
+                    duration=duration,
+                    num_inference_steps=steps,
+                    guidance_scale=TANGOFLUX_GUIDANCE_SCALE,
+                )
+                waves = to_fp32(vae.decode(latents.transpose(2, 1)).sample.cpu())
+            waveform_end = int(duration * vae.config.sampling_rate)
+            return [wave[:, :waveform_end] for wave in waves]
     
 class ParlerTTSModel:
-    """Singleton to manage ParlerTTS model and tokenizers."""
+    """Manages ParlerTTS instances (model + tokenizers) for concurrent narration.
+
+    An instance serves one generate call at a time: callers `checkout()` one from
+    an elastic ModelPool of up to PARLER_TTS_POOL_SIZE instances, loaded on demand
+    while memory allows and unloaded when idle. Sampling is seeded per call by the
+    caller, never through global RNG state, so concurrent calls on different
+    instances stay deterministic.
+    """
 
-    _instance = None
+    _pool = None
     _lock = threading.Lock()
+    _sampling_rate = None  # read once from the model config
+
+    @staticmethod
+    def _hf_token() -> Optional[str]:
+        return (
+            os.getenv("HUGGINGFACEHUB_ACCESS_TOKEN")
+            or os.getenv("HF_TOKEN")
+            or os.getenv("HUGGING_FACE_HUB_TOKEN")
+        )
 
     @classmethod
-    def get_instance(cls):
-        if cls._instance is None:
+    def _create_model(cls, cpu_mode: str = CPU_FAST_PATH):
+        """Load model and tokenizers. A model on CPU is prepared for the fast path (`cpu_mode`),
+        which the caller re-enters around generate via the returned "cpu_mode"."""
+        from parler_tts import ParlerTTSForConditionalGeneration
+        from transformers.models.auto.tokenization_auto import AutoTokenizer
+
+        HF_TOKEN = cls._hf_token()
+        model = ParlerTTSForConditionalGeneration.from_pretrained(
+            PARLER_TTS_MODEL_NAME, token=HF_TOKEN
+        )
+        # Tokenizers are per instance too: fast tokenizers must not be shared across threads
+        tokenizer = AutoTokenizer.from_pretrained(
+            PARLER_TTS_MODEL_NAME, token=HF_TOKEN
+        )
+        description_tokenizer = AutoTokenizer.from_pretrained(
+            model.config.text_encoder._name_or_path, token=HF_TOKEN
+        )
+        if model.device.type != "cpu":
+            cpu_mode = ""
+        if cpu_mode:
+            prepare_for_cpu(model, cpu_mode)
+            logging.getLogger(__name__).info(f"ParlerTTS prepared for the CPU fast path ({cpu_mode})")
+        return {
+            "model": model,
+            "tokenizer": tokenizer,
+            "description_tokenizer": description_tokenizer,
+            "cpu_mode": cpu_mode,
+        }
+
+    @classmethod
+    def pool(cls) -> ModelPool:
+        if cls._pool is None:
             with cls._lock:
-                if cls._instance is None:
-                    HF_TOKEN = (
-                        os.getenv("HUGGINGFACEHUB_ACCESS_TOKEN")
-                        or os.getenv("HF_TOKEN")
-                        or os.getenv("HUGGING_FACE_HUB_TOKEN")
-                    )
-                    model = ParlerTTSForConditionalGeneration.from_pretrained(
-                        "ai4bharat/indic-parler-tts", token=HF_TOKEN
-                    )
-                    tokenizer = AutoTokenizer.from_pretrained(
-                        "ai4bharat/indic-parler-tts", token=HF_TOKEN
-                    )
-                    description_tokenizer = AutoTokenizer.from_pretrained(
-                        model.config.text_encoder._name_or_path, token=HF_TOKEN
+                if cls._pool is None:
+                    cls._pool = ModelPool(
+                        "parler_tts",
+                        cls._create_model,
+                        max_size=PARLER_TTS_POOL_SIZE,
+                        idle_ttl_s=MODEL_POOL_IDLE_TTL_S,
+                        lease_timeout_s=MODEL_POOL_LEASE_TIMEOUT_S,
+                        instance_bytes=PARLER_TTS_INSTANCE_BYTES,
+                        memory_headroom_bytes=MODEL_POOL_MEMORY_HEADROOM_BYTES,
+                        on_evict=_release_device_memory,
                     )
-                    cls._instance = {
-                        "model": model,
-                        "tokenizer": tokenizer,
-                        "description_tokenizer": description_tokenizer,
-                    }
-        return cls._instance
\ No newline at end of file
+        return cls._pool
+
+    @classmethod
+    def get_instance(cls):
+        """A loaded instance, for inspection and warm-up only; generation must `checkout()`."""
+        return cls.pool().any_instance()
+
+    @classmethod
+    def sampling_rate(cls) -> int:
+        """Output sample rate, from the model config: does not load (or lease) a model."""
+        if cls._sampling_rate is None:
+            from parler_tts import ParlerTTSConfig
+
+            config = ParlerTTSConfig.from_pretrained(PARLER_TTS_MODEL_NAME, token=cls._hf_token())
+            cls._sampling_rate = config.sampling_rate
+        return cls._sampling_rate
+
+    @classmethod
+    def initialize_pool(cls, pool_size: int):
+        """Load up to `pool_size` instances (bounded by PARLER_TTS_POOL_SIZE and memory). Idempotent."""
+        cls.pool().prewarm(pool_size)
+
+    @classmethod
+    def checkout(cls):
+        """Borrow an instance for one generate call: `with ParlerTTSModel.checkout() as models:`."""
+        return cls.pool().lease()
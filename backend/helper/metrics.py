@@ -0,0 +1,163 @@
+import bisect
+import contextlib
+import logging
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+from Variable.configurations import METRICS_ENABLED, METRICS_BUCKETS_S
+
+logger = logging.getLogger(__name__)
+
+# name -> (type, help). Every metric recorded through Metrics must be declared here.
+METRIC_DEFINITIONS = {
+    "cinemaudio_stage_seconds": ("histogram", "Time spent in a pipeline stage"),
+    "cinemaudio_cue_generation_seconds": ("histogram", "Specialist model time per generated (uncached) cue"),
+    "cinemaudio_cue_failures_total": ("counter", "Cues whose generation raised"),
+    "cinemaudio_cues_in_progress": ("gauge", "Cues being generated right now (busy model workers)"),
+    "cinemaudio_http_request_seconds": ("histogram", "HTTP request latency until the response starts"),
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+# A sample reported by a collector at scrape time: (name, type, help, labels, value)
+Sample = Tuple[str, str, str, Dict[str, str], float]
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in labels]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, n_buckets: int):
+        self.counts = [0] * n_buckets  # per bucket (not cumulative); the +Inf bucket is `count`
+        self.sum = 0.0
+        self.count = 0
+
+class Metrics:
+    """In-process metrics registry rendered in the Prometheus text format.
+
+    Histograms, counters and gauges are kept per label set in memory; stages
+    are timed with `timer(...)`. Values owned by other components (job queue
+    depth, model pool size, cache hit counts) are read at scrape time through
+    collectors registered with `register_collector`. With METRICS_ENABLED off,
+    every recording call is a no-op.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, buckets: Tuple[float, ...] = METRICS_BUCKETS_S):
+        self.buckets = tuple(sorted(buckets))
+        self._metrics_lock = threading.Lock()
+        self._histograms: Dict[str, Dict[LabelKey, _Histogram]] = {}
+        self._values: Dict[str, Dict[LabelKey, float]] = {}  # counters and gauges
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def observe(self, name: str, value: float, **labels):
+        """Record one histogram observation (seconds)."""
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._metrics_lock:
+            histogram = self._histograms.setdefault(name, {}).get(key)
+            if histogram is None:
+                histogram = self._histograms[name][key] = _Histogram(len(self.buckets))
+            if index < len(self.buckets):
+                histogram.counts[index] += 1
+            histogram.sum += value
+            histogram.count += 1
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        """Add to a counter or gauge (negative amounts for gauges only)."""
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._metrics_lock:
+            values = self._values.setdefault(name, {})
+            values[key] = values.get(key, 0.0) + amount
+
+    @contextlib.contextmanager
+    def timer(self, name: str, **labels):
+        """Time the block into histogram `name`; failed blocks are recorded too."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextlib.contextmanager
+    def in_progress(self, name: str, **labels):
+        """Gauge `name` counts the blocks currently running."""
+        self.inc(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.inc(name, -1, **labels)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """Add a callable returning (name, type, help, labels, value) samples, read at every scrape."""
+        with self._metrics_lock:
+            self._collectors.append(collector)
+
+    def stage(self, stage: str):
+        """Shorthand: time a block as cinemaudio_stage_seconds{stage=...}."""
+        return self.timer("cinemaudio_stage_seconds", stage=stage)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines: List[str] = []
+        with self._metrics_lock:
+            histograms = {name: {k: (list(h.counts), h.sum, h.count) for k, h in series.items()} for name, series in self._histograms.items()}
+            values = {name: dict(series) for name, series in self._values.items()}
+            collectors = list(self._collectors)
+
+        for name, (kind, help_text) in METRIC_DEFINITIONS.items():
+            if name not in histograms and name not in values:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, (counts, total, count) in sorted(histograms.get(name, {}).items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(total)}")
+                lines.append(f"{name}_count{_format_labels(key)} {count}")
+            for key, value in sorted(values.get(name, {}).items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        collected: Dict[str, List[Sample]] = {}
+        for collector in collectors:
+            try:
+                for sample in collector():
+                    collected.setdefault(sample[0], []).append(sample)
+            except Exception as e:
+                logger.error(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+        for name, samples in collected.items():
+            _, kind, help_text, _, _ = samples[0]
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for _, _, _, labels, value in samples:
+                lines.append(f"{name}{_format_labels(sorted((k, str(v)) for k, v in labels.items()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,67 @@
+import logging
+import numpy as np
+from typing import Optional
+from pydub import AudioSegment
+from Variable.configurations import MIX_FRAME_RATE, MIX_CHANNELS
+from helper.audio_conversions import segment_to_float32, float32_to_segment
+from helper.metrics import Metrics
+
+logger = logging.getLogger(__name__)
+
+class MixBus:
+    """Float32 mixing buffer covering the whole story timeline.
+
+    The buffer is allocated once for `total_duration_ms`; each clip is added
+    in place at its start offset. Clipping and the int16 conversion happen a
+    single time in `to_audio_segment`, instead of once per overlaid cue.
+    """
+
+    def __init__(self, total_duration_ms: int, frame_rate: int = MIX_FRAME_RATE, channels: int = MIX_CHANNELS):
+        self.frame_rate = frame_rate
+        self.total_duration_ms = max(0, int(total_duration_ms))
+        total_frames = self._ms_to_frames(self.total_duration_ms)
+        self._buffer = np.zeros((total_frames, channels), dtype=np.float32)
+        logger.info(f"Allocated mix bus: {total_frames} frames @ {frame_rate}Hz, {channels} channel(s)")
+
+    @property
+    def channels(self) -> int:
+        return self._buffer.shape[1]
+
+    def _ms_to_frames(self, ms: int) -> int:
+        return int(round(ms * self.frame_rate / 1000.0))
+
+    def _widen_to(self, channels: int):
+        """Upmix the bus (e.g. mono -> stereo) the first time a wider clip is added."""
+        logger.debug(f"Widening mix bus from {self.channels} to {channels} channels")
+        self._buffer = np.repeat(self._buffer[:, :1], channels, axis=1)
+
+    def add_samples(self, samples: np.ndarray, position_ms: int = 0, gain_db: float = 0.0):
+        """Add float32 samples of shape (frames, channels) at position_ms; anything past the end is dropped."""
+        if samples.ndim == 1:
+            samples = samples[:, np.newaxis]
+        if samples.shape[1] > self.channels:
+            self._widen_to(samples.shape[1])
+        start = self._ms_to_frames(max(0, int(position_ms)))
+        end = min(start + samples.shape[0], self._buffer.shape[0])
+        if end <= start:
+            return
+        target = self._buffer[start:end]
+        scale = 10.0 ** (gain_db / 20.0) if gain_db else 1.0
+        if scale == 1.0:
+            target += samples[: end - start]
+        else:
+            target += samples[: end - start] * np.float32(scale)
+
+    def add(self, segment: AudioSegment, position_ms: int = 0, gain_db: float = 0.0, max_duration_ms: Optional[int] = None):
+        """Mix an AudioSegment into the bus, optionally trimmed to max_duration_ms."""
+        with Metrics.get_instance().stage("mix"):
+            channels = max(self.channels, segment.channels)
+            samples = segment_to_float32(segment, frame_rate=self.frame_rate, channels=channels)
+            if max_duration_ms is not None:
+                samples = samples[: self._ms_to_frames(max_duration_ms)]
+            self.add_samples(samples, position_ms=position_ms, gain_db=gain_db)
+
+    def to_audio_segment(self) -> AudioSegment:
+        """Render the bus to a 16-bit AudioSegment (single clip + conversion)."""
+        with Metrics.get_instance().stage("mix_render"):
+            return float32_to_segment(self._buffer, self.frame_rate)
@@ -0,0 +1,266 @@
+import gc
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_CGROUP_V2_LIMIT = "/sys/fs/cgroup/memory.max"
+_CGROUP_V2_USAGE = "/sys/fs/cgroup/memory.current"
+_CGROUP_V1_LIMIT = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+_CGROUP_V1_USAGE = "/sys/fs/cgroup/memory/memory.usage_in_bytes"
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no pooled model instance could be leased within the timeout."""
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        with open(path, "r") as f:
+            value = f.read().strip()
+    except OSError:
+        return None
+    return int(value) if value.isdigit() else None  # cgroup v2 writes "max" when unlimited
+
+def available_memory_bytes() -> Optional[int]:
+    """Memory this process can still use: the lower of the container (cgroup) headroom and the
+    host's MemAvailable. None if neither can be read."""
+    candidates = []
+    for limit_path, usage_path in ((_CGROUP_V2_LIMIT, _CGROUP_V2_USAGE), (_CGROUP_V1_LIMIT, _CGROUP_V1_USAGE)):
+        limit, usage = _read_int(limit_path), _read_int(usage_path)
+        if limit is not None and usage is not None and limit < 1 << 60:  # v1 reports "unlimited" as a huge number
+            candidates.append(max(0, limit - usage))
+            break
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    candidates.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        try:
+            candidates.append(os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE"))
+        except (ValueError, OSError, AttributeError):
+            pass
+    return min(candidates) if candidates else None
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class _Slot:
+    __slots__ = ("instance", "idle_since")
+
+    def __init__(self, instance: Any):
+        self.instance = instance
+        self.idle_since = time.monotonic()
+
+class ModelPool:
+    """Elastic pool of model instances leased one caller at a time.
+
+    `lease()` hands out an idle instance, or loads a new one while the pool is
+    below `max_size` and the node has memory for it (the per-instance footprint
+    is measured on the first load, unless `measure_footprint` is off because
+    instances share state loaded with the first one; `instance_bytes` is the
+    estimate until then).
+    Otherwise callers wait, and give up with PoolTimeoutError after the lease
+    timeout. Instances idle for longer than `idle_ttl_s` are unloaded by a
+    background reaper, down to `min_size`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        max_size: int,
+        min_size: int = 1,
+        idle_ttl_s: float = 600.0,
+        lease_timeout_s: Optional[float] = None,
+        instance_bytes: int = 0,
+        memory_headroom_bytes: int = 0,
+        on_evict: Optional[Callable[[], None]] = None,
+        measure_footprint: bool = True,
+    ):
+        self.name = name
+        self._factory = factory
+        self.max_size = max(1, max_size)
+        self.min_size = max(0, min(min_size, self.max_size))
+        self.idle_ttl_s = idle_ttl_s
+        self.lease_timeout_s = lease_timeout_s
+        self.instance_bytes = instance_bytes
+        self.memory_headroom_bytes = memory_headroom_bytes
+        self._on_evict = on_evict
+        self.measure_footprint = measure_footprint
+        self._cond = threading.Condition()
+        self._idle: List[_Slot] = []  # most recently returned last
+        self._all: List[Any] = []
+        self._loading = 0
+        self._waiting = 0
+        self._reaper: Optional[threading.Thread] = None
+        self._memory_limited = False
+        self.leases = 0
+        self.timeouts = 0
+        self.created = 0
+        self.evicted = 0
+
+    # Sizing
+
+    def _size_locked(self) -> int:
+        return len(self._all) + self._loading
+
+    def _can_grow_locked(self) -> bool:
+        size = self._size_locked()
+        if size >= self.max_size:
+            return False
+        if size == 0:
+            return True  # always allow one instance, whatever the memory reading says
+        available = available_memory_bytes()
+        if available is None or available - self.memory_headroom_bytes >= self.instance_bytes:
+            self._memory_limited = False
+            return True
+        if not self._memory_limited:
+            logger.warning(
+                f"{self.name} pool held at {size} instances: {available / 2**30:.1f} GiB available, "
+                f"{self.instance_bytes / 2**30:.1f} GiB per instance + {self.memory_headroom_bytes / 2**30:.1f} GiB headroom"
+            )
+            self._memory_limited = True
+        return False
+
+    def _load(self) -> Any:
+        """Load one instance (already counted in `_loading`), measuring its memory footprint."""
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        try:
+            instance = self._factory()
+        except BaseException:
+            with self._cond:
+                self._loading -= 1
+                self._cond.notify()
+            raise
+        rss_after = _rss_bytes()
+        with self._cond:
+            self._loading -= 1
+            self._all.append(instance)
+            self.created += 1
+            if self.measure_footprint and self.created == 1 and rss_before is not None and rss_after is not None and rss_after > rss_before:
+                self.instance_bytes = rss_after - rss_before  # measured footprint replaces the estimate
+            size = len(self._all)
+        logger.info(f"Loaded {self.name} instance {size}/{self.max_size} in {time.perf_counter() - start:.1f}s")
+        self._start_reaper()
+        return instance
+
+    # Leasing
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """Lease an instance; must be given back with `release`. Raises PoolTimeoutError on timeout."""
+        timeout = self.lease_timeout_s if timeout is None else timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._idle and not self._can_grow_locked():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeoutError(f"No {self.name} instance free after {timeout}s ({self._size_locked()} in use)")
+                self._waiting += 1
+                try:
+                    self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+            self.leases += 1
+            if self._idle:
+                return self._idle.pop().instance
+            self._loading += 1
+        return self._load()  # outside the lock: other callers keep leasing idle instances meanwhile
+
+    def release(self, instance: Any):
+        with self._cond:
+            self._idle.append(_Slot(instance))
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        """`with pool.lease() as instance:` — exclusive use of one instance for the block."""
+        instance = self.acquire(timeout)
+        try:
+            yield instance
+        finally:
+            self.release(instance)
+
+    def prewarm(self, count: int):
+        """Load instances until the pool holds min(count, max_size) (memory permitting). Idempotent."""
+        while True:
+            with self._cond:
+                if self._size_locked() >= min(count, self.max_size) or not self._can_grow_locked():
+                    return
+                self._loading += 1
+            self.release(self._load())
+
+    def any_instance(self) -> Any:
+        """Some loaded instance (leased or not), loading one if the pool is empty.
+
+        For reading configuration only (e.g. a sampling rate): generation must go through `lease()`.
+        """
+        with self._cond:
+            if self._all:
+                return self._all[0]
+        with self.lease() as instance:
+            return instance
+
+    # Shrinking
+
+    def _start_reaper(self):
+        if self.idle_ttl_s <= 0:
+            return
+        with self._cond:
+            if self._reaper is not None:
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, name=f"{self.name}-pool-reaper", daemon=True)
+        self._reaper.start()
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(max(1.0, self.idle_ttl_s / 2))
+            self.shrink_idle()
+
+    def shrink_idle(self) -> int:
+        """Unload instances idle for longer than idle_ttl_s, keeping min_size; returns how many."""
+        now = time.monotonic()
+        with self._cond:
+            expired = [slot for slot in self._idle if now - slot.idle_since > self.idle_ttl_s]
+            expired = expired[: max(0, len(self._all) - self.min_size)]
+            for expired_slot in expired:
+                self._idle.remove(expired_slot)
+                self._all.remove(expired_slot.instance)
+            self.evicted += len(expired)
+            size = len(self._all)
+        count = len(expired)
+        if count == 0:
+            return 0
+        del expired, expired_slot  # drop the last references before collecting
+        gc.collect()
+        if self._on_evict is not None:
+            self._on_evict()
+        logger.info(f"Unloaded {count} idle {self.name} instance(s); {size} left")
+        return count
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "size": len(self._all),
+                "loading": self._loading,
+                "idle": len(self._idle),
+                "in_use": len(self._all) - len(self._idle),
+                "waiting": self._waiting,
+                "max_size": self.max_size,
+                "min_size": self.min_size,
+                "instance_bytes": self.instance_bytes,
+                "leases": self.leases,
+                "timeouts": self.timeouts,
+                "created": self.created,
+                "evicted": self.evicted,
+            }
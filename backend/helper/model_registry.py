@@ -0,0 +1,127 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from Variable.configurations import GLINER_MODEL_NAME, TANGOFLUX_BATCHING, PARALLEL_EXECUTION, PARALLEL_WORKERS
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """Lazy, thread-safe registry of heavy models.
+
+    Each model is registered with a loader that does its own (heavy) imports,
+    so importing this module or the server costs nothing. `get` loads a model
+    on first use, exactly once even under concurrent requests; `preload` warms
+    a chosen subset (see PRELOAD_ENDPOINTS in Variable/configurations.py).
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._models: Dict[str, Any] = {}
+        self._errors: Dict[str, str] = {}
+        self._load_times: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._registry_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+                    _register_default_models(cls._instance)
+        return cls._instance
+
+    def register(self, name: str, loader: Callable[[], Any]):
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._locks.setdefault(name, threading.Lock())
+
+    def get(self, name: str) -> Any:
+        """Return the model, loading it on first use. Raises if the loader fails."""
+        if name in self._models:
+            return self._models[name]
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+        with self._locks[name]:
+            if name not in self._models:
+                logger.info(f"Loading model '{name}'...")
+                start = time.perf_counter()
+                try:
+                    model = self._loaders[name]()
+                except Exception as e:
+                    self._errors[name] = str(e)
+                    raise
+                self._load_times[name] = time.perf_counter() - start
+                self._errors.pop(name, None)
+                self._models[name] = model
+                logger.info(f"Loaded model '{name}' in {self._load_times[name]:.1f}s")
+        return self._models[name]
+
+    def get_optional(self, name: str) -> Optional[Any]:
+        """Like `get`, but returns None (once logged) for models that are optional and failed to load."""
+        if name in self._errors:
+            return None
+        try:
+            return self.get(name)
+        except Exception as e:
+            logger.warning(f"Model '{name}' unavailable: {e}")
+            return None
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def preload(self, names: Iterable[str]):
+        """Load the given models now; failures are logged, not raised."""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"Failed to preload model '{name}': {e}")
+
+    def status(self) -> List[dict]:
+        return [
+            {
+                "name": name,
+                "loaded": name in self._models,
+                "load_time_s": self._load_times.get(name),
+                "error": self._errors.get(name),
+            }
+            for name in self._loaders
+        ]
+
+def _load_spacy():
+    import spacy
+    return spacy.load("en_core_web_sm")
+
+def _load_gliner():
+    from gliner import GLiNER
+    return GLiNER.from_pretrained(GLINER_MODEL_NAME)
+
+# Pooled models register their class, not an instance: the pool unloads idle instances,
+# which a reference held here would keep alive.
+def _load_tangoflux():
+    from helper.lib import TangoFluxModel
+    TangoFluxModel.initialize_pool(1 if TANGOFLUX_BATCHING or not PARALLEL_EXECUTION else PARALLEL_WORKERS)
+    return TangoFluxModel
+
+def _load_parler_tts():
+    from helper.lib import ParlerTTSModel
+    ParlerTTSModel.initialize_pool(1)
+    return ParlerTTSModel
+
+def _load_clap():
+    import laion_clap
+    model = laion_clap.CLAP_Module(enable_fusion=False)
+    model.load_ckpt()  # Downloads pre-trained weights automatically
+    return model
+
+def _register_default_models(registry: ModelRegistry):
+    registry.register("spacy", _load_spacy)
+    registry.register("gliner", _load_gliner)
+    registry.register("tangoflux", _load_tangoflux)
+    registry.register("parler_tts", _load_parler_tts)
+    registry.register("clap", _load_clap)
@@ -0,0 +1,243 @@
+import csv
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Dict, List, Optional, Set
+import numpy as np
+from pydub import AudioSegment
+from Variable.configurations import (
+    PATH_TO_MOVIE_BGMS,
+    PATH_TO_MOVIE_BGM_METADATA,
+    MOVIE_BGM_PCM_DIR,
+    MOVIE_BGM_SAMPLE_RATE,
+    MOVIE_BGM_CHANNELS,
+)
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_MANIFEST = "manifest.json"
+_FILE_NAME_COLUMNS = ("file_name", "filename", "file", "path", "audio_path", "audio_class", "name")
+_TAG_SPLIT = re.compile(r"[^\w]+")
+
+def _backend_path(path: str) -> str:
+    return path if os.path.isabs(path) else os.path.join(_BACKEND_ROOT, path)
+
+def _normalize_name(name: str) -> str:
+    """Library key for a BGM: its path relative to the library, with the .mp3 suffix."""
+    name = name.strip().replace("\\", "/").lstrip("/")
+    return name if name.endswith(".mp3") else name + ".mp3"
+
+def _file_stamp(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_size}-{st.st_mtime_ns}"
+
+class MovieBgmLibrary:
+    """Pre-decoded MOVIE_BGM clips plus an in-memory index of the metadata CSV.
+
+    Each MP3 is decoded once (by `ingest` or on first use) to raw int16 PCM at
+    MOVIE_BGM_SAMPLE_RATE / MOVIE_BGM_CHANNELS in MOVIE_BGM_PCM_DIR; a manifest
+    records frame counts and the source file's size+mtime so edited MP3s are
+    re-decoded. Lookups memory-map the PCM and slice it, instead of launching
+    ffmpeg per cue. The metadata CSV is parsed once and reloaded only when the
+    file changes on disk.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(
+        self,
+        bgm_dir: str = PATH_TO_MOVIE_BGMS,
+        pcm_dir: str = MOVIE_BGM_PCM_DIR,
+        metadata_path: str = PATH_TO_MOVIE_BGM_METADATA,
+    ):
+        self.bgm_dir = _backend_path(bgm_dir)
+        self.pcm_dir = _backend_path(pcm_dir)
+        self.metadata_path = _backend_path(metadata_path)
+        self._store_lock = threading.Lock()  # manifest and maps; never held while ffmpeg runs
+        self._decode_locks: Dict[str, threading.Lock] = {}
+        self._maps: Dict[str, np.memmap] = {}
+        self._manifest = self._load_manifest()
+        self._metadata_lock = threading.Lock()
+        self._metadata_stamp: Optional[str] = None
+        self._metadata_text = ""
+        self._rows: Dict[str, Dict[str, str]] = {}
+        self._tags: Dict[str, Set[str]] = {}
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    # PCM store
+
+    def _load_manifest(self) -> Dict[str, dict]:
+        try:
+            with open(os.path.join(self.pcm_dir, _MANIFEST), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest_locked(self):
+        os.makedirs(self.pcm_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.pcm_dir, prefix=".manifest-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(self._manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, os.path.join(self.pcm_dir, _MANIFEST))
+
+    def _entry_is_fresh(self, name: str, source_path: str) -> bool:
+        entry = self._manifest.get(name)
+        if entry is not None and not os.path.exists(source_path):
+            # Deployed with the PCM store only; the ingested copy is authoritative
+            return os.path.exists(os.path.join(self.pcm_dir, entry["file"]))
+        return (
+            entry is not None
+            and entry.get("source") == _file_stamp(source_path)
+            and entry.get("frame_rate") == MOVIE_BGM_SAMPLE_RATE
+            and entry.get("channels") == MOVIE_BGM_CHANNELS
+            and os.path.exists(os.path.join(self.pcm_dir, entry["file"]))
+        )
+
+    def _decode(self, name: str, source_path: str):
+        """Decode one MP3 through ffmpeg into a temporary PCM file; returns (tmp_path, manifest entry)."""
+        logger.info(f"Decoding movie bgm into PCM store: {name}")
+        stamp = _file_stamp(source_path)
+        segment = (
+            AudioSegment.from_file(source_path)
+            .set_frame_rate(MOVIE_BGM_SAMPLE_RATE)
+            .set_channels(MOVIE_BGM_CHANNELS)
+            .set_sample_width(2)
+        )
+        os.makedirs(self.pcm_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.pcm_dir, prefix=".pcm-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(segment.raw_data)
+        return tmp_path, {
+            "file": name[: -len(".mp3")].replace("/", "__") + ".pcm",
+            "frames": int(len(segment.raw_data) // (2 * MOVIE_BGM_CHANNELS)),
+            "frame_rate": MOVIE_BGM_SAMPLE_RATE,
+            "channels": MOVIE_BGM_CHANNELS,
+            "source": stamp,
+        }
+
+    def _ensure_decoded(self, name: str, source_path: str) -> bool:
+        """Decode a BGM into the PCM store unless it is fresh there; True if it was decoded.
+
+        ffmpeg runs outside the store lock, under a per-name lock, so other BGMs stay readable
+        and concurrent first uses of one BGM share a single decode.
+        """
+        with self._store_lock:
+            if self._entry_is_fresh(name, source_path):
+                return False
+            decode_lock = self._decode_locks.setdefault(name, threading.Lock())
+        with decode_lock:
+            with self._store_lock:
+                if self._entry_is_fresh(name, source_path):
+                    return False  # decoded by the caller we waited for
+            tmp_path, entry = self._decode(name, source_path)
+            with self._store_lock:
+                # File and manifest entry change together, so a reader never maps one with the other's frame count
+                os.replace(tmp_path, os.path.join(self.pcm_dir, entry["file"]))
+                self._maps.pop(name, None)
+                self._manifest[name] = entry
+                self._write_manifest_locked()
+        return True
+
+    def _pcm(self, name: str) -> np.memmap:
+        """Memory-mapped (frames, channels) int16 PCM for a BGM, decoding it first if needed."""
+        self._ensure_decoded(name, os.path.join(self.bgm_dir, name))
+        with self._store_lock:
+            pcm = self._maps.get(name)
+            if pcm is None:
+                entry = self._manifest[name]
+                pcm = np.memmap(
+                    os.path.join(self.pcm_dir, entry["file"]),
+                    dtype=np.int16,
+                    mode="r",
+                    shape=(entry["frames"], entry["channels"]),
+                )
+                self._maps[name] = pcm
+            return pcm
+
+    def duration_ms(self, name: str) -> int:
+        """Length of a BGM in milliseconds (from the PCM store)."""
+        return int(len(self._pcm(_normalize_name(name))) * 1000 / MOVIE_BGM_SAMPLE_RATE)
+
+    def get_segment(self, name: str, duration_ms: Optional[int] = None) -> AudioSegment:
+        """The BGM as an AudioSegment, sliced to its first `duration_ms` if given."""
+        pcm = self._pcm(_normalize_name(name))
+        if duration_ms is not None:
+            pcm = pcm[: int(duration_ms * MOVIE_BGM_SAMPLE_RATE / 1000)]
+        return AudioSegment(
+            data=pcm.tobytes(),
+            sample_width=2,
+            frame_rate=MOVIE_BGM_SAMPLE_RATE,
+            channels=MOVIE_BGM_CHANNELS,
+        )
+
+    def ingest(self) -> int:
+        """Decode every MP3 in the library that is missing or stale in the PCM store; returns the count."""
+        names = sorted(f for f in os.listdir(self.bgm_dir) if f.endswith(".mp3"))
+        decoded = 0
+        for name in names:
+            try:
+                decoded += self._ensure_decoded(name, os.path.join(self.bgm_dir, name))
+            except Exception as e:
+                logger.error(f"Failed to decode movie bgm {name}: {e}")
+        logger.info(f"Movie bgm ingest: {decoded} decoded, {len(names) - decoded} already up to date")
+        return decoded
+
+    # Metadata index
+
+    def _refresh_metadata(self):
+        stamp = _file_stamp(self.metadata_path)
+        with self._metadata_lock:
+            if stamp == self._metadata_stamp:
+                return
+            with open(self.metadata_path, "r") as f:
+                text = f.read()
+            rows: Dict[str, Dict[str, str]] = {}
+            tags: Dict[str, Set[str]] = {}
+            reader = csv.DictReader(io.StringIO(text))
+            fields = reader.fieldnames or []
+            name_column = next((c for c in fields if c.strip().lower() in _FILE_NAME_COLUMNS), fields[0] if fields else None)
+            for row in reader:
+                if name_column is None or not row.get(name_column):
+                    continue
+                name = _normalize_name(row[name_column])
+                rows[name] = row
+                words = " ".join(str(value) for key, value in row.items() if key != name_column and value)
+                tags[name] = {word for word in _TAG_SPLIT.split(words.lower()) if word}
+            self._metadata_text, self._rows, self._tags = text, rows, tags
+            self._metadata_stamp = stamp
+            logger.info(f"Indexed movie bgm metadata: {len(rows)} entries")
+
+    def metadata_csv(self) -> str:
+        """The raw metadata CSV (for the LLM prompt), re-read only when the file changes."""
+        self._refresh_metadata()
+        return self._metadata_text
+
+    def metadata(self, name: str) -> Optional[Dict[str, str]]:
+        """The CSV row for a BGM file name (with or without .mp3), if listed."""
+        self._refresh_metadata()
+        return self._rows.get(_normalize_name(name))
+
+    def search(self, tags: List[str]) -> List[str]:
+        """BGM file names whose metadata contains every one of `tags` (case-insensitive words)."""
+        self._refresh_metadata()
+        wanted = {tag.lower() for tag in tags}
+        return [name for name, words in self._tags.items() if wanted <= words]
+
+
+if __name__ == "__main__":
+    # Ingest step: python -m helper.movie_bgm_library
+    logging.basicConfig(level=logging.INFO)
+    MovieBgmLibrary.get_instance().ingest()
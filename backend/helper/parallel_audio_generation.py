@@ -3,110 +3,209 @@ import concurrent.futures
 import logging
 import multiprocessing
 import threading
-from Variable.dataclases import Cue, AudioCueWithAudioBase64
-from Variable.configurations import PARALLEL_EXECUTION, PARALLEL_WORKERS
+import time
+from Variable.dataclases import Cue, NarratorCue, AudioCueWithAudioBase64, AudioCueWithAudio
+from pydub import AudioSegment
+from Variable.configurations import PARALLEL_EXECUTION, PARALLEL_WORKERS, TANGOFLUX_BATCHING, EXECUTION_BACKEND, PROCESS_WORKERS
 from helper.audio_conversions import audio_to_base64
-from Tools.play_audio import create_audio_from_audiocue
-from helper.lib import TangoFluxModel, _thread_local
+from Tools.play_audio import create_audio_from_audiocue, is_clip_cached
+from helper.batched_generation import generate_batched_clips
+from helper.lib import TangoFluxModel, ParlerTTSModel
+from helper.job_manager import JobProgress
+from helper.process_pool import ProcessCueExecutor
+from helper.cue_scheduler import CueCostModel, longest_first, log_makespan
+from helper.metrics import Metrics
+from helper.step_policy import plan_steps
 
 logger = logging.getLogger(__name__)
 
-def process_cue(cue: Cue, worker_id: Optional[int] = None):
+def process_cue(cue: Cue, raw_clip: Optional[AudioSegment] = None, encode: bool = True):
     """
     Processes a single cue in a worker thread.
     
     Args:
         cue: Audio cue to process
-        worker_id: Optional worker ID for parallel execution (uses model pool)
+        raw_clip: Optional pre-generated specialist output (from batched generation)
+        encode: If True return AudioCueWithAudioBase64, otherwise AudioCueWithAudio (no base64 step)
     """
     try:
-        # Store worker_id in thread-local for use in generators
-        if worker_id is not None:
-            _thread_local.worker_id = worker_id
-            
-        logger.info(f"Processing cue: {cue}")
-        logger.info(f"Cue type: {cue.audio_type}")
+        logger.info(f"Processing cue {getattr(cue, 'id', 'unknown')} ({cue.audio_type})")
         
-        audio_data = create_audio_from_audiocue(cue)
-        base64_data = audio_to_base64(audio_data)
-        return AudioCueWithAudioBase64(
-            audio_cue=cue,
-            audio_base64=base64_data,
-            duration_ms=cue.duration_ms,
-        )
+        audio_data = create_audio_from_audiocue(cue, raw_clip)
+        return _package(cue, audio_data, encode)
     except Exception as e:
         logger.error(f"Failed to process cue {getattr(cue, 'id', 'unknown')}: {e}")
         raise
 
+def _package(cue: Cue, audio_data: AudioSegment, encode: bool):
+    """Wrap a rendered cue as AudioCueWithAudioBase64 (encode=True) or AudioCueWithAudio."""
+    if not encode:
+        return AudioCueWithAudio(audio_cue=cue, audio=audio_data, duration_ms=cue.duration_ms)
+    base64_data = audio_to_base64(audio_data)
+    return AudioCueWithAudioBase64(
+        audio_cue=cue,
+        audio_base64=base64_data,
+        duration_ms=cue.duration_ms,
+    )
+
+
+def _timed_process_cue(cue: Cue, estimate_s: float, precomputed: bool, raw_clip: Optional[AudioSegment], encode: bool):
+    """process_cue, feeding the measured time back to the cost model when the cue was really generated."""
+    start = time.perf_counter()
+    data = process_cue(cue, raw_clip, encode)
+    if not precomputed:
+        CueCostModel.get_instance().record(cue, estimate_s, time.perf_counter() - start)
+    return data
 
-def parallel_audio_generation(cues: List[Cue]):
+def _collect_results(future_to_index, cues: List[Cue], finish, results: list, progress: Optional[JobProgress]):
+    """Gather futures as they complete; `finish(cue_index, future_result)` builds each result entry."""
+    for future in concurrent.futures.as_completed(future_to_index):
+        index = future_to_index[future]
+        cue = cues[index]
+        error = None
+        try:
+            data = finish(index, future.result())
+            if data:
+                results.append(data)
+                logger.info(
+                    f"Successfully generated audio for cue {getattr(cue, 'id', 'N/A')}"
+                )
+        except IndexError as e:
+            error = str(e)
+            logger.error(
+                f"IndexError (Scheduler Bug) in cue {getattr(cue, 'id', 'N/A')}: {e}"
+            )
+        except Exception as e:
+            error = str(e)
+            logger.error(f"General error in cue {getattr(cue, 'id', 'N/A')}: {e}")
+        if progress is not None:
+            progress.cue_done(getattr(cue, 'id', None), ok=error is None, error=error)
+
+def parallel_audio_generation(
+    cues: List[Cue],
+    progress: Optional[JobProgress] = None,
+    encode: bool = True,
+    latency_budget_s: Optional[float] = None,
+):
     """
     Generate audio for multiple cues in parallel or sequentially based on configuration.
+    If `progress` is given, each finished (or failed) cue is reported to it as it completes.
+    With encode=False the results are AudioCueWithAudio (PCM) instead of base64 WAV.
+    Diffusion steps are planned per cue first (helper/step_policy.py), within `latency_budget_s`
+    if given; the returned cues carry the steps they were generated with.
     
+    If TANGOFLUX_BATCHING=True: SFX/AMBIENCE/MUSIC cues are first rendered in batched diffusion
+    calls on a single model instance; workers then only run the remaining cues, fades and encoding.
     If PARALLEL_EXECUTION=True: Uses ThreadPoolExecutor with model pool (one model per worker)
     If PARALLEL_EXECUTION=False: Processes sequentially with single model instance
+    If EXECUTION_BACKEND="process": cues are rendered in the persistent worker processes of
+    ProcessCueExecutor (each with its own models; no parent-side batching) and come back
+    through shared memory.
     """
     if not cues:
         return []
     
     results = []
+    if EXECUTION_BACKEND == "process":
+        planned_workers = PROCESS_WORKERS
+    elif PARALLEL_EXECUTION:
+        planned_workers = min(len(cues), PARALLEL_WORKERS)
+    else:
+        planned_workers = 1
+    cues = plan_steps(cues, latency_budget_s, planned_workers)
+
+    if progress is not None:
+        progress.set_total(len(cues))
+        progress.stage("generating", cues=len(cues))
+
+    raw_clips = {}
+    if TANGOFLUX_BATCHING and EXECUTION_BACKEND != "process":
+        raw_clips = generate_batched_clips(cues)
+
+    # Longest-first dispatch: estimated cost per cue (cache hits / batched clips are nearly free)
+    cost_model = CueCostModel.get_instance()
+    precomputed = [index in raw_clips or is_clip_cached(cue) for index, cue in enumerate(cues)]
+    estimates = [cost_model.estimate(cue, done) for cue, done in zip(cues, precomputed)]
+    order = longest_first(cues, estimates)
+    start = time.perf_counter()
+    workers = 1
     
-    logger.info(f"Cues in parallel_audio_generation: {cues}")
-    
-    if PARALLEL_EXECUTION:
+    if EXECUTION_BACKEND == "process":
+        executor = ProcessCueExecutor.get_instance()
+        workers = executor.max_workers
+        logger.info(f"Starting PROCESS-POOL audio generation for {len(cues)} cues")
+        future_to_index = {executor.submit(cues[index]): index for index in order}
+
+        def finish_shared(index, shared):
+            if not precomputed[index]:
+                cost_model.record(cues[index], estimates[index], shared.elapsed_s)
+                # The worker's own metrics stay in its process; record its render time here
+                Metrics.get_instance().observe(
+                    "cinemaudio_cue_generation_seconds", shared.elapsed_s, audio_type=cues[index].audio_type
+                )
+            return _package(cues[index], ProcessCueExecutor.collect(shared), encode)
+
+        _collect_results(future_to_index, cues, finish_shared, results, progress)
+    elif PARALLEL_EXECUTION:
         # Parallel mode: use ThreadPoolExecutor with model pool
         max_workers = min(len(cues), PARALLEL_WORKERS)
         
-        # Initialize model pool for parallel execution
-        TangoFluxModel.initialize_pool(max_workers)
+        # Per-cue mode leases one TangoFlux instance per busy worker; warm them up front
+        # (the pool stops short of max_workers when memory is tight, and workers then share).
+        # Batched mode runs each batch on a single leased instance.
+        if not TANGOFLUX_BATCHING:
+            TangoFluxModel.initialize_pool(max_workers)
+        # Concurrent narrator cues each check out their own ParlerTTS instance
+        narrator_cues = sum(1 for cue in cues if isinstance(cue, NarratorCue))
+        if narrator_cues > 1:
+            ParlerTTSModel.initialize_pool(min(narrator_cues, max_workers))
         
         logger.info(
             f"Starting PARALLEL audio generation for {len(cues)} cues with {max_workers} workers"
         )
         
+        workers = max_workers
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # Submit tasks with worker IDs
-            future_to_cue = {
-                executor.submit(process_cue, cue, worker_id % max_workers): cue
-                for worker_id, cue in enumerate(cues)
+            future_to_index = {
+                executor.submit(
+                    _timed_process_cue,
+                    cues[index],
+                    estimates[index],
+                    precomputed[index],
+                    raw_clips.get(index),
+                    encode,
+                ): index
+                for index in order
             }
 
-            for future in concurrent.futures.as_completed(future_to_cue):
-                cue = future_to_cue[future]
-                try:
-                    data = future.result()
-                    if data:
-                        results.append(data)
-                        logger.info(
-                            f"Successfully generated audio for cue {getattr(cue, 'id', 'N/A')}"
-                        )
-                except IndexError as e:
-                    logger.error(
-                        f"IndexError (Scheduler Bug) in cue {getattr(cue, 'id', 'N/A')}: {e}"
-                    )
-                except Exception as e:
-                    logger.error(f"General error in cue {getattr(cue, 'id', 'N/A')}: {e}")
+            _collect_results(future_to_index, cues, lambda index, data: data, results, progress)
     else:
         # Sequential mode: process one at a time
         logger.info(
             f"Starting SEQUENTIAL audio generation for {len(cues)} cues"
         )
         
-        for cue in cues:
+        for index, cue in enumerate(cues):
+            error = None
             try:
-                data = process_cue(cue, worker_id=None)
+                data = _timed_process_cue(cue, estimates[index], precomputed[index], raw_clips.get(index), encode)
                 if data:
                     results.append(data)
                     logger.info(
                         f"Successfully generated audio for cue {getattr(cue, 'id', 'N/A')}"
                     )
             except IndexError as e:
+                error = str(e)
                 logger.error(
                     f"IndexError (Scheduler Bug) in cue {getattr(cue, 'id', 'N/A')}: {e}"
                 )
             except Exception as e:
+                error = str(e)
                 logger.error(f"General error in cue {getattr(cue, 'id', 'N/A')}: {e}")
+            if progress is not None:
+                progress.cue_done(getattr(cue, 'id', None), ok=error is None, error=error)
 
+    log_makespan(time.perf_counter() - start, estimates, workers)
     results.sort(key=lambda x: x.audio_cue.start_time_ms)
 
     logger.info(
@@ -0,0 +1,110 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Tuple
+import numpy as np
+from pydub import AudioSegment
+from Variable.dataclases import Cue
+from Variable.configurations import PROCESS_WORKERS, PROCESS_TORCH_THREADS, PROCESS_PRELOAD_MODELS
+from helper.audio_conversions import segment_to_float32, float32_to_segment
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SharedAudio:
+    """Handle to a rendered clip left in shared memory by a worker process."""
+    shm_name: str
+    shape: Tuple[int, int]  # (frames, channels), float32
+    frame_rate: int
+    elapsed_s: float  # Render time inside the worker (excludes queueing)
+
+def _torch_threads() -> int:
+    if PROCESS_TORCH_THREADS > 0:
+        return PROCESS_TORCH_THREADS
+    return max(1, (os.cpu_count() or 1) // max(1, PROCESS_WORKERS))
+
+def _init_worker(torch_threads: int):
+    """Runs once in each worker: pin intra-op threads, then load the models this worker will use."""
+    os.environ["OMP_NUM_THREADS"] = str(torch_threads)
+    os.environ["MKL_NUM_THREADS"] = str(torch_threads)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s")
+    try:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    from helper.model_registry import ModelRegistry
+
+    ModelRegistry.get_instance().preload(PROCESS_PRELOAD_MODELS)
+    logger.info(f"Worker {os.getpid()} ready ({torch_threads} torch threads)")
+
+def _render_cue(cue: Cue) -> SharedAudio:
+    """Worker side: render one cue (fades and gain included) into a new shared-memory block."""
+    from Tools.play_audio import create_audio_from_audiocue
+
+    start = time.perf_counter()
+    audio = create_audio_from_audiocue(cue)
+    elapsed_s = time.perf_counter() - start
+    samples = segment_to_float32(audio)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, samples.nbytes))
+    try:
+        np.ndarray(samples.shape, dtype=np.float32, buffer=shm.buf)[:] = samples
+    finally:
+        shm.close()
+    return SharedAudio(shm_name=shm.name, shape=samples.shape, frame_rate=audio.frame_rate, elapsed_s=elapsed_s)
+
+class ProcessCueExecutor:
+    """Process-pool backend for cue generation.
+
+    Each of PROCESS_WORKERS spawned processes loads its own models once and
+    pins torch to PROCESS_TORCH_THREADS intra-op threads, so CPU-bound
+    diffusion runs in parallel without sharing a GIL. Rendered clips come
+    back as float32 arrays in shared memory instead of pickled AudioSegments;
+    the parent copies each out once and frees the block.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_workers: int = PROCESS_WORKERS):
+        torch_threads = _torch_threads()
+        self.max_workers = max_workers
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),  # fork is unsafe once torch has started threads
+            initializer=_init_worker,
+            initargs=(torch_threads,),
+        )
+        logger.info(f"Started process pool: {max_workers} workers x {torch_threads} torch threads")
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def submit(self, cue: Cue) -> concurrent.futures.Future:
+        """Render `cue` in a worker; the future's result is a SharedAudio handle (see `collect`)."""
+        return self._executor.submit(_render_cue, cue)
+
+    @staticmethod
+    def collect(shared: SharedAudio) -> AudioSegment:
+        """Copy a worker's clip out of shared memory into an AudioSegment and release the block."""
+        shm = shared_memory.SharedMemory(name=shared.shm_name)
+        try:
+            samples = np.ndarray(shared.shape, dtype=np.float32, buffer=shm.buf)
+            return float32_to_segment(samples, shared.frame_rate)
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,92 @@
+import concurrent.futures
+import logging
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Result of a flight whose leader gave up without producing a value; followers retry
+_ABANDONED = object()
+
+class SingleFlight:
+    """Coalesces concurrent generations of the same key into one call.
+
+    The first caller for a key (the leader) runs the generation; every caller
+    that arrives while it is in flight waits for and shares the leader's
+    result (or exception) instead of starting its own run. Keys are forgotten
+    as soon as the flight completes: persistence is the clip cache's job.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self._flights: Dict[str, concurrent.futures.Future] = {}
+        self._flights_lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def begin(self, key: str) -> Tuple[bool, concurrent.futures.Future]:
+        """Join the flight for `key`; returns (is_leader, future). A leader must call `finish` or `abandon`."""
+        with self._flights_lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return False, future
+            future = concurrent.futures.Future()
+            self._flights[key] = future
+            self.leaders += 1
+            return True, future
+
+    def try_lead(self, key: str) -> bool:
+        """Start the flight for `key` unless one is in progress (then False, nothing is joined)."""
+        with self._flights_lock:
+            if key in self._flights:
+                return False
+            self._flights[key] = concurrent.futures.Future()
+            self.leaders += 1
+            return True
+
+    def _complete(self, key: str) -> concurrent.futures.Future:
+        with self._flights_lock:
+            return self._flights.pop(key)
+
+    def finish(self, key: str, result: Any):
+        self._complete(key).set_result(result)
+
+    def fail(self, key: str, error: BaseException):
+        self._complete(key).set_exception(error)
+
+    def abandon(self, key: str):
+        """Release a flight without a result; waiting followers retry (one of them becomes leader)."""
+        self._complete(key).set_result(_ABANDONED)
+
+    def do(self, key: str, fn: Callable, *args) -> Any:
+        """Return fn(*args), sharing one in-flight call among all concurrent callers with the same key."""
+        while True:
+            is_leader, future = self.begin(key)
+            if not is_leader:
+                logger.info(f"Coalesced with in-flight generation {key[:12]}")
+                result = future.result()
+                if result is _ABANDONED:
+                    continue
+                return result
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                self.fail(key, e)
+                raise
+            self.finish(key, result)
+            return result
+
+    def stats(self) -> dict:
+        with self._flights_lock:
+            return {"in_flight": len(self._flights), "leaders": self.leaders, "coalesced": self.coalesced}
@@ -0,0 +1,101 @@
+import dataclasses
+import logging
+from typing import List, Optional, Sequence
+from Variable.dataclases import AudioCue, Cue
+from Variable.configurations import (
+    STEPS,
+    ADAPTIVE_STEPS,
+    STEPS_MIN,
+    STEPS_QUANTUM,
+    STEPS_BY_TYPE,
+    STEPS_FULL_QUALITY_S,
+    STEPS_FOREGROUND_DB,
+    STEPS_BACKGROUND_DB,
+    STEPS_BACKGROUND_FACTOR,
+    LATENCY_BUDGET_S,
+    TANGOFLUX_OUTPUT_FORMAT,
+)
+
+logger = logging.getLogger(__name__)
+
+def clamp_steps(steps: float) -> int:
+    """Nearest multiple of STEPS_QUANTUM within [STEPS_MIN, STEPS]."""
+    quantized = int(round(steps / STEPS_QUANTUM)) * STEPS_QUANTUM
+    return max(STEPS_MIN, min(STEPS, quantized))
+
+def _is_diffusion_cue(cue: Cue) -> bool:
+    return isinstance(cue, AudioCue) and cue.audio_type in TANGOFLUX_OUTPUT_FORMAT
+
+def prominence(cue: AudioCue) -> float:
+    """0.0 for background texture (weight_db <= STEPS_BACKGROUND_DB) up to 1.0 for foreground."""
+    span = STEPS_FOREGROUND_DB - STEPS_BACKGROUND_DB
+    return min(1.0, max(0.0, (cue.weight_db - STEPS_BACKGROUND_DB) / span))
+
+def policy_steps(cue: AudioCue) -> int:
+    """Diffusion steps the policy gives a TangoFlux cue by audio_type, duration and prominence."""
+    if not ADAPTIVE_STEPS:
+        return STEPS
+    steps = float(STEPS_BY_TYPE.get(cue.audio_type, STEPS))
+    duration_s = cue.duration_ms / 1000.0
+    if duration_s > STEPS_FULL_QUALITY_S:
+        steps *= (STEPS_FULL_QUALITY_S / duration_s) ** 0.5
+    steps *= STEPS_BACKGROUND_FACTOR + (1.0 - STEPS_BACKGROUND_FACTOR) * prominence(cue)
+    return clamp_steps(steps)
+
+def cue_steps(cue: Cue) -> int:
+    """Steps a TangoFlux cue is generated with: its own `steps` (clamped) if set, else the policy's."""
+    if not ADAPTIVE_STEPS:
+        return STEPS
+    steps = getattr(cue, "steps", None)
+    if steps is not None:
+        return clamp_steps(steps)
+    return policy_steps(cue)  # type: ignore[arg-type]
+
+def plan_steps(cues: Sequence[Cue], latency_budget_s: Optional[float] = None, workers: int = 1) -> List[Cue]:
+    """Copies of `cues` with `steps` filled in for every TangoFlux cue that has none.
+
+    With a latency budget (default LATENCY_BUDGET_S; 0/None = none), policy-chosen steps are
+    lowered until the estimated generation time on `workers` workers fits: least prominent cues
+    first, each down to STEPS_MIN before the next is touched. Cues with explicit steps and cues
+    already in the clip cache keep theirs (fewer steps would be a cache miss, so slower).
+    Without ADAPTIVE_STEPS the cues are returned unchanged (every cue runs at STEPS).
+    """
+    if not ADAPTIVE_STEPS:
+        return list(cues)
+    planned = [
+        dataclasses.replace(cue, steps=policy_steps(cue)) if _is_diffusion_cue(cue) and cue.steps is None else cue
+        for cue in cues
+    ]
+    budget_s = LATENCY_BUDGET_S if latency_budget_s is None else latency_budget_s
+    if not budget_s or budget_s <= 0:
+        return planned
+
+    # Imported here: both modules import this one
+    from Tools.play_audio import is_clip_cached
+    from helper.cue_scheduler import CueCostModel
+
+    cost_model = CueCostModel.get_instance()
+    precomputed = [is_clip_cached(cue) for cue in planned]
+    total_s = sum(cost_model.estimate(cue, done) for cue, done in zip(planned, precomputed))
+    target_s = budget_s * max(1, workers)
+    adjustable = [
+        i for i, cue in enumerate(cues)
+        if _is_diffusion_cue(cue) and cue.steps is None and not precomputed[i]
+    ]
+    adjustable.sort(key=lambda i: (prominence(planned[i]), -planned[i].duration_ms))  # type: ignore[arg-type]
+    initial_s = total_s
+    for i in adjustable:
+        while total_s > target_s and planned[i].steps > STEPS_MIN:  # type: ignore[union-attr]
+            before_s = cost_model.estimate(planned[i])
+            planned[i] = dataclasses.replace(planned[i], steps=clamp_steps(planned[i].steps - STEPS_QUANTUM))  # type: ignore[union-attr]
+            total_s += cost_model.estimate(planned[i]) - before_s
+        if total_s <= target_s:
+            break
+    level = logging.INFO if total_s <= target_s else logging.WARNING
+    logger.log(
+        level,
+        f"Step plan for a {budget_s:.1f}s budget on {max(1, workers)} workers: "
+        f"estimated {initial_s / max(1, workers):.1f}s -> {total_s / max(1, workers):.1f}s"
+        + ("" if total_s <= target_s else " (budget not reachable at STEPS_MIN)"),
+    )
+    return planned
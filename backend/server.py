@@ -8,11 +8,20 @@ Provides API endpoints for:
 
 import os
 import sys
+import json
+import uuid
+import asyncio
+import concurrent.futures
 import logging
+import threading
+import time
 from datetime import datetime
+from typing import Optional
 
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 import uvicorn
 
 # Add project root to path
@@ -29,21 +38,35 @@ from Variable.dataclases import (
     DecideCuesResponse,
     EvaluateAudioRequest,
     EvaluateAudioResponse,
+    EvaluateAudioBatchRequest,
+    EvaluateAudioBatchResponse,
     GenerateAudioFromCuesRequest,
     GenerateAudioFromCuesResponse,
     GenerateFromStoryRequest,
     GenerateFromStoryResponse,
     GenerateAudioCuesWithAudioBase64Request,
-    GenerateAudioCuesWithAudioBase64Response
+    GenerateAudioCuesWithAudioBase64Response,
+    JobStatusResponse,
+    JobSubmitResponse,
 )
 from helper.audio_conversions import dict_to_cue
 
-from Variable.configurations import READING_SPEED_WPS, PARALLEL_EXECUTION, PARALLEL_WORKERS
+from Variable.configurations import READING_SPEED_WPS, JOB_EVENT_POLL_S, MIX_FRAME_RATE, MIX_CHANNELS
+from Variable.configurations import ENDPOINT_MODELS, PRELOAD_ENDPOINTS, PRELOAD_IN_BACKGROUND, PARALLEL_WORKERS
 from Tools.decide_audio import decide_audio_cues
 from superimposition_model.superimposition_model import superimpose_audio_cues, superimpose_audio_cues_with_audio_base64,superimposition_model
 from Evaluation.evaluator import AudioEvaluator
-from helper.audio_conversions import audio_to_base64
+from helper.audio_conversions import audio_to_base64, audio_cue_to_dict, iter_audio_bytes, iter_wav_stream, AUDIO_MEDIA_TYPES
+from helper.incremental_render import iter_rendered_windows
 from helper.parallel_audio_generation import parallel_audio_generation
+from helper.model_registry import ModelRegistry
+from helper.cue_scheduler import CueCostModel
+from helper.step_policy import plan_steps
+from helper.job_manager import JobManager, JobProgress, JobQueueFullError, Job
+from helper.metrics import Metrics
+from helper.clip_cache import ClipCache
+from helper.decision_cache import DecisionCache
+from helper.single_flight import SingleFlight
 from helper.lib import TangoFluxModel, ParlerTTSModel
 
 # Configure logging to explicitly output to stdout/stderr
@@ -74,28 +97,87 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    """Per-route latency histogram (until the response starts; streamed bodies are not included).
+    Unhandled exceptions are recorded as status 500."""
+    start = time.perf_counter()
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        Metrics.get_instance().observe(
+            "cinemaudio_http_request_seconds",
+            time.perf_counter() - start,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status_code,
+        )
+
+def _runtime_metrics():
+    """Scrape-time samples owned by other components: job queue, model pool, caches, single-flight."""
+    jobs = JobManager.get_instance()
+    queue = jobs.queue_stats()
+    yield ("cinemaudio_job_queue_depth", "gauge", "Render tasks waiting for a job worker", {}, queue["queued"])
+    yield ("cinemaudio_job_running", "gauge", "Render tasks on a job worker", {}, queue["running"])
+    yield ("cinemaudio_jobs_pending", "gauge", "Submitted jobs not finished yet", {}, jobs.pending_count())
+    for model_class in (TangoFluxModel, ParlerTTSModel):
+        if model_class._pool is None:  # not used yet; don't create it just to report it
+            continue
+        pool = model_class._pool.stats()
+        labels = {"model": model_class._pool.name}
+        yield ("cinemaudio_model_pool_size", "gauge", "Model instances loaded in the pool", labels, pool["size"])
+        yield ("cinemaudio_model_pool_in_use", "gauge", "Pooled model instances leased", labels, pool["in_use"])
+        yield ("cinemaudio_model_pool_waiting", "gauge", "Callers waiting for a pooled instance", labels, pool["waiting"])
+        yield ("cinemaudio_model_pool_max_size", "gauge", "Upper bound on the pool size", labels, pool["max_size"])
+        yield ("cinemaudio_model_pool_instance_bytes", "gauge", "Measured (or estimated) memory per instance", labels, pool["instance_bytes"])
+        yield ("cinemaudio_model_pool_leases_total", "counter", "Instances leased", labels, pool["leases"])
+        yield ("cinemaudio_model_pool_timeouts_total", "counter", "Lease attempts that timed out", labels, pool["timeouts"])
+        yield ("cinemaudio_model_pool_evictions_total", "counter", "Idle instances unloaded", labels, pool["evicted"])
+    for model in ModelRegistry.get_instance().status():
+        yield ("cinemaudio_model_loaded", "gauge", "1 if the model is loaded", {"model": model["name"]}, int(model["loaded"]))
+    for name, cache in (("clip", ClipCache._instance), ("decision", DecisionCache._instance)):
+        if cache is None:  # not used yet; don't create it just to report it
+            continue
+        stats = cache.stats()
+        yield ("cinemaudio_cache_hits_total", "counter", "Cache lookups that hit", {"cache": name}, stats["hits"])
+        yield ("cinemaudio_cache_misses_total", "counter", "Cache lookups that missed", {"cache": name}, stats["misses"])
+        yield ("cinemaudio_cache_hit_ratio", "gauge", "Hits / lookups since start", {"cache": name}, stats["hit_rate"])
+    flights = SingleFlight.get_instance().stats()
+    yield ("cinemaudio_single_flight_in_flight", "gauge", "Distinct cue generations in flight", {}, flights["in_flight"])
+    yield ("cinemaudio_single_flight_coalesced_total", "counter", "Generations that joined an in-flight one", {}, flights["coalesced"])
+
+Metrics.get_instance().register_collector(_runtime_metrics)
+
 
 @app.on_event("startup")
 def preload_models():
-    """Preload specialist models at startup so they are downloaded once before first request."""
-    logger.info("Preloading specialist models...")
-    
-    # Preload ParlerTTS model (always needed)
-    ParlerTTSModel.get_instance()
-    logger.info("Preloaded ParlerTTS model")
-    
-    # Preload TangoFlux models based on execution mode
-    if PARALLEL_EXECUTION:
-        # Parallel mode: pre-initialize model pool with PARALLEL_WORKERS instances
-        logger.info(f"Pre-initializing TangoFlux model pool with {PARALLEL_WORKERS} workers for parallel execution...")
-        TangoFluxModel.initialize_pool(PARALLEL_WORKERS)
-        logger.info(f"Preloaded {PARALLEL_WORKERS} TangoFlux model instances for parallel execution")
+    """
+    Warm the models needed by the endpoints this pod serves (PRELOAD_ENDPOINTS).
+    Everything else is loaded lazily on first use. With PRELOAD_IN_BACKGROUND the
+    server accepts requests immediately while the weights load.
+    """
+    models = []
+    for endpoint in PRELOAD_ENDPOINTS:
+        for name in ENDPOINT_MODELS.get(endpoint, []):
+            if name not in models:
+                models.append(name)
+    if not models:
+        logger.info("No models to preload; all models load on first use")
+        return
+
+    def preload():
+        logger.info(f"Preloading models for {PRELOAD_ENDPOINTS}: {models}")
+        ModelRegistry.get_instance().preload(models)
+        logger.info("All specialist models preloaded\n\n")
+
+    if PRELOAD_IN_BACKGROUND:
+        threading.Thread(target=preload, name="model-preload", daemon=True).start()
     else:
-        # Sequential mode: preload single instance
-        TangoFluxModel.get_instance()
-        logger.info("Preloaded TangoFlux model (sequential mode)")
-    
-    logger.info("All specialist models preloaded\n\n")
+        preload()
 
 
 # API Endpoints
@@ -109,7 +191,9 @@ async def root():
             "decide_cues": "/api/v1/decide-cues",
             "generate_audio": "/api/v1/generate-audio",
             "generate_from_story": "/api/v1/generate-from-story",
-            "health": "/api/v1/health"
+            "jobs": "/api/v1/jobs",
+            "health": "/api/v1/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -121,6 +205,22 @@ async def health_check():
         "timestamp": datetime.utcnow().isoformat()
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: stage and per-cue latency histograms, queue, pool and cache gauges"""
+    return Response(content=Metrics.get_instance().render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/api/v1/models")
+async def models_status():
+    """Which models are loaded (lazily or by preloading), with load times and errors, and model pool occupancy"""
+    pools = {cls._pool.name: cls._pool.stats() for cls in (TangoFluxModel, ParlerTTSModel) if cls._pool is not None}
+    return {"models": ModelRegistry.get_instance().status(), "pools": pools}
+
+@app.get("/api/v1/scheduler")
+async def scheduler_status():
+    """Learned per-type generation cost and how accurate the scheduler's estimates have been"""
+    return {"cost_model": CueCostModel.get_instance().stats()}
+
 @app.post("/api/v1/decide-cues", response_model=DecideCuesResponse)
 async def decide_audio_cues_handler(request: DecideCuesRequest):
     """
@@ -132,7 +232,8 @@ async def decide_audio_cues_handler(request: DecideCuesRequest):
     try:
         logger.info(f"Deciding audio cues for story: {request.story_text[:50]}...")
         speed_wps = request.speed_wps if request.speed_wps is not None else READING_SPEED_WPS
-        cues, total_duration = decide_audio_cues(
+        cues, total_duration = await run_in_threadpool(
+            decide_audio_cues,
             request.story_text,
             speed_wps
         )
@@ -149,6 +250,28 @@ async def decide_audio_cues_handler(request: DecideCuesRequest):
             detail=f"Error processing story: {str(e)}"
         )
 
+def _render_audio_from_cues(request: GenerateAudioFromCuesRequest, progress: Optional[JobProgress] = None):
+    """Blocking body of generate-audio; runs on the job executor."""
+    logger.info(f"Generating audio from {len(request.cues)} cues")
+    cues = [dict_to_cue(c.model_dump()) for c in request.cues]
+    audio_cues = parallel_audio_generation(cues, progress, latency_budget_s=request.latency_budget_s)
+    return GenerateAudioFromCuesResponse(
+        audio_cues=audio_cues,
+        message="Successfully generated audio"
+    )
+
+def _render_story_audio(request: GenerateFromStoryRequest, progress: Optional[JobProgress] = None):
+    """Blocking decide + generate + mix for a story; returns the final AudioSegment."""
+    speed_wps = request.speed_wps if request.speed_wps is not None else READING_SPEED_WPS
+    return superimposition_model(request.story_text, speed_wps, progress, request.latency_budget_s)
+
+def _render_from_story(request: GenerateFromStoryRequest, progress: Optional[JobProgress] = None):
+    """Blocking body of generate-from-story; runs on the job executor."""
+    final_audio = _render_story_audio(request, progress)
+    if progress is not None:
+        progress.stage("encoding")
+    return GenerateFromStoryResponse(audio_base64=audio_to_base64(final_audio))
+
 @app.post("/api/v1/generate-audio", response_model=GenerateAudioFromCuesResponse)
 async def generate_audio_from_cues_handler(request: GenerateAudioFromCuesRequest):
     """
@@ -158,19 +281,11 @@ async def generate_audio_from_cues_handler(request: GenerateAudioFromCuesRequest
     superimposed audio track.
     """
     try:
-        
-        logger.info(f"Request: {request}\n\n")
-        
-        
-        logger.info(f"Generating audio from {len(request.cues)} cues")
-        cues = [dict_to_cue(c.model_dump()) for c in request.cues]
-        logger.info(f"Cues converted to dataclasses: {cues}")
-        audio_cues = parallel_audio_generation(cues)
-        return GenerateAudioFromCuesResponse(
-            audio_cues=audio_cues,
-            message="Successfully generated audio"
-        )
+        logger.info(f"Generating audio for {len(request.cues)} cues")
+        return await JobManager.get_instance().run(_render_audio_from_cues, request)
     
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating audio: {e}", exc_info=True)
         raise HTTPException(
@@ -178,6 +293,33 @@ async def generate_audio_from_cues_handler(request: GenerateAudioFromCuesRequest
             detail=f"Error generating audio: {str(e)}"
         )
 
+def _resolve_base64_cues(request: GenerateAudioCuesWithAudioBase64Request):
+    """Normalise the request's cues to dataclasses; returns (audio_cues, total_duration_ms)."""
+    audio_cues = []
+    for cue in request.cues:
+        raw = cue.audio_cue
+        if hasattr(raw, "__dataclass_fields__"):
+            resolved: Cue = raw  # type: ignore[assignment]
+        else:
+            if hasattr(raw, "model_dump"):
+                d = raw.model_dump()  # type: ignore[union-attr]
+            elif hasattr(raw, "keys"):
+                d = dict(raw)  # type: ignore[arg-type]
+            else:
+                d = {f: getattr(raw, f, None) for f in ("id", "audio_type", "start_time_ms", "duration_ms", "audio_class", "weight_db", "fade_ms", "story", "narrator_description")}
+            resolved = dict_to_cue(d)
+        audio_cues.append(
+            AudioCueWithAudioBase64(
+                audio_cue=resolved,
+                audio_base64=cue.audio_base64,
+                duration_ms=cue.duration_ms
+            )
+        )
+    total_duration_ms = max(
+        (c.audio_cue.start_time_ms + c.audio_cue.duration_ms) for c in audio_cues
+    )
+    return audio_cues, total_duration_ms
+
 @app.post("/api/v1/generate-audio-cues-with-audio-base64", response_model=GenerateAudioCuesWithAudioBase64Response)
 async def generate_audio_cues_with_audio_base64(request: GenerateAudioCuesWithAudioBase64Request):
     """
@@ -185,35 +327,16 @@ async def generate_audio_cues_with_audio_base64(request: GenerateAudioCuesWithAu
     """
     try:
         logger.info(f"Generating audio cues with audio base64 from story: {request.story_text[:50]}...")
-        audio_cues = []
-        for cue in request.cues:
-            raw = cue.audio_cue
-            if hasattr(raw, "__dataclass_fields__"):
-                resolved: Cue = raw  # type: ignore[assignment]
-            else:
-                if hasattr(raw, "model_dump"):
-                    d = raw.model_dump()  # type: ignore[union-attr]
-                elif hasattr(raw, "keys"):
-                    d = dict(raw)  # type: ignore[arg-type]
-                else:
-                    d = {f: getattr(raw, f, None) for f in ("id", "audio_type", "start_time_ms", "duration_ms", "audio_class", "weight_db", "fade_ms", "story", "narrator_description")}
-                resolved = dict_to_cue(d)
-            audio_cues.append(
-                AudioCueWithAudioBase64(
-                    audio_cue=resolved,
-                    audio_base64=cue.audio_base64,
-                    duration_ms=cue.duration_ms
-                )
-            )
-        total_duration_ms = max(
-            (c.audio_cue.start_time_ms + c.audio_cue.duration_ms) for c in audio_cues
-        )
+        audio_cues, total_duration_ms = _resolve_base64_cues(request)
         
         logger.info(f"superimposed cues: {len(audio_cues)}")
 
-        final_audio = superimpose_audio_cues_with_audio_base64(audio_cues, total_duration_ms)
+        def mix_and_encode():
+            final_audio = superimpose_audio_cues_with_audio_base64(audio_cues, total_duration_ms)
+            return audio_to_base64(final_audio)
+
         return GenerateAudioCuesWithAudioBase64Response(
-            audio_base64=audio_to_base64(final_audio),
+            audio_base64=await run_in_threadpool(mix_and_encode),
             message="Successfully generated audio cues with audio base64",
         )
     except Exception as e:
@@ -233,18 +356,203 @@ async def generate_from_story(request: GenerateFromStoryRequest):
     """
     try:
         logger.info(f"Generating audio from story: {request.story_text[:50]}...")
-        
-        # Step 1: Decide audio cues
-        speed_wps = request.speed_wps if request.speed_wps is not None else READING_SPEED_WPS
-        
-        final_audio = superimposition_model(request.story_text, speed_wps)
-        return GenerateFromStoryResponse(audio_base64=audio_to_base64(final_audio))
+        return await JobManager.get_instance().run(_render_from_story, request)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating audio from story: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating audio from story: {str(e)}"
+        )
+
+# Binary audio endpoints: raw audio bodies (or multipart) instead of base64-in-JSON
+def _audio_media_type(format: str) -> str:
+    if format not in AUDIO_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported audio format '{format}'. Use one of: {', '.join(AUDIO_MEDIA_TYPES)}"
+        )
+    return AUDIO_MEDIA_TYPES[format]
+
+def _audio_response(audio, format: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        iter_audio_bytes(audio, format),
+        media_type=AUDIO_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'},
+    )
+
+@app.post("/api/v1/generate-from-story/audio")
+async def generate_from_story_audio(request: GenerateFromStoryRequest, format: str = "wav"):
+    """
+    Same pipeline as /api/v1/generate-from-story, but the final mix is returned as a
+    chunked audio body (`format`: wav, mp3, ogg, flac) instead of base64 JSON.
+    """
+    _audio_media_type(format)
+    try:
+        logger.info(f"Generating audio ({format}) from story: {request.story_text[:50]}...")
+        final_audio = await JobManager.get_instance().run(_render_story_audio, request)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
     except Exception as e:
         logger.error(f"Error generating audio from story: {e}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating audio from story: {str(e)}"
         )
+    return _audio_response(final_audio, format, "story")
+
+@app.post("/api/v1/generate-audio-cues-with-audio-base64/audio")
+async def generate_audio_cues_with_audio_base64_audio(request: GenerateAudioCuesWithAudioBase64Request, format: str = "wav"):
+    """
+    Same mix as /api/v1/generate-audio-cues-with-audio-base64, returned as a chunked audio body.
+    """
+    _audio_media_type(format)
+    try:
+        audio_cues, total_duration_ms = _resolve_base64_cues(request)
+        final_audio = await run_in_threadpool(
+            superimpose_audio_cues_with_audio_base64, audio_cues, total_duration_ms
+        )
+    except Exception as e:
+        logger.error(f"Error mixing audio cues: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error mixing audio cues: {str(e)}"
+        )
+    return _audio_response(final_audio, format, "mix")
+
+@app.post("/api/v1/generate-audio/multipart")
+async def generate_audio_multipart(request: GenerateAudioFromCuesRequest, format: str = "wav"):
+    """
+    Same generation as /api/v1/generate-audio, returned as a streamed multipart/mixed body:
+    the first part is a JSON manifest (cues with their part names), followed by one audio part per cue.
+    """
+    media_type = _audio_media_type(format)
+    try:
+        logger.info(f"Generating audio (multipart) from {len(request.cues)} cues")
+        cues = [dict_to_cue(c.model_dump()) for c in request.cues]
+        audio_cues = await JobManager.get_instance().run(
+            lambda: parallel_audio_generation(cues, encode=False, latency_budget_s=request.latency_budget_s)
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error generating audio: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error generating audio: {str(e)}"
+        )
+
+    boundary = uuid.uuid4().hex
+    manifest = {
+        "total_duration_ms": request.total_duration_ms,
+        "audio_cues": [
+            {
+                "part": f"cue-{index}.{format}",
+                "audio_cue": audio_cue_to_dict(item.audio_cue),
+                "duration_ms": item.duration_ms,
+            }
+            for index, item in enumerate(audio_cues)
+        ],
+    }
+
+    def multipart_stream():
+        yield (
+            f"--{boundary}\r\nContent-Type: application/json\r\n"
+            f'Content-Disposition: inline; name="manifest"\r\n\r\n'
+        ).encode()
+        yield json.dumps(manifest).encode()
+        for index, item in enumerate(audio_cues):
+            part = f"cue-{index}.{format}"
+            yield (
+                f"\r\n--{boundary}\r\nContent-Type: {media_type}\r\n"
+                f'Content-Disposition: attachment; name="{part}"; filename="{part}"\r\n\r\n'
+            ).encode()
+            yield from iter_audio_bytes(item.audio, format)
+        yield f"\r\n--{boundary}--\r\n".encode()
+
+    return StreamingResponse(multipart_stream(), media_type=f"multipart/mixed; boundary={boundary}")
+
+# Incremental render: the mix is streamed as WAV in time-ordered windows while later cues are still generating
+def _streamed_mix_response(cues, total_duration_ms: int, filename: str) -> StreamingResponse:
+    try:
+        # The stream renders on its own thread, but counts against JOB_MAX_PENDING like any render
+        release = JobManager.get_instance().admit()
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    total_frames = int(round(total_duration_ms * MIX_FRAME_RATE / 1000.0))
+    body = iter_wav_stream(iter_rendered_windows(cues, total_duration_ms), total_frames, MIX_FRAME_RATE, MIX_CHANNELS)
+
+    def close():
+        try:
+            body.close()
+        finally:
+            release()
+
+    async def stream():
+        # Each window is rendered on this stream's own thread, so the event loop stays free between chunks
+        loop = asyncio.get_running_loop()
+        renderer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream")
+        try:
+            while True:
+                chunk = await loop.run_in_executor(renderer, next, body, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            # Runs after any window still rendering, so a disconnect stops the render without blocking the loop
+            renderer.submit(close)
+            renderer.shutdown(wait=False)
+
+    return StreamingResponse(
+        stream(),
+        media_type=AUDIO_MEDIA_TYPES["wav"],
+        headers={"Content-Disposition": f'inline; filename="{filename}.wav"'},
+    )
+
+@app.post("/api/v1/generate-audio/stream")
+async def generate_audio_stream(request: GenerateAudioFromCuesRequest):
+    """
+    Render the cues into one mixed WAV that is streamed while it is generated: the timeline is
+    emitted in STREAM_WINDOW_MS windows, narration is synthesized sentence by sentence and the
+    other cues are generated just ahead of the window that needs them.
+    """
+    logger.info(f"Streaming render of {len(request.cues)} cues ({request.total_duration_ms}ms)")
+    cues = plan_steps([dict_to_cue(c.model_dump()) for c in request.cues], request.latency_budget_s, PARALLEL_WORKERS)
+    return _streamed_mix_response(cues, request.total_duration_ms, "mix")
+
+@app.post("/api/v1/generate-from-story/stream")
+async def generate_from_story_stream(request: GenerateFromStoryRequest):
+    """
+    Decide cues for the story, then stream the mixed WAV as in /api/v1/generate-audio/stream.
+    """
+    try:
+        logger.info(f"Streaming render from story: {request.story_text[:50]}...")
+        speed_wps = request.speed_wps if request.speed_wps is not None else READING_SPEED_WPS
+        cues, total_duration_ms = await run_in_threadpool(decide_audio_cues, request.story_text, speed_wps)
+        cues = plan_steps(cues, request.latency_budget_s, PARALLEL_WORKERS)
+    except Exception as e:
+        logger.error(f"Error deciding audio cues: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error deciding audio cues: {str(e)}"
+        )
+    return _streamed_mix_response(cues, total_duration_ms, "story")
+
+def _evaluation_response(analysis) -> EvaluateAudioResponse:
+    return EvaluateAudioResponse(
+        clap_score=analysis.clap_score,
+        spectral_richness=analysis.spectral_entropy,  # Use entropy as spectral richness
+        noise_floor=analysis.noise_floor_db,
+        audio_onsets=analysis.audio_onsets,
+        message="Successfully evaluated audio"
+    )
+
+def _evaluate_audio(request: EvaluateAudioRequest):
+    """Blocking body of evaluate-audio; runs in the threadpool."""
+    # One decode and one STFT feed every metric (CLAP, richness, noise floor, onsets)
+    analysis = AudioEvaluator.get_instance().analyze(request.audio_base64, request.text)
+    return _evaluation_response(analysis)
 
 @app.post("/api/v1/evaluate-audio", response_model=EvaluateAudioResponse)
 async def evaluate_audio(request: EvaluateAudioRequest):
@@ -254,27 +562,7 @@ async def evaluate_audio(request: EvaluateAudioRequest):
     """
     try:
         logger.info("Evaluating audio...")
-        evaluator = AudioEvaluator()
-        
-        # Get CLAP score (text-audio alignment)
-        clap_score = evaluator.get_clap_score(request.audio_base64, request.text)
-        
-        # Get spectral richness (returns flatness, entropy)
-        flatness, spectral_entropy = evaluator.get_audio_richness(request.audio_base64)
-        
-        # Get noise floor
-        noise_floor = evaluator.get_noise_floor(request.audio_base64)
-        
-        # Get audio onsets (sync detection)
-        audio_onsets = evaluator.evaluate_sync_from_audio_base64(request.audio_base64)
-        
-        return EvaluateAudioResponse(
-            clap_score=float(clap_score),
-            spectral_richness=float(spectral_entropy),  # Use entropy as spectral richness
-            noise_floor=float(noise_floor),
-            audio_onsets=int(audio_onsets),
-            message="Successfully evaluated audio"
-        )   
+        return await run_in_threadpool(_evaluate_audio, request)
     except Exception as e:
         logger.error(f"Error evaluating audio: {e}", exc_info=True)
         raise HTTPException(
@@ -282,6 +570,109 @@ async def evaluate_audio(request: EvaluateAudioRequest):
             detail=f"Error evaluating audio: {str(e)}"
         )
 
+# Background job endpoints: submit returns immediately, progress is polled or streamed
+def _job_submit_response(job: Job) -> JobSubmitResponse:
+    return JobSubmitResponse(
+        job_id=job.id,
+        status=job.status,
+        status_url=f"/api/v1/jobs/{job.id}",
+        events_url=f"/api/v1/jobs/{job.id}/events",
+    )
+
+def _submit_job(kind: str, work) -> JobSubmitResponse:
+    try:
+        job = JobManager.get_instance().submit(kind, work)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    return _job_submit_response(job)
+
+@app.post("/api/v1/jobs/generate-audio", response_model=JobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_generate_audio_job(request: GenerateAudioFromCuesRequest):
+    """
+    Queue generate-audio as a background job and return its id.
+    The result (same payload as /api/v1/generate-audio) is available from the job status once completed.
+    """
+    logger.info(f"Queueing generate-audio job for {len(request.cues)} cues")
+    return _submit_job("generate-audio", lambda progress: _render_audio_from_cues(request, progress))
+
+@app.post("/api/v1/jobs/generate-from-story", response_model=JobSubmitResponse, status_code=status.HTTP_202_ACCEPTED)
+async def submit_generate_from_story_job(request: GenerateFromStoryRequest):
+    """
+    Queue generate-from-story as a background job and return its id.
+    The result (same payload as /api/v1/generate-from-story) is available from the job status once completed.
+    """
+    logger.info(f"Queueing generate-from-story job for story: {request.story_text[:50]}...")
+    return _submit_job("generate-from-story", lambda progress: _render_from_story(request, progress))
+
+@app.get("/api/v1/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_job_status(job_id: str):
+    """Poll a job's status, per-cue progress and, once completed, its result."""
+    job = JobManager.get_instance().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job: {job_id}")
+    return JobStatusResponse(
+        job_id=job.id,
+        kind=job.kind,
+        status=job.status,
+        total_cues=job.total_cues,
+        completed_cues=job.completed_cues,
+        error=job.error,
+        result=job.result,
+    )
+
+@app.get("/api/v1/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """
+    Stream a job's progress as Server-Sent Events.
+    Emits `status`, `stage` and per-cue `cue` events; the stream ends after the job completes or fails.
+    """
+    manager = JobManager.get_instance()
+    if manager.get(job_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown job: {job_id}")
+
+    async def event_stream():
+        index = 0
+        while True:
+            update = manager.events_since(job_id, index)
+            if update is None:
+                return
+            events, finished = update
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event)}\n\n"
+            index += len(events)
+            if finished:
+                return
+            await asyncio.sleep(JOB_EVENT_POLL_S)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+def _evaluate_audio_batch(request: EvaluateAudioBatchRequest):
+    """Blocking body of evaluate-audio/batch: one batched CLAP pass, then per-item metrics."""
+    analyses = AudioEvaluator.get_instance().analyze_batch(
+        [item.audio_base64 for item in request.items],
+        [item.text for item in request.items],
+    )
+    return EvaluateAudioBatchResponse(
+        results=[_evaluation_response(analysis) for analysis in analyses],
+        message=f"Successfully evaluated {len(request.items)} audio items"
+    )
+
+@app.post("/api/v1/evaluate-audio/batch", response_model=EvaluateAudioBatchResponse)
+async def evaluate_audio_batch(request: EvaluateAudioBatchRequest):
+    """
+    Evaluate many (audio, text) pairs at once.
+    CLAP scores for all pairs are computed in batched forward passes on the shared evaluator.
+    """
+    try:
+        logger.info(f"Evaluating {len(request.items)} audio items...")
+        return await run_in_threadpool(_evaluate_audio_batch, request)
+    except Exception as e:
+        logger.error(f"Error evaluating audio batch: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error evaluating audio batch: {str(e)}"
+        )
+
 if __name__ == "__main__":
     # Run the server
     port = int(os.getenv("PORT", 8000))
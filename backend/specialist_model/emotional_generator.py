@@ -1,18 +1,17 @@
 import logging
-import numpy as np
-from pydub import AudioSegment
 
 from Variable.configurations import STEPS, EMOTIONAL_RATE, EMOTIONAL_GAIN
 from helper.lib import TangoFluxModel
+from helper.audio_conversions import waveform_to_segment
 
 logger = logging.getLogger(__name__)
 
-def emotional_music_generator(prompt: str, duration_ms: int):
+def emotional_music_generator(prompt: str, duration_ms: int, steps: int = STEPS):
     """Generates a background music track."""
-    logger.info(f"Generating: '{prompt}' ({duration_ms}ms)")
+    logger.info(f"Generating: '{prompt}' ({duration_ms}ms, {steps} steps)")
 
     duration_s = int(duration_ms / 1000.0)
-    audio_arr = TangoFluxModel.generate(prompt, steps=STEPS, duration=duration_s)
+    audio_arr = TangoFluxModel.generate(prompt, steps=steps, duration=duration_s)
 
     if audio_arr is None or audio_arr.numel() == 0:
         raise ValueError(
@@ -26,14 +25,7 @@ def emotional_music_generator(prompt: str, duration_ms: int):
 
     logger.debug(f"Audio clip from prompt {prompt} generated (shape: {waveform.shape})")
 
-    audio_bytes = (waveform * 32767 * EMOTIONAL_GAIN).astype(np.int16).tobytes()
-    segment = AudioSegment(
-        data=audio_bytes,
-        sample_width=2,
-        frame_rate=EMOTIONAL_RATE,
-        channels=1,
-    )
-    return segment
+    return waveform_to_segment(waveform, EMOTIONAL_RATE, EMOTIONAL_GAIN)
 
 
 # TESTING
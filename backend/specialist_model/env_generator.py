@@ -9,17 +9,17 @@
 #     sys.path.append(project_root)
 
 import logging
-import numpy as np
 from pydub import AudioSegment
 from helper.lib import TangoFluxModel
+from helper.audio_conversions import waveform_to_segment
 from Variable.configurations import STEPS, ENV_RATE, ENV_GAIN
 logger = logging.getLogger(__name__)
 
-def environment_generator(prompt: str, duration_ms: int):
+def environment_generator(prompt: str, duration_ms: int, steps: int = STEPS):
     """Generates an ambient environmental sound."""
-    logger.info(f"Generating: '{prompt}' ({duration_ms}ms)")
+    logger.info(f"Generating: '{prompt}' ({duration_ms}ms, {steps} steps)")
     duration_s = int(duration_ms / 1000.0)
-    audio_arr = TangoFluxModel.generate(prompt, steps=STEPS, duration=duration_s)
+    audio_arr = TangoFluxModel.generate(prompt, steps=steps, duration=duration_s)
 
     if audio_arr is None or audio_arr.numel() == 0:
         logger.error(
@@ -35,14 +35,7 @@ def environment_generator(prompt: str, duration_ms: int):
 
     logger.debug(f"Audio clip from prompt {prompt} generated (shape: {waveform.shape})")
 
-    audio_bytes = (waveform * 32767 * ENV_GAIN).astype(np.int16).tobytes()
-    segment = AudioSegment(
-        data=audio_bytes,
-        sample_width=2,
-        frame_rate=ENV_RATE,
-        channels=1,
-    )
-    return segment
+    return waveform_to_segment(waveform, ENV_RATE, ENV_GAIN)
 
 
 # TESTING
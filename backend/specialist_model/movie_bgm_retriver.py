@@ -9,35 +9,29 @@
 #     sys.path.append(project_root)
 
 import logging
-import os
-import numpy as np
-from pydub import AudioSegment
-from helper.lib import TangoFluxModel
-from helper.audio_processing import stretch_compression, stretch_expansion
-from Variable.configurations import PATH_TO_MOVIE_BGMS
+from helper.movie_bgm_library import MovieBgmLibrary
+from helper.audio_processing import time_stretch_segment
+from Variable.configurations import MOVIE_BGM_MIN_STRETCH_RATE, MOVIE_BGM_MAX_STRETCH_RATE
 logger = logging.getLogger(__name__)
 
 
 
 def movie_bgm_retriver(path: str, duration_ms: int):
-    """Generates an movie background music sound from data."""
+    """Generates an movie background music sound from data.
+
+    The clip comes from the pre-decoded PCM library (see helper/movie_bgm_library.py) and is
+    fitted to exactly `duration_ms`: a track within the configured speed range is time-stretched
+    (pitch preserved); a much longer track is trimmed and a much shorter one is stretched as far
+    as allowed, then padded with silence.
+    """
     logger.info(f"Retrieving: '{path}' ({duration_ms}ms)")
-    duration_s = int(duration_ms / 1000.0)
-    # Build an absolute path so this works regardless of current working directory
-    backend_root = os.path.dirname(os.path.dirname(__file__))
-    bgm_dir = os.path.join(backend_root, PATH_TO_MOVIE_BGMS)
-    full_path = os.path.join(bgm_dir, path)
-    
-    if(full_path[-4:] != ".mp3"):
-        full_path = full_path + ".mp3"
-    audio_segment = AudioSegment.from_file(full_path)
-    stretch_factor = duration_s / audio_segment.duration_seconds
+    library = MovieBgmLibrary.get_instance()
+    stretch_factor = library.duration_ms(path) / max(1, duration_ms)
     logger.info(f"Stretch factor: {stretch_factor}")
-    # if(stretch_factor > 1): audio_segment = stretch_compression(audio_segment, stretch_factor)
-    # elif(stretch_factor < 1): audio_segment = stretch_expansion(audio_segment, stretch_factor)
-    # else: audio_segment = audio_segment
- 
-    return audio_segment
+    if stretch_factor > MOVIE_BGM_MAX_STRETCH_RATE:
+        return library.get_segment(path, duration_ms)
+    rate = max(stretch_factor, MOVIE_BGM_MIN_STRETCH_RATE)
+    return time_stretch_segment(library.get_segment(path), rate, duration_ms)
 
 
 # TESTING
@@ -1,17 +1,16 @@
-import numpy as np
 from helper.lib import TangoFluxModel
-from pydub import AudioSegment
+from helper.audio_conversions import waveform_to_segment
 import logging
 from Variable.configurations import STEPS, SFX_RATE, SFX_GAIN
 
 logger = logging.getLogger(__name__)
 
-def sfx_generator(prompt: str, duration_ms: int):
+def sfx_generator(prompt: str, duration_ms: int, steps: int = STEPS):
     """Generates a short sound effect."""
-    logger.info(f"Generating: '{prompt}' ({duration_ms}ms)")
+    logger.info(f"Generating: '{prompt}' ({duration_ms}ms, {steps} steps)")
 
     duration_s = int(duration_ms / 1000.0)
-    audio_arr = TangoFluxModel.generate(prompt, steps=STEPS, duration=duration_s)
+    audio_arr = TangoFluxModel.generate(prompt, steps=steps, duration=duration_s)
 
     if audio_arr is None or audio_arr.numel() == 0:
         raise ValueError(f"Failed to generate audio for prompt: '{prompt}'. Model returned empty array.")
@@ -23,14 +22,7 @@ def sfx_generator(prompt: str, duration_ms: int):
 
     logger.debug(f"Audio clip from prompt {prompt} generated (shape: {waveform.shape})")
 
-    audio_bytes = (waveform * 32767 * SFX_GAIN).astype(np.int16).tobytes()
-    segment = AudioSegment(
-        data=audio_bytes,
-        sample_width=2,
-        frame_rate=SFX_RATE,
-        channels=1,
-    )
-    return segment
+    return waveform_to_segment(waveform, SFX_RATE, SFX_GAIN)
 
 
 ## TESTING
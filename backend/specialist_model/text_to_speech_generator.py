@@ -1,38 +1,244 @@
-import torch
-from transformers.trainer_utils import set_seed
 import logging
+import re
+import zlib
+from typing import Dict, Iterator, List, Optional
+import numpy as np
 from helper.lib import ParlerTTSModel
+from helper.cpu_inference import cpu_inference, to_fp32
+from helper.clip_cache import ClipCache
+from Variable.configurations import (
+    CLIP_CACHE_ENABLED,
+    PARLER_TTS_MODEL_NAME,
+    PARLER_TTS_SEED,
+    PARLER_TTS_SAMPLING,
+    CPU_FAST_PATH,
+    NARRATION_SENTENCE_SPLIT,
+    NARRATION_BATCH_SIZE,
+    NARRATION_MIN_SENTENCE_CHARS,
+    NARRATION_CROSSFADE_MS,
+)
 logger = logging.getLogger(__name__)
 
-def text_to_speech_generator(prompt: str, description: str):
-    """Generates a text to speech audio."""
-    logger.info(f"Generating: '{prompt}' with description: '{description}'")
+# Sentence ends: Latin terminators and the Devanagari danda, followed by whitespace
+_SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+")
 
-    models = ParlerTTSModel.get_instance()
-    model = models["model"]
-    tokenizer = models["tokenizer"]
-    description_tokenizer = models["description_tokenizer"]
-
-    description_input_ids = description_tokenizer(description, return_tensors="pt")
-    prompt_input_ids = tokenizer(prompt, return_tensors="pt")
-    set_seed(42)
-    generation = model.generate(
-        input_ids=description_input_ids.input_ids,
-        attention_mask=description_input_ids.attention_mask,
-        prompt_input_ids=prompt_input_ids.input_ids,
-        prompt_attention_mask=prompt_input_ids.attention_mask,
+def split_sentences(text: str, min_chars: int = NARRATION_MIN_SENTENCE_CHARS) -> List[str]:
+    """Split narration into sentences, merging fragments shorter than `min_chars` forward."""
+    sentences: List[str] = []
+    pending = ""
+    for part in _SENTENCE_END.split(text.strip()):
+        pending = f"{pending} {part}".strip() if pending else part.strip()
+        if len(pending) >= min_chars:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        if sentences:
+            sentences[-1] = f"{sentences[-1]} {pending}"
+        else:
+            sentences.append(pending)
+    return sentences
+
+def _sentence_cache_key(sentence: str, description: str) -> Optional[str]:
+    if not CLIP_CACHE_ENABLED:
+        return None
+    return ClipCache.make_key(
+        audio_type="NARRATOR_SENTENCE",
+        text=sentence,
+        narrator_description=description,
+        model=PARLER_TTS_MODEL_NAME,
+        seed=PARLER_TTS_SEED,
+        sampling=PARLER_TTS_SAMPLING,
+        precision=CPU_FAST_PATH,
     )
-    if isinstance(generation, torch.Tensor):
-        audio_arr = generation.cpu().numpy().squeeze()
-    else:
-        audio_tensor = getattr(generation, "sequences", None) or getattr(
-            generation, "audio", None
+
+def sentence_seed(sentence: str, description: str) -> int:
+    """Sampling seed for one sentence: fixed per (PARLER_TTS_SEED, text, description), whatever batch it is in."""
+    return zlib.crc32(f"{PARLER_TTS_SEED}\0{description}\0{sentence}".encode("utf-8"))
+
+class _RowLayoutError(RuntimeError):
+    """The logits rows are not items x codebooks, so they cannot be matched to per-item generators."""
+
+class _SeededSampler:
+    """Logits processor that does the sampling itself, from one torch.Generator per batch item.
+
+    Temperature / top-k / top-p from the model's generation config are applied, then a token is
+    drawn by the Gumbel-max trick and every other token is masked to -inf, so the (greedy)
+    generate loop picks exactly the drawn token. Nothing reads or reseeds torch's global RNG,
+    and each item's draws depend only on its own seed.
+
+    Rows must be item-major with `num_codebooks` rows per item; any other layout raises
+    _RowLayoutError rather than handing an item another item's draws. For a single item
+    `num_codebooks` may be None: every row is then drawn from its generator.
+    """
+
+    def __init__(self, seeds: List[int], generation_config, num_codebooks: Optional[int] = None):
+        import torch
+
+        if num_codebooks is None and len(seeds) != 1:
+            raise ValueError("num_codebooks is required to sample several items")
+        self._generators = [torch.Generator().manual_seed(seed) for seed in seeds]
+        self._num_codebooks = num_codebooks
+        self._temperature = getattr(generation_config, "temperature", None) or 1.0
+        self._top_k = getattr(generation_config, "top_k", None) or 0
+        self._top_p = getattr(generation_config, "top_p", None) or 1.0
+
+    def __call__(self, input_ids, scores):
+        import torch
+
+        rows_per_item = scores.shape[0] if self._num_codebooks is None else self._num_codebooks
+        if scores.shape[0] != len(self._generators) * rows_per_item:
+            raise _RowLayoutError(
+                f"{scores.shape[0]} logits rows for {len(self._generators)} items x {self._num_codebooks} codebooks"
+            )
+        scores = scores.float()
+        if self._temperature != 1.0:
+            scores = scores / self._temperature
+        if 0 < self._top_k < scores.shape[-1]:
+            kth = torch.topk(scores, self._top_k, dim=-1).values[..., -1:]
+            scores = scores.masked_fill(scores < kth, float("-inf"))
+        if self._top_p < 1.0:
+            sorted_scores, sorted_idx = torch.sort(scores, descending=True, dim=-1)
+            cumulative = sorted_scores.softmax(dim=-1).cumsum(dim=-1)
+            remove = cumulative - sorted_scores.softmax(dim=-1) > self._top_p  # always keeps the top token
+            scores = scores.masked_fill(remove.scatter(-1, sorted_idx, remove), float("-inf"))
+        # Rows are item-major (ParlerTTS stacks the codebooks of each item)
+        uniform = torch.cat([
+            torch.rand((rows_per_item, scores.shape[-1]), generator=generator)
+            for generator in self._generators
+        ]).to(scores.device)
+        gumbel = -torch.log(-torch.log(uniform.clamp(1e-10, 1.0 - 1e-10)))
+        choice = torch.argmax(scores + gumbel, dim=-1, keepdim=True)
+        return torch.full_like(scores, float("-inf")).scatter(-1, choice, 0.0)
+
+def _generate_per_item(models: dict, prompts: List[str], description: str) -> List[np.ndarray]:
+    """Fallback for `_generate_batch`: one generate call per prompt.
+
+    With a single item every logits row is that item's, so the sampler needs no row layout;
+    each prompt is still drawn from its own seeded generator, as in a batch.
+    """
+    import torch
+    from transformers.generation.logits_process import LogitsProcessorList
+
+    model = models["model"]
+    description_input_ids = models["description_tokenizer"](description, return_tensors="pt")
+    audios = []
+    for prompt in prompts:
+        prompt_input_ids = models["tokenizer"](prompt, return_tensors="pt")
+        sampler = _SeededSampler([sentence_seed(prompt, description)], model.generation_config)
+        with torch.no_grad(), cpu_inference(models.get("cpu_mode", "")):
+            generation = model.generate(
+                input_ids=description_input_ids.input_ids,
+                attention_mask=description_input_ids.attention_mask,
+                prompt_input_ids=prompt_input_ids.input_ids,
+                prompt_attention_mask=prompt_input_ids.attention_mask,
+                do_sample=False,  # the sampler draws the tokens
+                logits_processor=LogitsProcessorList([sampler]),
+                return_dict_in_generate=True,
+            )
+        audio = to_fp32(generation.sequences.cpu()).numpy()[0]
+        audios.append(audio[: int(generation.audios_length[0])].astype(np.float32))
+    return audios
+
+def _generate_batch(prompts: List[str], description: str) -> List[np.ndarray]:
+    """One padded ParlerTTS generate call for several prompts sharing a description.
+
+    Runs on a pooled instance (see ParlerTTSModel.checkout); each prompt is sampled from its own
+    seeded generator, so the audio for a sentence does not depend on the batch or on other threads.
+    If the logits rows do not have the expected layout, falls back to `_generate_per_item`.
+    """
+    import torch
+    from transformers.generation.logits_process import LogitsProcessorList
+
+    with ParlerTTSModel.checkout() as models:
+        model = models["model"]
+        tokenizer = models["tokenizer"]
+        description_tokenizer = models["description_tokenizer"]
+
+        description_input_ids = description_tokenizer([description] * len(prompts), return_tensors="pt", padding=True)
+        prompt_input_ids = tokenizer(prompts, return_tensors="pt", padding=True)
+        sampler = _SeededSampler(
+            [sentence_seed(p, description) for p in prompts], model.generation_config, model.decoder.num_codebooks
         )
-        if audio_tensor is not None and isinstance(audio_tensor, torch.Tensor):
-            audio_arr = audio_tensor.cpu().numpy().squeeze()
-        else:
-            audio_arr = generation.cpu().numpy().squeeze()  # type: ignore[union-attr]
-    return audio_arr
+        try:
+            with torch.no_grad(), cpu_inference(models.get("cpu_mode", "")):
+                generation = model.generate(
+                    input_ids=description_input_ids.input_ids,
+                    attention_mask=description_input_ids.attention_mask,
+                    prompt_input_ids=prompt_input_ids.input_ids,
+                    prompt_attention_mask=prompt_input_ids.attention_mask,
+                    do_sample=False,  # the sampler above draws the tokens
+                    logits_processor=LogitsProcessorList([sampler]),
+                    return_dict_in_generate=True,
+                )
+        except _RowLayoutError as e:
+            logger.warning(f"Seeded batch sampling unavailable ({e}); generating {len(prompts)} sentences one by one")
+            return _generate_per_item(models, prompts, description)
+    # Batched output is padded to the longest item; audios_length gives each item's true length
+    audios = to_fp32(generation.sequences.cpu()).numpy()
+    lengths = generation.audios_length
+    return [audios[i, : int(lengths[i])].astype(np.float32) for i in range(len(prompts))]
+
+def crossfade_concat(pieces: List[np.ndarray], crossfade_samples: int) -> np.ndarray:
+    """Join clips with a linear crossfade of up to `crossfade_samples` at each seam."""
+    out = pieces[0]
+    for piece in pieces[1:]:
+        n = min(crossfade_samples, len(out), len(piece))
+        if n == 0:
+            out = np.concatenate([out, piece])
+            continue
+        ramp = np.linspace(0.0, 1.0, n, dtype=np.float32)
+        seam = out[-n:] * (1.0 - ramp) + piece[:n] * ramp
+        out = np.concatenate([out[:-n], seam, piece[n:]])
+    return out
+
+def narration_sample_rate() -> int:
+    return ParlerTTSModel.sampling_rate()
+
+def iter_narration_audio(prompt: str, description: str, first_batch_size: int = NARRATION_BATCH_SIZE) -> Iterator[np.ndarray]:
+    """
+    Yield the audio of each narration sentence, in order, as soon as it is available.
+
+    Cached sentences are yielded immediately; uncached ones are generated in padded batches,
+    the first of `first_batch_size` sentences (1 gives the lowest time-to-first-audio) and the
+    rest of NARRATION_BATCH_SIZE. Every generated sentence is cached by (text, description, seed).
+    """
+    sentences = split_sentences(prompt) if NARRATION_SENTENCE_SPLIT else [prompt]
+    if not sentences:
+        sentences = [prompt]
+    logger.info(f"Generating narration: {len(sentences)} sentences with description: '{description}'")
+
+    cache = ClipCache.get_instance() if CLIP_CACHE_ENABLED else None
+    keys = [_sentence_cache_key(sentence, description) for sentence in sentences]
+    pieces: Dict[int, np.ndarray] = {}
+    if cache is not None:
+        for i, key in enumerate(keys):
+            cached = cache.get_array(key) if key is not None else None
+            if cached is not None:
+                pieces[i] = cached
+    missing = [i for i in range(len(sentences)) if i not in pieces]
+    logger.info(f"Narration sentence cache: {len(pieces)} hits, {len(missing)} to generate")
+
+    batch_size = first_batch_size
+    for i in range(len(sentences)):
+        if i not in pieces:
+            batch = missing[:batch_size]
+            missing = missing[batch_size:]
+            batch_size = NARRATION_BATCH_SIZE
+            for j, audio_arr in zip(batch, _generate_batch([sentences[j] for j in batch], description)):
+                pieces[j] = audio_arr
+                if cache is not None and keys[j] is not None:
+                    cache.put_array(keys[j], audio_arr)
+        yield pieces.pop(i)
+
+def text_to_speech_generator(prompt: str, description: str):
+    """Generates a text to speech audio.
+
+    The text is split into sentences; uncached sentences are generated in padded batches
+    of NARRATION_BATCH_SIZE, each sentence is cached by (text, description, seed), and the
+    pieces are stitched with NARRATION_CROSSFADE_MS crossfades.
+    """
+    pieces = list(iter_narration_audio(prompt, description))
+    return crossfade_concat(pieces, int(narration_sample_rate() * NARRATION_CROSSFADE_MS / 1000))
 
 # if __name__ == "__main__":
 #     prompt = "Hello how are you?"
@@ -12,78 +12,91 @@
 from csv import Error
 import base64
 import io
-from pydub import AudioSegment
 import logging
-from typing import List, Sequence
+from typing import List, Optional, Sequence
 from Variable.dataclases import Cue, AudioCueWithAudioBase64
 from Tools.play_audio import create_audio_from_audiocue
 from Tools.decide_audio import decide_audio_cues
 from Variable.configurations import READING_SPEED_WPS
 from helper.audio_conversions import base64_to_audio
+from helper.mix_bus import MixBus
+from helper.job_manager import JobProgress
+from helper.step_policy import plan_steps
 # from Variable.audio_classes_dict import SOUND_KEYWORDS
 
 
 logger = logging.getLogger(__name__)
 
-def superimpose_audio(audio_cues: Sequence[Cue], total_duration_ms: int):
+def superimpose_audio(audio_cues: Sequence[Cue], total_duration_ms: int, progress: Optional[JobProgress] = None):
     """
     Superimposes all audio cues into a single track.
+    If `progress` is given, each cue is reported to it once generated and mixed.
     """
     logger.info("Starting audio superimposition process...")
-    logger.info(f"Creating silent audio canvas of {total_duration_ms}ms.")
-    final_audio = AudioSegment.silent(duration=total_duration_ms)
+    logger.info(f"Creating mix bus of {total_duration_ms}ms.")
+    mix_bus = MixBus(total_duration_ms)
     for cue in audio_cues:
-        final_audio = final_audio.overlay(create_audio_from_audiocue(cue))
-    return final_audio
+        mix_bus.add(create_audio_from_audiocue(cue))
+        if progress is not None:
+            progress.cue_done(cue.id)
+    return mix_bus.to_audio_segment()
 
 def superimpose_audio_cues(audio_cues: Sequence[Cue], total_duration_ms: int):
     """
     Superimposes all audio cues into a single track.
     """
     logger.info("Starting audio superimposition process...")
-    logger.info(f"Creating silent audio canvas of {total_duration_ms}ms.")
-    final_audio = AudioSegment.silent(duration=total_duration_ms)
+    logger.info(f"Creating mix bus of {total_duration_ms}ms.")
+    mix_bus = MixBus(total_duration_ms)
     for cue in audio_cues:
-        final_audio = final_audio.overlay(create_audio_from_audiocue(cue), position=cue.start_time_ms)
-    return final_audio
+        mix_bus.add(create_audio_from_audiocue(cue), position_ms=cue.start_time_ms)
+    return mix_bus.to_audio_segment()
 
 def superimpose_audio_cues_with_audio_base64(audio_cues: List[AudioCueWithAudioBase64], total_duration_ms: int):
     """
     Superimposes all audio cues with audio base64 into a single track.
     """
     logger.info("Starting audio superimposition process...")
-    logger.info(f"Creating silent audio canvas of {total_duration_ms}ms.")
-    final_audio = AudioSegment.silent(duration=total_duration_ms)
+    logger.info(f"Creating mix bus of {total_duration_ms}ms.")
+    mix_bus = MixBus(total_duration_ms)
     for cue in audio_cues:
-        # Convert base64 string to AudioSegment before overlaying
+        # Convert base64 string to AudioSegment before mixing
         base_segment = base64_to_audio(cue.audio_base64)
 
-        # Apply gain in dB based on weight_db (no repetition)
+        # Apply gain in dB based on weight_db (no repetition), in float on the bus
         weight_db = getattr(cue.audio_cue, "weight_db", 0) or 0
-        segment_with_gain = base_segment + weight_db
 
-        # Stretch/trim to match the cue's duration_ms (no looping)
-        desired_duration = getattr(cue.audio_cue, "duration_ms", len(segment_with_gain)) or len(segment_with_gain)
-        current_duration = len(segment_with_gain)
-
-        if current_duration > desired_duration:
-            audio_segment = segment_with_gain[:desired_duration]
-        elif current_duration < desired_duration:
-            padding = AudioSegment.silent(duration=desired_duration - current_duration)
-            audio_segment = segment_with_gain + padding
-        else:
-            audio_segment = segment_with_gain
-
-        final_audio = final_audio.overlay(audio_segment, position=cue.audio_cue.start_time_ms)
-    return final_audio
-
-def superimposition_model(story_text: str, speed_wps: float):
+        # Trim to the cue's duration_ms (no looping); shorter clips are simply followed by silence
+        desired_duration = getattr(cue.audio_cue, "duration_ms", len(base_segment)) or len(base_segment)
+
+        mix_bus.add(
+            base_segment,
+            position_ms=cue.audio_cue.start_time_ms,
+            gain_db=weight_db,
+            max_duration_ms=desired_duration,
+        )
+    return mix_bus.to_audio_segment()
+
+def superimposition_model(
+    story_text: str,
+    speed_wps: float,
+    progress: Optional[JobProgress] = None,
+    latency_budget_s: Optional[float] = None,
+):
     """
     Superimposes all audio cues with audio base64 into a single track.
+    If `progress` is given, the deciding/generating stages and each cue are reported to it.
+    Diffusion steps are planned to fit `latency_budget_s` (cues are generated one at a time).
     """
     try:
+        if progress is not None:
+            progress.stage("deciding")
         cues, total_duration = decide_audio_cues(story_text, speed_wps)
-        final_audio = superimpose_audio(cues, total_duration)
+        cues = plan_steps(cues, latency_budget_s, workers=1)
+        if progress is not None:
+            progress.set_total(len(cues))
+            progress.stage("generating", cues=len(cues))
+        final_audio = superimpose_audio(cues, total_duration, progress)
         return final_audio
     except Exception as e:
         logger.error(f"Error in superimposition model: {e}", exc_info=True)
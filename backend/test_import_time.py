@@ -0,0 +1,12 @@
+"""
+Importing the API server must not load model libraries: models load lazily
+through helper.model_registry (see benchmarks/import_time.py for the timing budget).
+"""
+
+from benchmarks.import_time import HEAVY_MODULES, probe
+
+def test_server_import_is_lazy():
+    """`import server` leaves torch, spaCy, GLiNER and the other model libraries unimported"""
+    result = probe()
+    assert {"torch", "spacy", "gliner"} <= set(HEAVY_MODULES)
+    assert result["heavy_modules"] == []
@@ -0,0 +1,24 @@
+"""
+The indexed token -> word alignment of _extract_audio_cues_nlp must give the
+same word indices as the previous quadratic scan (kept in benchmarks/nlp_alignment.py).
+"""
+
+import re
+
+from benchmarks.nlp_alignment import legacy_alignment, indexed_alignment, make_story, make_token_starts
+
+STORY = (
+    "Suddenly the rain started, so I ran to the shelter.  There I heard a dog's bark... "
+    "The dog barked again!\nDon't   stop, it's night."
+)
+
+def test_alignment_matches_legacy_on_fixed_text():
+    """Contractions, repeated words, punctuation tokens and irregular whitespace"""
+    token_starts = [m.start() for m in re.finditer(r"\w+|[^\w\s]", STORY)]
+    assert indexed_alignment(STORY, token_starts) == legacy_alignment(STORY, token_starts)
+
+def test_alignment_matches_legacy_on_generated_story():
+    """Multi-token words as spaCy splits them (word plus trailing punctuation)"""
+    story = make_story(500)
+    token_starts = make_token_starts(story)
+    assert indexed_alignment(story, token_starts) == legacy_alignment(story, token_starts)